@@ -0,0 +1,174 @@
+import subprocess
+import hashlib
+import json
+import os
+import re
+import logging
+
+
+def source_hash(code):
+    return hashlib.sha256(code).hexdigest()
+
+
+def solc_version():
+    """
+    Returns the version line of solc or 'unknown' if solc is not available.
+    """
+    try:
+        return subprocess.check_output(['solc', '--version'], stderr=subprocess.STDOUT).strip().split('\n')[-1]
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def find_link_references(bytecode):
+    """
+    Returns byte offsets of library placeholders in hex bytecode by library name.
+    """
+    link_references = {}
+    for match in re.finditer(r'__\w{38}', bytecode):
+        link_references.setdefault(match.group()[2:].rstrip('_'), []).append(match.start() / 2)
+    return link_references
+
+
+def link_bytecode(bytecode, link_references, addresses):
+    """
+    Patches library addresses into hex bytecode at the given byte offsets. Libraries without address are left as
+    placeholders.
+    """
+    patches = sorted((offset * 2, address[2:] if address.startswith('0x') else address)
+                     for library_name, address in (addresses or {}).iteritems()
+                     for offset in link_references.get(library_name, []))
+    if not patches:
+        return bytecode
+    pieces = []
+    position = 0
+    for start, address in patches:
+        pieces.append(bytecode[position:start])
+        pieces.append(address)
+        position = start + 40
+    pieces.append(bytecode[position:])
+    return ''.join(pieces)
+
+
+def compile_combined(code, outputs):
+    """
+    Returns the combined JSON outputs of the last contract in code, using the same optimizer settings as the tester.
+    Returns None if solc is not available or fails, the reason is logged.
+    """
+    try:
+        process = subprocess.Popen(['solc', '--optimize', '--combined-json', outputs, '-'],
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        logging.info('Cannot run solc for {}: {}'.format(outputs, e))
+        return None
+    output, error = process.communicate(code)
+    if process.returncode != 0:
+        logging.info('solc failed to compile {}: {}'.format(outputs, error.strip()))
+        return None
+    contracts = json.loads(output)['contracts']
+    contract_name = re.findall(r'^(?:contract|library) (\w+)', code, re.MULTILINE)[-1]
+    for name, compiled in contracts.iteritems():
+        if name.split(':')[-1] == contract_name:
+            return compiled
+    return None
+
+
+def compile_runtime(code):
+    """
+    Returns runtime bytecode of the last contract in code or None if solc is not available.
+    """
+    compiled = compile_combined(code, 'bin-runtime')
+    return compiled['bin-runtime'] if compiled else None
+
+
+class Artifact:
+    """
+    Self-contained build output of a contract. Deployments from an artifact need neither preprocessor nor compiler.
+    """
+
+    def __init__(self, contract_name, abi, bytecode, runtime_bytecode=None, link_references=None, source_hash=None,
+                 placeholders=None, add_dev_code=False):
+        self.contract_name = contract_name
+        self.abi = abi
+        self.bytecode = bytecode
+        self.runtime_bytecode = runtime_bytecode
+        self.link_references = link_references if link_references is not None else find_link_references(bytecode)
+        self.source_hash = source_hash
+        self.placeholders = placeholders or []
+        self.add_dev_code = add_dev_code
+        self._translator = None
+
+    @classmethod
+    def compile(cls, code, contract_name, language='solidity', add_dev_code=False, placeholders=None):
+        from ethereum.tester import languages
+        compiled = languages[language].combined(code)[-1][1]
+        runtime_bytecode = compile_runtime(code) if language == 'solidity' else None
+        if language == 'solidity' and not runtime_bytecode:
+            logging.info('Artifact {} has no runtime bytecode, deployments verify it with a tester deployment'.format(
+                contract_name))
+        return cls(contract_name, compiled['abi'], compiled['bin_hex'], runtime_bytecode=runtime_bytecode,
+                   source_hash=source_hash(code), placeholders=placeholders, add_dev_code=add_dev_code)
+
+    @property
+    def translator(self):
+        if self._translator is None:
+            from ethereum.abi import ContractTranslator
+            self._translator = ContractTranslator(self.abi)
+        return self._translator
+
+    def link(self, addresses):
+        return link_bytecode(self.bytecode, self.link_references, addresses)
+
+    def link_runtime(self, addresses):
+        if not self.runtime_bytecode:
+            return None
+        return link_bytecode(self.runtime_bytecode, find_link_references(self.runtime_bytecode), addresses)
+
+    def to_dict(self):
+        return {
+            'contract_name': self.contract_name,
+            'abi': self.abi,
+            'bytecode': self.bytecode,
+            'runtime_bytecode': self.runtime_bytecode,
+            'link_references': self.link_references,
+            'source_hash': self.source_hash,
+            'placeholders': self.placeholders,
+            'add_dev_code': self.add_dev_code,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['contract_name'], data['abi'], data['bytecode'],
+                   runtime_bytecode=data.get('runtime_bytecode'),
+                   link_references=data.get('link_references'),
+                   source_hash=data.get('source_hash'),
+                   placeholders=data.get('placeholders'),
+                   add_dev_code=data.get('add_dev_code', False))
+
+    def save(self, artifact_dir):
+        with open(os.path.join(artifact_dir, '{}.json'.format(self.contract_name)), 'w') as artifact_file:
+            json.dump(self.to_dict(), artifact_file)
+
+    @classmethod
+    def load(cls, file_name):
+        with open(file_name) as artifact_file:
+            return cls.from_dict(json.load(artifact_file))
+
+    def matches_source(self, code):
+        return self.source_hash == source_hash(code)
+
+
+class ArtifactStore:
+    """
+    Loads artifacts from a directory lazily, the first time a contract is deployed.
+    """
+
+    def __init__(self, artifact_dir):
+        self.artifact_dir = artifact_dir
+        self.artifacts = {}
+
+    def get(self, contract_name):
+        if contract_name not in self.artifacts:
+            file_name = os.path.join(self.artifact_dir, '{}.json'.format(contract_name))
+            self.artifacts[contract_name] = Artifact.load(file_name) if os.path.isfile(file_name) else None
+        return self.artifacts[contract_name]
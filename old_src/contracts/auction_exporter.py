@@ -0,0 +1,179 @@
+from ethereum.utils import sha3
+from auction_reader import AuctionStateReader
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+from collections import deque
+import threading
+import click
+import time
+import logging
+logging.basicConfig(level=logging.INFO)
+
+BID_SUBMISSION_TOPIC = '0x' + sha3('BidSubmission(address,uint256)').encode('hex')
+# Stage 3 is AuctionEnded, the waiting period runs until trading starts
+AUCTION_ENDED = 3
+
+
+class AuctionExporter:
+    """
+    Polls a DutchAuction and renders Prometheus metrics. Between blocks only eth_blockNumber is requested, every new
+    block costs one batch with all calls and the BidSubmission logs since the last block. Scrapes are answered from the
+    text rendered for the last block and never cause RPC.
+    """
+
+    FIELDS = ('stage', 'calcTokenPrice', 'calcStopPrice', 'totalReceived', 'ceiling', 'endTime', 'WAITING_PERIOD')
+
+    def __init__(self, json_rpc, auction_address, rate_window=300, clock=time.time):
+        self.json_rpc = json_rpc
+        self.auction_address = auction_address
+        self.reader = AuctionStateReader(json_rpc, auction_address, fields=self.FIELDS)
+        self.rate_window = rate_window
+        self.clock = clock
+        self.last_block = None
+        self.state = None
+        self.bids = 0
+        self.bid_amount = 0
+        # (time, bids, amount) of recent blocks for bid rates
+        self.recent_bids = deque()
+        self.rpc_batches = 0
+        self.scrapes = 0
+        # Scrapes are answered by concurrent request threads
+        self.lock = threading.Lock()
+        self.text = ''
+
+    def poll(self):
+        """
+        Updates the metrics if a new block was mined. Returns True if the metrics changed.
+        """
+        block = self.json_rpc.block_number()
+        if block == self.last_block:
+            return False
+        block_tag = hex(block).rstrip("L")
+        from_block = block if self.last_block is None else self.last_block + 1
+        calls = self.reader.build_calls(block_tag)
+        calls.append(("eth_getLogs", [{"fromBlock": hex(from_block).rstrip("L"), "toBlock": block_tag,
+                                       "address": self.auction_address, "topics": [BID_SUBMISSION_TOPIC]}]))
+        responses = self.json_rpc.batch(calls)
+        self.rpc_batches += 1
+        logs_response = responses.pop()
+        if "error" in logs_response:
+            raise ValueError('eth_getLogs at block {} failed with error {}'.format(block, logs_response["error"]))
+        self.state = self.reader.decode_responses(block, responses)
+        amounts = [int(log["data"][2:] or '0', 16) for log in logs_response["result"]]
+        self.bids += len(amounts)
+        self.bid_amount += sum(amounts)
+        now = self.clock()
+        self.recent_bids.append((now, len(amounts), sum(amounts)))
+        while self.recent_bids[0][0] < now - self.rate_window:
+            self.recent_bids.popleft()
+        self.last_block = block
+        self.text = self.render(now)
+        return True
+
+    def metrics(self, now):
+        state = self.state
+        window = max(now - self.recent_bids[0][0], 1) if self.recent_bids else 1
+        if state['stage'] == AUCTION_ENDED:
+            waiting_period_left = max(state['endTime'] + state['WAITING_PERIOD'] - int(now), 0)
+        else:
+            waiting_period_left = 0
+        return [
+            ('dutch_auction_block', 'gauge', 'Block the metrics were read at', state['block']),
+            ('dutch_auction_stage', 'gauge', 'Stage, 0 AuctionDeployed to 4 TradingStarted', state['stage']),
+            ('dutch_auction_price_wei', 'gauge', 'Current token price', state['calcTokenPrice']),
+            ('dutch_auction_stop_price_wei', 'gauge', 'Price at which the auction ends', state['calcStopPrice']),
+            ('dutch_auction_total_received_wei', 'gauge', 'Wei received by bids', state['totalReceived']),
+            ('dutch_auction_ceiling_wei', 'gauge', 'Maximum Wei the auction accepts', state['ceiling']),
+            ('dutch_auction_ceiling_ratio', 'gauge', 'Share of the ceiling received',
+             float(state['totalReceived']) / state['ceiling'] if state['ceiling'] else 0),
+            ('dutch_auction_bids_total', 'counter', 'Bids seen since the exporter started', self.bids),
+            ('dutch_auction_bid_amount_wei_total', 'counter', 'Wei bid since the exporter started', self.bid_amount),
+            ('dutch_auction_bids_per_minute', 'gauge', 'Bids in the rate window per minute',
+             60.0 * sum(bids for _, bids, _ in self.recent_bids) / window),
+            ('dutch_auction_bid_amount_wei_per_minute', 'gauge', 'Wei bid in the rate window per minute',
+             60.0 * sum(amount for _, _, amount in self.recent_bids) / window),
+            ('dutch_auction_waiting_period_seconds_left', 'gauge',
+             'Seconds until trading starts after the auction ended', waiting_period_left),
+            ('dutch_auction_exporter_rpc_batches_total', 'counter', 'JSON-RPC batches sent for new blocks',
+             self.rpc_batches),
+        ]
+
+    def render(self, now):
+        """
+        Returns the metrics in the Prometheus text format.
+        """
+        return self.render_metrics(self.metrics(now))
+
+    def render_metrics(self, metrics):
+        label = '{{auction="{}"}}'.format(self.auction_address)
+        lines = []
+        for name, metric_type, description, value in metrics:
+            lines.append('# HELP {} {}'.format(name, description))
+            lines.append('# TYPE {} {}'.format(name, metric_type))
+            lines.append('{}{} {}'.format(name, label, repr(value) if isinstance(value, float) else value))
+        return '\n'.join(lines) + '\n'
+
+    def scrape(self):
+        with self.lock:
+            self.scrapes += 1
+            scrapes = self.scrapes
+        return self.text + self.render_metrics([('dutch_auction_exporter_scrapes_total', 'counter',
+                                                 'Scrapes answered since the exporter started', scrapes)])
+
+    def poll_forever(self, poll_interval):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                logging.info('Polling failed with error {}. Retry!'.format(e))
+            time.sleep(poll_interval)
+
+    def serve(self, host="localhost", port=0):
+        """
+        Serves /metrics in a background thread. Returns the server.
+        """
+        exporter = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = exporter.scrape()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        server = Server((host, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return server
+
+
+@click.command()
+@click.option('-protocol', default="http", help='Ethereum server protocol')
+@click.option('-host', default="localhost", help='Ethereum server host')
+@click.option('-port', default='8545', help='Ethereum server port')
+@click.option('-auction', help='Dutch auction address')
+@click.option('-listen_host', default="0.0.0.0", help='Host to serve /metrics on')
+@click.option('-listen_port', default=9545, help='Port to serve /metrics on')
+@click.option('-poll_interval', default=1.0, help='Seconds between block number checks')
+def setup(protocol, host, port, auction, listen_host, listen_port, poll_interval):
+    from rpc import JsonRpc
+    exporter = AuctionExporter(JsonRpc(protocol, host, port), auction)
+    exporter.serve(listen_host, listen_port)
+    logging.info('Serving metrics of auction {} on {}:{}/metrics'.format(auction, listen_host, listen_port))
+    exporter.poll_forever(poll_interval)
+
+if __name__ == '__main__':
+    setup()
@@ -0,0 +1,81 @@
+from ethereum.abi import ContractTranslator
+from contract_abi import load_abi
+
+
+class AuctionStateReader:
+    """
+    Reads the state of a DutchAuction and the bids of a watch list with one JSON-RPC batch. All calls are pinned to
+    the same block, so every snapshot is consistent. Snapshots are cached per block.
+    """
+
+    FIELDS = ('stage', 'totalReceived', 'calcTokenPrice', 'calcStopPrice', 'finalPrice', 'ceiling')
+
+    def __init__(self, json_rpc, auction_address, watch_list=None, fields=FIELDS):
+        self.json_rpc = json_rpc
+        self.auction_address = auction_address
+        self.translator = ContractTranslator(load_abi('DutchAuction'))
+        self.fields = tuple(fields)
+        self.watch_list = []
+        self.cached_block = None
+        self.cached_state = None
+        # Call data does not change between refreshes, encode it once
+        self.field_data = [self.encode(name, []) for name in self.fields]
+        self.bid_data = {}
+        for address in watch_list or []:
+            self.watch(address)
+
+    def encode(self, name, params):
+        return "0x" + self.translator.encode(name, params).encode("hex")
+
+    def decode(self, name, result):
+        decoded = self.translator.decode(name, result[2:].decode("hex"))
+        return decoded[0] if len(decoded) == 1 else decoded
+
+    def watch(self, address):
+        if address not in self.bid_data:
+            self.watch_list.append(address)
+            self.bid_data[address] = self.encode('bids', [address])
+            # Cached snapshot does not include the new address
+            self.cached_block = None
+
+    def unwatch(self, address):
+        if address in self.bid_data:
+            self.watch_list.remove(address)
+            del self.bid_data[address]
+            # Cached snapshot still includes the removed address
+            self.cached_block = None
+
+    def build_calls(self, block_tag):
+        calls = [("eth_call", [{"to": self.auction_address, "data": data}, block_tag]) for data in self.field_data]
+        calls += [("eth_call", [{"to": self.auction_address, "data": self.bid_data[address]}, block_tag])
+                  for address in self.watch_list]
+        return calls
+
+    def read(self, block=None):
+        """
+        Returns a dict with the auction fields, a "bids" dict for the watch list and the "block" it was read at.
+        Reads of an already cached block cost no RPC. Without a block only eth_blockNumber is requested while no new
+        block arrived, a new block is read with one batch pinned to it.
+        """
+        if block is None:
+            block = self.json_rpc.block_number()
+        if block == self.cached_block:
+            return self.cached_state
+        return self.decode_responses(block, self.json_rpc.batch(self.build_calls(hex(block).rstrip("L"))))
+
+    def decode_responses(self, block, responses):
+        """
+        Decodes the responses of the calls of build_calls into a snapshot and caches it. Lets callers add the calls
+        to a larger batch.
+        """
+        for response in responses:
+            if "error" in response:
+                raise ValueError('Call at block {} failed with error {}'.format(block, response["error"]))
+        results = [response["result"] for response in responses]
+        state = dict((name, self.decode(name, result)) for name, result in zip(self.fields, results))
+        state["bids"] = dict((address, self.decode('bids', result))
+                             for address, result in zip(self.watch_list, results[len(self.fields):]))
+        state["block"] = block
+        self.cached_block = block
+        self.cached_state = state
+        return state
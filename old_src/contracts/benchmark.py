@@ -0,0 +1,273 @@
+from preprocessor import PreProcessor
+import subprocess
+import tempfile
+import shutil
+import random
+import click
+import time
+import json
+import os
+import logging
+logging.basicConfig(level=logging.INFO)
+
+STAGES = ('tokenize', 'resolve_imports', 'resolve_macros', 'process', 'process_cold', 'compile', 'deploy',
+          'deploy_pipeline')
+
+
+def write_file(contract_dir, file_name, code):
+    path = os.path.join(contract_dir, file_name)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as source_file:
+        source_file.write(code)
+
+
+def generate_tree(contract_dir, files=200, chain_depth=30, macros=5, placeholders=10, seed=0):
+    """
+    Writes a synthetic Solidity tree with about the given number of files: pairs of Token contracts with their
+    Abstract declaration, an inheritance chain of chain_depth files importing each other and abstract tokens, and
+    leaf contracts importing tokens and a part of the chain, each with macros and address placeholders. Returns the
+    leaf file names.
+    """
+    rnd = random.Random(seed)
+    pairs = max(files / 4, 1)
+    leaves = max(files - 2 * pairs - chain_depth, 1)
+    for i in range(pairs):
+        write_file(contract_dir, 'Bench/Tokens/AbstractToken{}.sol'.format(i),
+                   'contract Token{} {{\n    function value() constant returns (uint);\n}}\n'.format(i))
+        write_file(contract_dir, 'Bench/Tokens/Token{}.sol'.format(i),
+                   'import "Bench/Tokens/AbstractToken{0}.sol";\n\n'
+                   '/// @title Token {0}\n'
+                   'contract Token{0} {{\n'
+                   '    // value() is declared in AbstractToken{0}.sol\n'
+                   '    function value() constant returns (uint) {{\n'
+                   '        return {0};\n'
+                   '    }}\n'
+                   '}}\n'.format(i))
+    for k in range(chain_depth):
+        imports = 'import "Bench/Tokens/AbstractToken{}.sol";\n'.format(k % pairs)
+        parent = ''
+        if k + 1 < chain_depth:
+            imports = 'import "Bench/Chain/Chain{}.sol";\n'.format(k + 1) + imports
+            parent = ' is Chain{}'.format(k + 1)
+        write_file(contract_dir, 'Bench/Chain/Chain{}.sol'.format(k),
+                   '{imports}\n'
+                   'contract Chain{k}{parent} {{\n'
+                   '    macro: $scale{k} = {scale};\n'
+                   '    uint public chain{k};\n'
+                   '    /* Scaled value of token, "{{{{NOT_A_PLACEHOLDER}}}}" */\n'
+                   '    function chainValue{k}(Token{token} token) constant returns (uint) {{\n'
+                   '        return token.value() * $scale{k} + chain{k};\n'
+                   '    }}\n'
+                   '}}\n'.format(imports=imports, k=k, parent=parent, scale=k + 1, token=k % pairs))
+    leaf_files = []
+    for j in range(leaves):
+        token_imports = sorted(rnd.sample(range(pairs), min(5, pairs)))
+        chain_start = rnd.randint(0, chain_depth - 1) if chain_depth else None
+        lines = ['import "Bench/Tokens/Token{}.sol";'.format(i) for i in token_imports]
+        if chain_start is not None:
+            lines.append('import "Bench/Chain/Chain{}.sol";'.format(chain_start))
+        lines.append('')
+        lines.append('contract Leaf{}{} {{'.format(j, ' is Chain{}'.format(chain_start) if chain_start is not None
+                                                 else ''))
+        lines += ['    macro: $m{} = uint({});'.format(m, m + j) for m in range(macros)]
+        lines += ['    address public target{0} = {{{{TARGET{0}}}}};'.format(p) for p in range(placeholders)]
+        value = ' + '.join(['$m{}'.format(m) for m in range(macros)] or ['0'])
+        lines.append('    function leafValue() constant returns (uint) {')
+        lines.append('        return {};'.format(value))
+        lines.append('    }')
+        lines.append('    function logValue() {')
+        lines.append('        Log({});'.format(value))
+        lines.append('    }')
+        lines.append('}')
+        file_name = 'Bench/Leaf{}.sol'.format(j)
+        write_file(contract_dir, file_name, '\n'.join(lines) + '\n')
+        leaf_files.append(file_name)
+    return leaf_files
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.STDOUT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class Benchmark:
+    """
+    Times the preprocessor stages, compilation and deployments against a LocalNode on a generated tree. Every stage
+    is repeated and the fastest run is reported, results are appended to a JSON Lines file to compare commits.
+    """
+
+    def __init__(self, contract_dir, leaf_files, placeholders=10, repeat=3, compile_count=3, deploy_count=10):
+        self.contract_dir = contract_dir
+        self.leaf_files = leaf_files
+        self.placeholders = placeholders
+        self.repeat = repeat
+        self.compile_count = compile_count
+        self.deploy_count = deploy_count
+
+    def addresses(self, index):
+        return dict(('TARGET{}'.format(p), '0x{:040x}'.format(index * self.placeholders + p + 1))
+                    for p in range(self.placeholders))
+
+    def warm_preprocessor(self):
+        pp = PreProcessor()
+        for file_name in self.leaf_files:
+            pp.tokenize_file(self.contract_dir + file_name)
+        return pp
+
+    def run_tokenize(self):
+        pp = PreProcessor()
+        for root, _, file_names in os.walk(self.contract_dir):
+            for file_name in file_names:
+                pp.tokenize_file(os.path.join(root, file_name))
+
+    def run_resolve_imports(self, pp):
+        return [pp.resolve_imports(pp.tokenize_file(self.contract_dir + file_name), file_name, self.contract_dir)
+                for file_name in self.leaf_files]
+
+    def run_resolve_macros(self, pp, resolved):
+        for tokens in resolved:
+            pp.resolve_macros(tokens)
+
+    def run_process(self, pp):
+        return [pp.process(file_name, add_dev_code=True, contract_dir=self.contract_dir,
+                           addresses=self.addresses(index))
+                for index, file_name in enumerate(self.leaf_files)]
+
+    def run_compile(self, codes):
+        from ethereum.tester import languages
+        # Under tests the solidity compiler may be a CachingCompiler, the benchmark always runs solc
+        compiler = languages['solidity']
+        compiler = getattr(compiler, 'compiler', compiler)
+        for code in codes[:self.compile_count]:
+            compiler.combined(code)
+
+    def instructions(self):
+        instructions = []
+        for index, file_name in enumerate(self.leaf_files[:self.deploy_count]):
+            # Placeholders point to the previous leaf, the first leaf uses fixed addresses
+            addresses = dict(('TARGET{}'.format(p), 'LEAF{}'.format(index - 1) if index else '0x0')
+                             for p in range(self.placeholders))
+            instructions.append({'type': 'deployment', 'file': file_name, 'reference': 'LEAF{}'.format(index),
+                                 'addresses': addresses})
+            if index and self.placeholders:
+                instructions.append({'type': 'assertion', 'contract': 'LEAF{}'.format(index), 'name': 'target0',
+                                     'params': [], 'return': 'LEAF{}'.format(index - 1)})
+        return instructions
+
+    def run_deploy(self, instructions_file, pipeline):
+        from local_node import LocalNode
+        from deploy import Deploy
+        from ethereum.tester import keys
+        node = LocalNode()
+        port = node.start()
+        try:
+            # Leaf contracts log with events of the dev code
+            deploy = Deploy('http', 'localhost', port, 'true', 'false', self.contract_dir, '4712388', '1',
+                            keys[0].encode('hex') if pipeline else None, pipeline='true' if pipeline else 'false')
+            deploy.process(instructions_file)
+        finally:
+            node.stop()
+
+    def time_stage(self, stage, function, *args):
+        timings = []
+        for _ in range(self.repeat):
+            start = time.time()
+            function(*args)
+            timings.append(time.time() - start)
+        logging.info('{}: {:.4f} seconds (fastest of {})'.format(stage, min(timings), self.repeat))
+        return {'stage': stage, 'seconds': min(timings), 'mean': sum(timings) / len(timings), 'repeat': self.repeat}
+
+    def run(self, stages=STAGES):
+        results = []
+        pp = self.warm_preprocessor()
+        if 'tokenize' in stages:
+            results.append(self.time_stage('tokenize', self.run_tokenize))
+        resolved = self.run_resolve_imports(pp)
+        if 'resolve_imports' in stages:
+            results.append(self.time_stage('resolve_imports', self.run_resolve_imports, pp))
+        if 'resolve_macros' in stages:
+            results.append(self.time_stage('resolve_macros', self.run_resolve_macros, pp, resolved))
+        if 'process' in stages:
+            results.append(self.time_stage('process', self.run_process, pp))
+        if 'process_cold' in stages:
+            results.append(self.time_stage('process_cold', lambda: self.run_process(PreProcessor())))
+        if 'compile' in stages:
+            results.append(self.time_stage('compile', self.run_compile, self.run_process(pp)))
+        if 'deploy' in stages or 'deploy_pipeline' in stages:
+            instructions_dir = tempfile.mkdtemp()
+            try:
+                instructions_file = os.path.join(instructions_dir, 'instructions.json')
+                with open(instructions_file, 'w') as f:
+                    json.dump(self.instructions(), f)
+                for stage, pipeline in (('deploy', False), ('deploy_pipeline', True)):
+                    if stage in stages:
+                        results.append(self.time_stage(stage, self.run_deploy, instructions_file, pipeline))
+            finally:
+                shutil.rmtree(instructions_dir)
+        return results
+
+
+def write_results(file_name, results, params, commit=None):
+    """
+    Appends one line per stage with commit, time and the parameters of the generated tree.
+    """
+    commit = commit or current_commit()
+    with open(file_name, 'a') as results_file:
+        for result in results:
+            results_file.write(json.dumps(dict(result, commit=commit, time=int(time.time()), params=params)) + '\n')
+
+
+def compare(file_name, base_commit, commit):
+    """
+    Returns (stage, base seconds, seconds, ratio) for stages measured at both commits with the same parameters.
+    The latest result of each commit is used.
+    """
+    latest = {}
+    with open(file_name) as results_file:
+        for line in results_file:
+            if line.strip():
+                result = json.loads(line)
+                latest[(result['commit'], result['stage'], json.dumps(result['params'], sort_keys=True))] = result
+    rows = []
+    for (result_commit, stage, params), result in sorted(latest.items()):
+        base = latest.get((base_commit, stage, params))
+        if result_commit == commit and base:
+            ratio = result['seconds'] / base['seconds'] if base['seconds'] else None
+            rows.append((stage, base['seconds'], result['seconds'], ratio))
+    return rows
+
+
+@click.command()
+@click.option('-f', default='benchmark.jsonl', help='Results file, results are appended')
+@click.option('-files', default=200, help='Files of the generated tree')
+@click.option('-chain_depth', default=30, help='Length of the import and inheritance chain')
+@click.option('-macros', default=5, help='Macros per leaf contract')
+@click.option('-placeholders', default=10, help='Address placeholders per leaf contract')
+@click.option('-repeat', default=3, help='Runs per stage, the fastest is reported')
+@click.option('-compile_count', default=3, help='Leaf contracts compiled per run')
+@click.option('-deploy_count', default=10, help='Leaf contracts deployed per run')
+@click.option('-stages', default=','.join(STAGES), help='Comma separated stages to run')
+@click.option('-compare', 'base_commit', default=None, help='Compare results of the current commit with this commit')
+def setup(f, files, chain_depth, macros, placeholders, repeat, compile_count, deploy_count, stages, base_commit):
+    if base_commit:
+        for stage, base_seconds, seconds, ratio in compare(f, base_commit, current_commit()):
+            logging.info('{}: {:.4f} -> {:.4f} seconds ({})'.format(stage, base_seconds, seconds,
+                                                                    '{:.2f}x'.format(ratio) if ratio else 'n/a'))
+        return
+    contract_dir = tempfile.mkdtemp() + '/'
+    try:
+        leaf_files = generate_tree(contract_dir, files, chain_depth, macros, placeholders)
+        benchmark = Benchmark(contract_dir, leaf_files, placeholders, repeat, compile_count, deploy_count)
+        results = benchmark.run(stages.split(','))
+    finally:
+        shutil.rmtree(contract_dir)
+    params = {'files': files, 'chain_depth': chain_depth, 'macros': macros, 'placeholders': placeholders,
+              'compile_count': compile_count, 'deploy_count': deploy_count}
+    write_results(f, results, params)
+    logging.info('Results of {} stages appended to {}.'.format(len(results), f))
+
+if __name__ == '__main__':
+    setup()
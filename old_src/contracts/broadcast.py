@@ -0,0 +1,124 @@
+from bundle import read_bundle
+from rpc import JsonRpc
+from transaction_manager import is_permanent_error
+import click
+import time
+import logging
+logging.basicConfig(level=logging.INFO)
+
+
+class BundleBroadcaster:
+    """
+    Sends the signed transactions of a bundle in JSON-RPC batches without waiting for receipts, then tracks receipts
+    of all transactions together and checks the assertions of the bundle.
+    """
+
+    def __init__(self, json_rpc, batch_size=100, poll_interval=5, max_attempts=10):
+        self.json_rpc = json_rpc
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+
+    def unsent_transactions(self, sender, transactions):
+        """
+        Returns transactions not yet sent by a previous run of the bundle.
+        """
+        nonce = int(self.json_rpc.call("eth_getTransactionCount", [sender, "pending"])["result"], 16)
+        if transactions and transactions[0]['nonce'] > nonce:
+            raise ValueError('Bundle starts with nonce {} but next nonce of {} is {}'.format(
+                transactions[0]['nonce'], sender, nonce))
+        return [tx for tx in transactions if tx['nonce'] >= nonce]
+
+    def broadcast(self, transactions):
+        """
+        Sends transactions and resends the ones failing with a transient error, at most max_attempts times. Errors
+        resending cannot fix, like a used nonce or missing funds, fail immediately.
+        """
+        unsent = list(transactions)
+        attempts = 0
+        while unsent:
+            attempts += 1
+            retry = []
+            for i in range(0, len(unsent), self.batch_size):
+                batch = unsent[i:i + self.batch_size]
+                responses = self.json_rpc.batch([("eth_sendRawTransaction", ["0x" + tx['raw']]) for tx in batch])
+                for tx, response in zip(batch, responses):
+                    # Transactions resent after a partial failure may already be known
+                    if "error" not in response or 'known' in str(response["error"]):
+                        continue
+                    if is_permanent_error(response["error"]):
+                        raise ValueError('Transaction {} with nonce {} failed with error {}'.format(
+                            tx['name'], tx['nonce'], response["error"]))
+                    logging.info('Transaction {} with nonce {} failed with error {}. Retry!'.format(
+                        tx['name'], tx['nonce'], response["error"]))
+                    retry.append(tx)
+            if retry and attempts >= self.max_attempts:
+                raise ValueError('{} transactions could not be sent in {} attempts'.format(len(retry), attempts))
+            if retry:
+                time.sleep(self.poll_interval)
+            unsent = retry
+        logging.info('Sent {} transactions.'.format(len(transactions)))
+
+    def track_receipts(self, transactions):
+        """
+        Waits until all transactions were mined and verifies precomputed contract addresses.
+        """
+        pending = dict((tx['hash'], tx) for tx in transactions)
+        while pending:
+            hashes = pending.keys()
+            responses = []
+            for i in range(0, len(hashes), self.batch_size):
+                responses += self.json_rpc.batch([("eth_getTransactionReceipt", [transaction_hash])
+                                                  for transaction_hash in hashes[i:i + self.batch_size]])
+            for transaction_hash, response in zip(hashes, responses):
+                receipt = response.get("result")
+                if not receipt:
+                    continue
+                tx = pending.pop(transaction_hash)
+                if tx['contract_address'] and receipt["contractAddress"] != tx['contract_address']:
+                    raise ValueError('Contract {} was created at {} instead of precomputed address {}'.format(
+                        tx['name'], receipt["contractAddress"], tx['contract_address']))
+            if pending:
+                logging.info('Waiting for {} transaction receipts'.format(len(pending)))
+                time.sleep(self.poll_interval)
+        logging.info('All {} transactions were mined.'.format(len(transactions)))
+
+    def check_assertions(self, assertions):
+        from ethereum.abi import decode_abi
+        responses = self.json_rpc.batch([("eth_call", [{"to": assertion['to'], "data": "0x" + assertion['data']},
+                                                       "latest"]) for assertion in assertions])
+        for assertion, response in zip(assertions, responses):
+            if "error" in response:
+                raise ValueError('Call {} failed with error {}'.format(assertion['name'], response["error"]))
+            result = decode_abi(assertion['decode_types'], response["result"][2:].decode("hex"))
+            result = result if len(result) > 1 else result[0]
+            expected = assertion['expected']
+            if isinstance(expected, (int, long)):
+                assert result == expected
+            else:
+                assert result.lower() == expected.lower().replace('0x', '', 1)
+            logging.info('Assertion successful for return value of {}.'.format(assertion['name']))
+
+    def run(self, file_name):
+        entries = list(read_bundle(file_name))
+        header = entries[0]
+        transactions = [entry for entry in entries if entry['type'] == 'transaction']
+        assertions = [entry for entry in entries if entry['type'] == 'assertion']
+        unsent = self.unsent_transactions(header['sender'], transactions)
+        self.broadcast(unsent)
+        self.track_receipts(transactions)
+        self.check_assertions(assertions)
+
+
+@click.command()
+@click.option('-f', help='Bundle written by deploy.py with -bundle')
+@click.option('-protocol', default="http", help='Ethereum server protocol')
+@click.option('-host', default="localhost", help='Ethereum server host')
+@click.option('-port', default='8545', help='Ethereum server port')
+@click.option('-batch_size', default=100, help='Transactions per JSON-RPC batch')
+@click.option('-max_attempts', default=10, help='Attempts to send transactions failing with transient errors')
+def setup(f, protocol, host, port, batch_size, max_attempts):
+    BundleBroadcaster(JsonRpc(protocol, host, port), batch_size, max_attempts=max_attempts).run(f)
+
+if __name__ == '__main__':
+    setup()
@@ -0,0 +1,73 @@
+from multiprocessing import Pool
+import json
+
+
+def sign_transaction(args):
+    """
+    Signs a transaction given as (private_key, nonce, gas_price, gas, to, data). Returns raw transaction and hash as
+    hex.
+    """
+    from ethereum.transactions import Transaction
+    import rlp
+    private_key, nonce, gas_price, gas, to, data = args
+    tx = Transaction(nonce, gas_price, gas, to, 0, data.decode('hex'))
+    tx.sign(private_key.decode('hex'))
+    return rlp.encode(tx).encode('hex'), tx.hash.encode('hex')
+
+
+def read_bundle(file_name):
+    """
+    Yields the entries of a bundle written by TransactionBundle.write one by one.
+    """
+    with open(file_name) as bundle_file:
+        for line in bundle_file:
+            if line.strip():
+                yield json.loads(line)
+
+
+class TransactionBundle:
+    """
+    Collects fully encoded transactions of a deployment with consecutive nonces. Transactions are signed in a worker
+    pool when the bundle is written, so signing needs no connection to a node.
+    """
+
+    def __init__(self, sender, private_key, gas, gas_price, processes=None):
+        self.sender = sender
+        self.private_key = private_key
+        self.gas = gas
+        self.gas_price = gas_price
+        self.processes = processes
+        self.transactions = []
+        self.assertions = []
+
+    def add_transaction(self, nonce, to, data, name, contract_address=None):
+        self.transactions.append({'type': 'transaction', 'nonce': nonce, 'to': to, 'data': data, 'name': name,
+                                  'contract_address': contract_address})
+
+    def add_assertion(self, to, data, decode_types, expected, name):
+        self.assertions.append({'type': 'assertion', 'to': to, 'data': data, 'decode_types': decode_types,
+                                'expected': expected, 'name': name})
+
+    def write(self, file_name, chunk_size=50):
+        """
+        Signs all transactions and writes the bundle as JSON Lines: a header, the signed transactions in nonce order
+        and assertions to check after all transactions were mined. Lines are written as soon as they are signed.
+        """
+        tasks = [(self.private_key, tx['nonce'], self.gas_price, self.gas, tx['to'], tx['data'])
+                 for tx in self.transactions]
+        pool = Pool(self.processes)
+        try:
+            with open(file_name, 'w') as bundle_file:
+                bundle_file.write(json.dumps({'type': 'header', 'sender': self.sender,
+                                              'transactions': len(self.transactions),
+                                              'assertions': len(self.assertions)}) + '\n')
+                for tx, (raw_tx, transaction_hash) in zip(self.transactions,
+                                                          pool.imap(sign_transaction, tasks, chunk_size)):
+                    bundle_file.write(json.dumps({'type': 'transaction', 'nonce': tx['nonce'], 'name': tx['name'],
+                                                  'raw': raw_tx, 'hash': '0x' + transaction_hash,
+                                                  'contract_address': tx['contract_address']}) + '\n')
+                for assertion in self.assertions:
+                    bundle_file.write(json.dumps(assertion) + '\n')
+        finally:
+            pool.close()
+            pool.join()
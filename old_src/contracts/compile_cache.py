@@ -0,0 +1,71 @@
+from artifacts import source_hash, solc_version, link_bytecode, find_link_references
+import cPickle as pickle
+import os
+
+
+class CachingCompiler:
+    """
+    Wraps a tester compiler and caches its combined output by solc version and source hash. Bytecode and ABI are
+    both taken from the one combined entry, so every variant of a contract, with or without dev code, is compiled
+    once. With a cache directory results are reused across runs until the compiler changes.
+    """
+
+    def __init__(self, compiler, cache_dir=None):
+        self.compiler = compiler
+        self.cache_dir = cache_dir
+        self.results = {}
+        self.version = None
+        if cache_dir and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def key(self, code):
+        if self.version is None:
+            self.version = solc_version()
+        return source_hash('{}\n{}'.format(self.version, code))
+
+    def combined(self, code, path=None, **kwargs):
+        if code is None or path or kwargs:
+            return self.compiler.combined(code, path=path, **kwargs)
+        key = self.key(code)
+        if key in self.results:
+            return self.results[key]
+        file_name = os.path.join(self.cache_dir, key + '.pickle') if self.cache_dir else None
+        if file_name and os.path.isfile(file_name):
+            with open(file_name, 'rb') as cache_file:
+                result = pickle.load(cache_file)
+        else:
+            result = self.compiler.combined(code)
+            if file_name:
+                with open(file_name, 'wb') as cache_file:
+                    pickle.dump(result, cache_file, pickle.HIGHEST_PROTOCOL)
+        self.results[key] = result
+        return result
+
+    def contract(self, code, contract_name=''):
+        """
+        Returns the combined output of the named contract or of the last contract in code.
+        """
+        contracts = self.combined(code)
+        if not contract_name:
+            return contracts[-1][1]
+        for name, compiled in contracts:
+            if name == contract_name:
+                return compiled
+        raise KeyError('Contract {} not found in code'.format(contract_name))
+
+    def compile(self, code, path=None, libraries=None, contract_name='', **kwargs):
+        if code is None or path or kwargs:
+            return self.compiler.compile(code, path=path, libraries=libraries, contract_name=contract_name, **kwargs)
+        bytecode = self.contract(code, contract_name)['bin_hex']
+        if libraries:
+            bytecode = link_bytecode(bytecode, find_link_references(bytecode), libraries)
+        return bytecode.decode('hex')
+
+    def mk_full_signature(self, code, path=None, libraries=None, contract_name='', **kwargs):
+        if code is None or path or kwargs:
+            return self.compiler.mk_full_signature(code, path=path, libraries=libraries, contract_name=contract_name,
+                                                   **kwargs)
+        return self.contract(code, contract_name)['abi']
+
+    def __getattr__(self, name):
+        return getattr(self.compiler, name)
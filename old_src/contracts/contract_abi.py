@@ -0,0 +1,9 @@
+import json
+import os
+
+ABI_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'abi')
+
+
+def load_abi(contract_name):
+    with open(os.path.join(ABI_DIR, '{}.json'.format(contract_name))) as abi_file:
+        return json.load(abi_file)
@@ -1,27 +1,35 @@
+import time
+START_TIME = time.time()
 from ethjsonrpc import EthJsonRpc
-from ethereum.tester import languages
-from ethereum import tester as t
-from ethereum.abi import ContractTranslator
-from ethereum.transactions import Transaction
-from ethereum.utils import privtoaddr
 from preprocessor import PreProcessor
+from artifacts import Artifact, ArtifactStore, link_bytecode, find_link_references, source_hash
+from instructions import read_instructions
 import click
-import time
-import json
-import rlp
 import logging
+import os
 logging.basicConfig(level=logging.INFO)
+# Instructions between balance log lines, each costs one eth_getBalance request
+BALANCE_LOG_INTERVAL = 100
+# Tester, compiler, ABI, signing, bundle, transaction manager and multi node modules are imported on first use, most
+# deployments don't need all of them
 
 
 class Deploy:
 
-    def __init__(self, protocol, host, port, add_dev_code, verify_code, contract_dir, gas, gas_price, private_key):
+    def __init__(self, protocol, host, port, add_dev_code, verify_code, contract_dir, gas, gas_price, private_key,
+                 artifact_dir=None, pipeline='false', bundle=None, nonce=None, gas_timeout='120',
+                 gas_price_factor='1.125', max_gas_price=None, endpoints=None, hedge_delay='0.5', max_lag='3'):
         self.pp = PreProcessor()
-        self.s = t.state()
-        self.s.block.number = 1150000  # Homestead
-        t.gas_limit = int(gas)
-        self.json_rpc = EthJsonRpc(protocol=protocol, host=host, port=port)
+        self.s = None
+        if endpoints:
+            from multi_rpc import MultiJsonRpc, endpoint_from_url
+            # Several nodes: raw transactions are broadcast to all of them, reads are hedged
+            self.json_rpc = MultiJsonRpc([endpoint_from_url(url) for url in endpoints.split(',')], float(hedge_delay),
+                                         int(max_lag))
+        else:
+            self.json_rpc = EthJsonRpc(protocol=protocol, host=host, port=port)
         if private_key:
+            from ethereum.utils import privtoaddr
             self.user_address = '0x' + privtoaddr(private_key.decode('hex')).encode('hex')
         else:
             self.user_address = self.json_rpc.eth_coinbase()["result"]
@@ -33,11 +41,39 @@ class Deploy:
         self.private_key = private_key
         self.contract_addresses = {}
         self.contract_abis = {}
-
-    def wait_for_transaction_receipt(self, transaction_hash):
-        while self.json_rpc.eth_getTransactionReceipt(transaction_hash)['result'] is None:
-            logging.info('Waiting for transaction receipt {}'.format(transaction_hash))
-            time.sleep(5)
+        # Contracts deployed from the same file share one translator
+        self.contract_files = {}
+        self.translators = {}
+        self.artifacts = ArtifactStore(artifact_dir) if artifact_dir else None
+        # Artifacts usable for a file after comparing them with its sources, None if they were built from others
+        self.checked_artifacts = {}
+        # Artifacts compiled during this run by language and source hash, and by (file, dev code, addresses) so
+        # repeated deployments are neither preprocessed nor compiled again
+        self.compiled = {}
+        self.instances = {}
+        # Pipelined transactions use locally tracked nonces and precomputed contract addresses
+        self.pipeline = pipeline == 'true'
+        if self.pipeline and not private_key:
+            raise ValueError('Pipelined deployment requires a private key')
+        self.nonce = None
+        self.pending_transactions = []
+        self.transactions = None
+        # Bundles are built offline like a pipelined deployment, transactions are signed and written instead of sent
+        self.bundle_file = bundle
+        self.bundle = None
+        if bundle:
+            if not private_key or nonce is None:
+                raise ValueError('Building a bundle requires a private key and the first nonce')
+            from bundle import TransactionBundle
+            self.pipeline = True
+            self.verify_code = False
+            self.nonce = int(nonce)
+            self.bundle = TransactionBundle(self.user_address, private_key, self.gas, self.gas_price)
+        else:
+            from transaction_manager import TransactionManager, GasPricePolicy
+            # Transactions not mined in time are replaced with a higher gas price
+            self.transactions = TransactionManager(self.json_rpc, GasPricePolicy(
+                int(gas_timeout), float(gas_price_factor), int(max_gas_price) if max_gas_price else None))
 
     def replace_address(self, a):
         if isinstance(a, list):
@@ -45,23 +81,77 @@ class Deploy:
         else:
             return self.contract_addresses[a] if isinstance(a, basestring) and a in self.contract_addresses else a
 
+    def get_translator(self, contract):
+        file_path = self.contract_files[contract]
+        if file_path not in self.translators:
+            from ethereum.abi import ContractTranslator
+            self.translators[file_path] = ContractTranslator(self.contract_abis[contract])
+        return self.translators[file_path]
+
     def get_nonce(self):
         return int(self.json_rpc.eth_getTransactionCount(self.user_address)["result"][2:], 16)
 
-    def get_raw_transaction(self, data, contract_address=''):
-        nonce = self.get_nonce()
-        tx = Transaction(nonce, self.gas_price, self.gas, contract_address, 0, data.decode('hex'))
-        tx.sign(self.private_key.decode('hex'))
-        return rlp.encode(tx).encode('hex')
+    def tester_state(self):
+        if not self.s:
+            from ethereum import tester as t
+            self.s = t.state()
+            self.s.block.number = 1150000  # Homestead
+            t.gas_limit = self.gas
+        return self.s
+
+    def next_nonce(self):
+        if not self.pipeline:
+            return self.get_nonce()
+        if self.nonce is None:
+            self.nonce = self.get_nonce()
+        self.nonce += 1
+        return self.nonce - 1
+
+    def predict_contract_address(self, nonce):
+        from ethereum.utils import mk_contract_address
+        return '0x' + mk_contract_address(self.user_address[2:].decode('hex'), nonce).encode('hex')
 
-    def code_is_valid(self, contract_address, compiled_code):
+    def get_raw_transaction(self, data, contract_address='', nonce=None, gas_price=None):
+        if nonce is None:
+            nonce = self.get_nonce()
+        if gas_price is None:
+            gas_price = self.gas_price
+        from bundle import sign_transaction
+        return sign_transaction((self.private_key, nonce, gas_price, self.gas, contract_address, data))[0]
+
+    def submit_transaction(self, data, contract_address, name, nonce=None):
+        """
+        Sends a transaction with a fixed nonce through the transaction manager, which can replace it with a higher gas
+        price. Returns the managed transaction.
+        """
+        if nonce is None:
+            nonce = self.get_nonce()
+        if self.private_key:
+            def send(gas_price):
+                raw_tx = self.get_raw_transaction(data, contract_address, nonce=nonce, gas_price=gas_price)
+                return self.json_rpc.eth_sendRawTransaction("0x" + raw_tx)
+        elif contract_address:
+            def send(gas_price):
+                return self.json_rpc.eth_sendTransaction(self.user_address, to_address=contract_address, data=data,
+                                                         gas=self.gas, gas_price=gas_price, nonce=nonce)
+        else:
+            def send(gas_price):
+                return self.json_rpc.eth_sendTransaction(self.user_address, data=data, gas=self.gas,
+                                                         gas_price=gas_price, nonce=nonce)
+        return self.transactions.submit(send, name, nonce, self.gas_price)
+
+    def code_is_valid(self, contract_address, compiled_code, runtime_code=None):
         deployed_code = self.json_rpc.eth_getCode(contract_address)["result"]
-        locally_deployed_code_address = self.s.evm(compiled_code.decode("hex")).encode("hex")
-        locally_deployed_code = self.s.block.get_code(locally_deployed_code_address).encode("hex")
+        if runtime_code:
+            return deployed_code == "0x" + runtime_code
+        s = self.tester_state()
+        locally_deployed_code_address = s.evm(compiled_code.decode("hex")).encode("hex")
+        locally_deployed_code = s.block.get_code(locally_deployed_code_address).encode("hex")
         return deployed_code == "0x" + locally_deployed_code
 
     @staticmethod
     def compile_code(code, language):
+        from ethereum.tester import languages
         combined = languages[language].combined(code)
         compiled_code = combined[-1][1]["bin_hex"]
         abi = combined[-1][1]["abi"]
@@ -69,85 +159,133 @@ class Deploy:
 
     @staticmethod
     def replace_library_placeholders(bytecode, addresses):
-        if addresses:
-            for library_name, library_address in addresses.iteritems():
-                bytecode = bytecode.replace("__{}{}".format(library_name, "_" * (38 - len(library_name))), library_address[2:])
-        return bytecode
+        return link_bytecode(bytecode, find_link_references(bytecode), addresses)
 
-    def deploy_code(self, file_path, reference, params, addresses):
-        if addresses:
-            addresses = dict([(k, self.replace_address(v)) for k, v in addresses.iteritems()])
+    def get_artifact(self, file_path):
+        if not self.artifacts:
+            return None
+        if file_path in self.checked_artifacts:
+            return self.checked_artifacts[file_path]
+        artifact = self.artifacts.get(file_path.split("/")[-1].split(".")[0])
+        # Artifacts are built without dev code and cannot contain addresses inserted by the preprocessor
+        if not artifact or artifact.add_dev_code != self.add_dev_code or artifact.placeholders:
+            return None
+        # Sources are optional with artifacts, if they are present the artifact has to be built from them
+        if os.path.isfile(self.contract_dir + file_path) and not artifact.matches_source(
+                self.pp.process(file_path, add_dev_code=self.add_dev_code, contract_dir=self.contract_dir)):
+            logging.info('Artifact for {} was built from other sources, compile the current sources'.format(
+                file_path))
+            artifact = None
+        self.checked_artifacts[file_path] = artifact
+        return artifact
+
+    def compile_artifact(self, file_path, addresses):
+        instance_key = (file_path, self.add_dev_code, tuple(sorted(addresses.iteritems())) if addresses else None)
+        if instance_key in self.instances:
+            logging.info('Use code compiled before for {}'.format(file_path))
+            return self.instances[instance_key]
         language = "solidity" if file_path.endswith(".sol") else "serpent"
         code = self.pp.process(file_path,
                                add_dev_code=self.add_dev_code,
                                contract_dir=self.contract_dir,
                                addresses=addresses)
-        # compile code
-        bytecode, abi = self.compile_code(code, language)
-        # replace library placeholders
-        bytecode = self.replace_library_placeholders(bytecode, addresses)
+        # Different files or addresses can preprocess to the same source, each source is compiled once
+        key = (language, source_hash(code))
+        if key not in self.compiled:
+            # compile code
+            bytecode, abi = self.compile_code(code, language)
+            self.compiled[key] = Artifact(file_path.split("/")[-1].split(".")[0], abi, bytecode,
+                                          add_dev_code=self.add_dev_code)
+        self.instances[instance_key] = self.compiled[key]
+        return self.compiled[key]
+
+    def deploy_code(self, file_path, reference, params, addresses):
+        if addresses:
+            addresses = dict([(k, self.replace_address(v)) for k, v in addresses.iteritems()])
+        artifact = self.get_artifact(file_path)
+        if artifact:
+            logging.info('Use artifact for {}'.format(file_path))
+            if self.verify_code and not artifact.runtime_bytecode:
+                logging.info('Artifact for {} has no runtime bytecode, code is verified with a tester deployment'
+                             .format(file_path))
+        else:
+            artifact = self.compile_artifact(file_path, addresses)
+        abi = artifact.abi
+        runtime_code = artifact.link_runtime(addresses)
+        # replace library placeholders at their link reference offsets
+        bytecode = artifact.link(addresses)
         if params:
-            translator = ContractTranslator(abi)
             # replace constructor placeholders
             params = [self.replace_address(p) for p in params]
-            bytecode += translator.encode_constructor_arguments(params).encode("hex")
+            bytecode += artifact.translator.encode_constructor_arguments(params).encode("hex")
         logging.info('Try to create contract with length {} based on code in file: {}'.format(len(bytecode),
                                                                                               file_path))
-        if self.private_key:
-            raw_tx = self.get_raw_transaction(bytecode)
-            tx_response = self.json_rpc.eth_sendRawTransaction("0x" + raw_tx)
-            while "error" in tx_response:
-                logging.info('Deploy failed with error {}. Retry!'.format(tx_response['error']))
-                time.sleep(5)
-                tx_response = self.json_rpc.eth_sendRawTransaction("0x" + raw_tx)
-        else:
-            tx_response = self.json_rpc.eth_sendTransaction(self.user_address, data=bytecode, gas=self.gas,
-                                                            gas_price=self.gas_price)
-            while "error" in tx_response:
-                logging.info('Deploy failed with error {}. Retry!'.format(tx_response['error']))
-                time.sleep(5)
-                tx_response = self.json_rpc.eth_sendTransaction(self.user_address, data=bytecode, gas=self.gas,
-                                                                gas_price=self.gas_price)
-        transaction_hash = tx_response['result']
-        self.wait_for_transaction_receipt(transaction_hash)
-        contract_address = self.json_rpc.eth_getTransactionReceipt(transaction_hash)["result"]["contractAddress"]
-        # Verify deployed code with locally deployed code
-        if self.verify_code and not self.code_is_valid(contract_address, bytecode):
-            logging.info('Deploy of {} failed. Retry!'.format(file_path))
-            self.deploy_code(file_path, params, addresses)
         if reference:
             contract_name = reference
         else:
             contract_name = file_path.split("/")[-1].split(".")[0]
+        if self.pipeline:
+            # Address is known before the transaction is mined, following instructions don't have to wait
+            nonce = self.next_nonce()
+            contract_address = self.predict_contract_address(nonce)
+            if self.bundle:
+                self.bundle.add_transaction(nonce, '', bytecode, contract_name, contract_address)
+            else:
+                transaction = self.submit_transaction(bytecode, '', 'Deploy of {}'.format(contract_name), nonce)
+                self.pending_transactions.append((transaction, contract_name, contract_address, bytecode,
+                                                  runtime_code))
+            self.contract_addresses[contract_name] = contract_address
+            self.contract_abis[contract_name] = abi
+            self.contract_files[contract_name] = file_path
+            logging.info('Contract {} will be created at address {}.'.format(contract_name, contract_address))
+            return
+        transaction = self.submit_transaction(bytecode, '', 'Deploy of {}'.format(contract_name))
+        contract_address = self.transactions.wait(transaction)["contractAddress"]
+        # Verify deployed code with locally deployed code
+        if self.verify_code and not self.code_is_valid(contract_address, bytecode, runtime_code):
+            logging.info('Deploy of {} failed. Retry!'.format(file_path))
+            return self.deploy_code(file_path, reference, params, addresses)
         self.contract_addresses[contract_name] = contract_address
         self.contract_abis[contract_name] = abi
+        self.contract_files[contract_name] = file_path
         logging.info('Contract {} was created at address {}.'.format(reference if reference else file_path, contract_address))
 
     def send_transaction(self, contract, name, params):
         contract_address = self.replace_address(contract)
-        contract_abi = self.contract_abis[contract]
-        translator = ContractTranslator(contract_abi)
+        translator = self.get_translator(contract)
         data = translator.encode(name, self.replace_address(params)).encode("hex")
         logging.info('Try to send {} transaction to contract {}.'.format(name, contract))
-        if self.private_key:
-            raw_tx = self.get_raw_transaction(data, contract_address)
-            tx_response = self.json_rpc.eth_sendRawTransaction("0x" + raw_tx)
-            while 'error' in tx_response:
-                logging.info('Transaction failed with error {}. Retry!'.format(tx_response['error']))
-                time.sleep(5)
-                tx_response = self.json_rpc.eth_sendRawTransaction("0x" + raw_tx)
-        else:
-            tx_response = self.json_rpc.eth_sendTransaction(self.user_address, to_address=contract_address, data=data,
-                                                            gas=self.gas, gas_price=self.gas_price)
-            while 'error' in tx_response:
-                logging.info('Transaction failed with error {}. Retry!'.format(tx_response['error']))
-                time.sleep(5)
-                tx_response = self.json_rpc.eth_sendTransaction(self.user_address, to_address=contract_address,
-                                                                data=data, gas=self.gas, gas_price=self.gas_price)
-        transaction_hash = tx_response['result']
-        self.wait_for_transaction_receipt(transaction_hash)
+        if self.bundle:
+            self.bundle.add_transaction(self.next_nonce(), contract_address, data, name)
+            logging.info('Transaction {} for contract {} added to bundle.'.format(name, contract))
+            return
+        if self.pipeline:
+            transaction = self.submit_transaction(data, contract_address, 'Transaction {}'.format(name),
+                                                  self.next_nonce())
+            self.pending_transactions.append((transaction, contract, None, None, None))
+            logging.info('Transaction {} for contract {} sent.'.format(name, contract))
+            return
+        self.transactions.wait(self.submit_transaction(data, contract_address, 'Transaction {}'.format(name)))
         logging.info('Transaction {} for contract {} completed.'.format(name, contract))
 
+    def wait_for_pending_transactions(self):
+        if not self.pending_transactions:
+            return
+        # Pending transactions are escalated together, a stuck nonce blocks all following ones
+        self.transactions.wait_all([pending[0] for pending in self.pending_transactions])
+        for transaction, contract_name, contract_address, bytecode, runtime_code in self.pending_transactions:
+            if not contract_address:
+                continue
+            receipt = transaction.receipt
+            if receipt["contractAddress"] != contract_address:
+                raise ValueError('Contract {} was created at {} instead of precomputed address {}'.format(
+                    contract_name, receipt["contractAddress"], contract_address))
+            # Later transactions depend on the precomputed address, a failed deployment cannot be retried
+            if self.verify_code and not self.code_is_valid(contract_address, bytecode, runtime_code):
+                raise ValueError('Deployed code of contract {} is invalid'.format(contract_name))
+            logging.info('Contract {} was created at address {}.'.format(contract_name, contract_address))
+        self.pending_transactions = []
+
     @staticmethod
     def strip_0x(string):
         if string.startswith("0x"):
@@ -157,8 +295,15 @@ class Deploy:
     def assert_call(self, contract, name, params, return_value):
         contract_address = self.replace_address(contract)
         return_value = self.replace_address(return_value)
-        contract_abi = self.contract_abis[contract]
-        translator = ContractTranslator(contract_abi)
+        translator = self.get_translator(contract)
+        if self.bundle:
+            # Checked by the broadcaster after all transactions of the bundle were mined
+            self.bundle.add_assertion(contract_address,
+                                      translator.encode(name, [self.replace_address(p) for p in params]).encode("hex"),
+                                      translator.function_data[name]['decode_types'], return_value, name)
+            return
+        # Assertions read mined state
+        self.wait_for_pending_transactions()
         data = "0x" + translator.encode(name, [self.replace_address(p) for p in params]).encode("hex")
         logging.info('Try to assert return value of {} in contract {}.'.format(name, contract))
         response = self.json_rpc.eth_call(from_address=self.user_address, to_address=contract_address, data=data)
@@ -171,39 +316,56 @@ class Deploy:
             assert result_decoded.lower() == self.strip_0x(return_value.lower())
         logging.info('Assertion successful for return value of {} in contract {}.'.format(name, contract))
 
+    def log_balance(self):
+        # Bundles are built offline
+        if not self.bundle:
+            logging.info('Your balance: {} Wei'.format(
+                int(self.json_rpc.eth_getBalance(self.user_address)['result'], 16)))
+
     def process(self, f):
-        with open(f) as data_file:
-            instructions = json.load(data_file)
-            logging.info('Your address: {}'.format(self.user_address))
-            for instruction in instructions:
-                logging.info('Your balance: {} Wei'.format(
-                    int(self.json_rpc.eth_getBalance(self.user_address)['result'], 16)))
-                if instruction["type"] == "deployment":
-                    self.deploy_code(
-                        instruction["file"],
-                        instruction["reference"] if "reference" in instruction else None,
-                        instruction["params"] if "params" in instruction else None,
-                        instruction["addresses"] if "addresses" in instruction else None,
-                    )
-                elif instruction["type"] == "transaction":
-                    self.send_transaction(
-                        instruction["contract"],
-                        instruction["name"],
-                        instruction["params"] if "params" in instruction else [],
-                    )
-                elif instruction["type"] == "assertion":
-                    self.assert_call(
-                        instruction["contract"],
-                        instruction["name"],
-                        instruction["params"] if "params" in instruction else [],
-                        instruction["return"]
-                    )
-            for contract_name, contract_address in self.contract_addresses.iteritems():
-                logging.info('Contract {} was created at address {}.'.format(contract_name, contract_address))
+        logging.info('Startup took {:.3f} seconds'.format(time.time() - START_TIME))
+        logging.info('Your address: {}'.format(self.user_address))
+        # Instructions are read one by one, large files are never held in memory
+        count = 0
+        for instruction in read_instructions(f):
+            if count % BALANCE_LOG_INTERVAL == 0:
+                self.log_balance()
+            count += 1
+            if instruction["type"] == "deployment":
+                self.deploy_code(
+                    instruction["file"],
+                    instruction["reference"] if "reference" in instruction else None,
+                    instruction["params"] if "params" in instruction else None,
+                    instruction["addresses"] if "addresses" in instruction else None,
+                )
+            elif instruction["type"] == "transaction":
+                self.send_transaction(
+                    instruction["contract"],
+                    instruction["name"],
+                    instruction["params"] if "params" in instruction else [],
+                )
+            elif instruction["type"] == "assertion":
+                self.assert_call(
+                    instruction["contract"],
+                    instruction["name"],
+                    instruction["params"] if "params" in instruction else [],
+                    instruction["return"]
+                )
+        self.wait_for_pending_transactions()
+        self.log_balance()
+        if self.bundle:
+            self.bundle.write(self.bundle_file)
+            logging.info('Signed {} transactions into bundle {}.'.format(len(self.bundle.transactions),
+                                                                          self.bundle_file))
+        for contract_name, contract_address in self.contract_addresses.iteritems():
+            logging.info('Contract {} was created at address {}.'.format(contract_name, contract_address))
+        if self.transactions and self.transactions.transactions:
+            logging.info('Transactions cost {} Wei in total.'.format(self.transactions.total_cost()))
+        logging.info('Processed {} instructions in {:.3f} seconds'.format(count, time.time() - START_TIME))
 
 
 @click.command()
-@click.option('-f', help='File with instructions')
+@click.option('-f', help='File with instructions, JSON list or JSON Lines (.jsonl)')
 @click.option('-protocol', default="http", help='Ethereum server protocol')
 @click.option('-host', default="localhost", help='Ethereum server host')
 @click.option('-port', default='8545', help='Ethereum server port')
@@ -213,8 +375,21 @@ class Deploy:
 @click.option('-gas', default='4712388', help='Transaction gas')
 @click.option('-gas_price', default='20000000000', help='Transaction gas price')
 @click.option('-private_key', help='Private key as hex to sign transactions')
-def setup(f, protocol, host, port, add_dev_code, verify_code, contract_dir, gas, gas_price, private_key):
-    deploy = Deploy(protocol, host, port, add_dev_code, verify_code, contract_dir, gas, gas_price, private_key)
+@click.option('-artifact_dir', help='Directory with precompiled artifacts generated by generate_abi.py')
+@click.option('-pipeline', default='false', help='Send transactions back to back using precomputed addresses')
+@click.option('-bundle', help='Sign all transactions offline into this bundle file instead of sending them')
+@click.option('-nonce', help='First nonce of the bundle')
+@click.option('-gas_timeout', default='120', help='Seconds until a transaction is replaced with a higher gas price')
+@click.option('-gas_price_factor', default='1.125', help='Gas price increase of a replacement, at least 1.1')
+@click.option('-max_gas_price', help='Gas price is never raised above this value')
+@click.option('-endpoints', help='Comma separated node URLs used instead of -host and -port')
+@click.option('-hedge_delay', default='0.5', help='Seconds until a read is sent to the next node as well')
+@click.option('-max_lag', default='3', help='Nodes more blocks behind the best node are not used')
+def setup(f, protocol, host, port, add_dev_code, verify_code, contract_dir, gas, gas_price, private_key, artifact_dir,
+          pipeline, bundle, nonce, gas_timeout, gas_price_factor, max_gas_price, endpoints, hedge_delay, max_lag):
+    deploy = Deploy(protocol, host, port, add_dev_code, verify_code, contract_dir, gas, gas_price, private_key,
+                    artifact_dir, pipeline, bundle, nonce, gas_timeout, gas_price_factor, max_gas_price, endpoints,
+                    hedge_delay, max_lag)
     deploy.process(f)
 
 if __name__ == '__main__':
@@ -0,0 +1,148 @@
+from ethereum.abi import ContractTranslator
+from multisig_index import RpcLog
+from contract_abi import load_abi
+import click
+import logging
+logging.basicConfig(level=logging.INFO)
+
+MAX_TOKENS_SOLD = 9000000 * 10 ** 18
+# Offset of the block difference in calcTokenPrice
+PRICE_OFFSET = 7500
+
+
+def crossing_offset(price_factor, total_received):
+    """
+    Returns the smallest block difference d = block - startBlock + 7500 with calcTokenPrice() <= calcStopPrice().
+    With P = priceFactor * 10**18 and S = totalReceived * 10**18 / MAX_TOKENS_SOLD the condition P / d + 1 <= S + 1
+    holds exactly for d > P / (S + 1) in integer division.
+    """
+    stop_price = total_received * 10 ** 18 / MAX_TOKENS_SOLD
+    return price_factor * 10 ** 18 / (stop_price + 1) + 1
+
+
+class AuctionEndPredictor:
+    """
+    Predicts the block in which the token price of a DutchAuction falls to the stop price and the auction is
+    finalized. The crossing is solved in closed form and updated on every BidSubmission, so predictions are a few
+    integer operations.
+    """
+
+    def __init__(self, auction_address, price_factor, start_block, total_received=0, ceiling=None,
+                 seconds_per_block=15, last_block=-1):
+        self.auction_address = auction_address
+        self.translator = ContractTranslator(load_abi('DutchAuction'))
+        self.price_factor = price_factor
+        self.start_block = start_block
+        self.ceiling = ceiling
+        self.seconds_per_block = seconds_per_block
+        self.last_block = last_block
+        self.total_received = total_received
+        self.crossing_block = self.calc_crossing_block(total_received)
+
+    @classmethod
+    def from_reader(cls, reader, block=None, seconds_per_block=15):
+        """
+        Creates a predictor from the auction state read by an AuctionStateReader with the fields priceFactor,
+        startBlock, totalReceived and ceiling.
+        """
+        state = reader.read(block)
+        return cls(reader.auction_address, state['priceFactor'], state['startBlock'], state['totalReceived'],
+                   state['ceiling'], seconds_per_block, last_block=state['block'])
+
+    def calc_crossing_block(self, total_received):
+        return self.start_block + crossing_offset(self.price_factor, total_received) - PRICE_OFFSET
+
+    def add_bid(self, amount):
+        self.total_received += amount
+        self.crossing_block = self.calc_crossing_block(self.total_received)
+
+    def ingest_log(self, log):
+        event = self.translator.listen(RpcLog(log), noprint=True)
+        if event and event["_event_type"] == "BidSubmission":
+            self.add_bid(event["amount"])
+
+    def sync(self, json_rpc, to_block=None, chunk_size=10000):
+        """
+        Fetches and applies all bids since the last synced block. Returns the number of ingested logs.
+        """
+        if to_block is None:
+            to_block = json_rpc.block_number()
+        count = 0
+        from_block = self.last_block + 1
+        while from_block <= to_block:
+            chunk_end = min(from_block + chunk_size - 1, to_block)
+            response = json_rpc.call("eth_getLogs", [{"address": self.auction_address,
+                                                      "fromBlock": hex(from_block).rstrip("L"),
+                                                      "toBlock": hex(chunk_end).rstrip("L")}])
+            if "error" in response:
+                raise ValueError('Fetching logs failed with error {}'.format(response["error"]))
+            for log in response["result"]:
+                self.ingest_log(log)
+                count += 1
+            self.last_block = chunk_end
+            from_block = chunk_end + 1
+        return count
+
+    def token_price(self, block):
+        return self.price_factor * 10 ** 18 / (block - self.start_block + PRICE_OFFSET) + 1
+
+    def predict(self, current_block=None, extra_inflow=0):
+        """
+        Returns the predicted end of the auction assuming extra_inflow Wei are bid in current_block in addition to the
+        current total. Like the contract, the inflow is capped at the Wei buying all tokens at the current price and at
+        the ceiling, a bid reaching either cap ends the auction immediately.
+        """
+        if current_block is None:
+            current_block = self.last_block
+        price = self.token_price(current_block)
+        limit = MAX_TOKENS_SOLD / 10 ** 18 * price
+        if self.ceiling is not None:
+            limit = min(limit, self.ceiling)
+        total_received = min(self.total_received + extra_inflow, max(limit, self.total_received))
+        if total_received >= limit:
+            end_block = current_block
+            ceiling_reached = total_received == self.ceiling
+        else:
+            crossing_block = self.crossing_block if not extra_inflow else self.calc_crossing_block(total_received)
+            end_block = max(current_block, crossing_block)
+            ceiling_reached = False
+        blocks_left = end_block - current_block
+        if ceiling_reached:
+            final_price = price
+        else:
+            final_price = total_received * 10 ** 18 / MAX_TOKENS_SOLD + 1
+        return {
+            'end_block': end_block,
+            'blocks_left': blocks_left,
+            'seconds_left': blocks_left * self.seconds_per_block,
+            'final_price': final_price,
+            'total_received': total_received,
+            'ceiling_reached': ceiling_reached,
+        }
+
+    def predict_inflows(self, inflows, current_block=None):
+        """
+        Returns predictions for a list of hypothetical extra inflows.
+        """
+        return [(inflow, self.predict(current_block, inflow)) for inflow in inflows]
+
+
+@click.command()
+@click.option('-protocol', default="http", help='Ethereum server protocol')
+@click.option('-host', default="localhost", help='Ethereum server host')
+@click.option('-port', default='8545', help='Ethereum server port')
+@click.option('-auction', help='Dutch auction address')
+@click.option('-inflow', multiple=True, type=int, help='Hypothetical extra inflow in Ether, can be repeated')
+def setup(protocol, host, port, auction, inflow):
+    from rpc import JsonRpc
+    from auction_reader import AuctionStateReader
+    json_rpc = JsonRpc(protocol, host, port)
+    reader = AuctionStateReader(json_rpc, auction, fields=('priceFactor', 'startBlock', 'totalReceived', 'ceiling'))
+    predictor = AuctionEndPredictor.from_reader(reader)
+    for extra_inflow, prediction in predictor.predict_inflows([0] + [ether * 10 ** 18 for ether in inflow]):
+        logging.info('Extra inflow {} Wei: auction ends in block {} in {} blocks (~{} seconds) at price {}{}'.format(
+            extra_inflow, prediction['end_block'], prediction['blocks_left'], prediction['seconds_left'],
+            prediction['final_price'], ', ceiling reached' if prediction['ceiling_reached'] else ''))
+
+if __name__ == '__main__':
+    setup()
@@ -0,0 +1,216 @@
+from ethereum.tester import accounts, TransactionFailed
+from simulation import AuctionSimulation
+from multiprocessing import Pool
+import random
+import click
+import time
+import json
+import logging
+logging.basicConfig(level=logging.INFO)
+
+TOTAL_TOKENS = 10000000 * 10 ** 18
+BIDDERS = [2, 3, 4, 5, 6]
+MAX_BID = 300000 * 10 ** 18
+MAX_BLOCKS = 20000
+MAX_SECONDS = 60 * 60 * 24 * 8
+
+# Simulation of a worker process, deployed and started once and reverted to its snapshot for every sequence
+_simulation = None
+_snapshot = None
+
+
+def generate_sequence(rnd, length):
+    """
+    Returns a random sequence of steps. Steps are tuples so sequences can be printed and replayed.
+    """
+    steps = []
+    for _ in range(length):
+        kind = rnd.choice(['bid', 'bid', 'bid', 'advance', 'advance', 'update_stage', 'claim'])
+        if kind == 'bid':
+            receiver = rnd.choice(BIDDERS) if rnd.random() < 0.3 else None
+            # Log-uniform values to cover dust bids as well as bids above the ceiling
+            steps.append(('bid', rnd.choice(BIDDERS), receiver, int(2 ** rnd.uniform(0, 78.1))))
+        elif kind == 'advance':
+            blocks = rnd.randint(0, MAX_BLOCKS)
+            seconds = rnd.randint(0, MAX_SECONDS) if rnd.random() < 0.2 else blocks * 15
+            steps.append(('advance', blocks, seconds))
+        elif kind == 'update_stage':
+            steps.append(('update_stage',))
+        else:
+            receiver = rnd.choice(BIDDERS) if rnd.random() < 0.3 else None
+            steps.append(('claim', rnd.choice(BIDDERS), receiver))
+    return steps
+
+
+def execute_step(simulation, step):
+    kind = step[0]
+    try:
+        if kind == 'bid':
+            _, sender, receiver, value = step
+            simulation.bid(value, receiver=accounts[receiver] if receiver else None, sender=sender)
+        elif kind == 'advance':
+            simulation.advance(step[1], step[2])
+        elif kind == 'update_stage':
+            simulation.update_stage()
+        else:
+            _, sender, receiver = step
+            simulation.claim_tokens(receiver=accounts[receiver] if receiver else None, sender=sender)
+    except TransactionFailed:
+        # Rejected transactions are valid behaviour, invariants are still checked
+        pass
+
+
+def check_invariants(simulation):
+    """
+    Returns a description of the first violated invariant or None.
+    """
+    auction = simulation.dutch_auction
+    token = simulation.gnosis_token
+    wallet = simulation.multisig_wallet.address
+    if token.totalSupply() != TOTAL_TOKENS:
+        return 'Total supply {} is not {}'.format(token.totalSupply(), TOTAL_TOKENS)
+    if simulation.s.block.get_balance(auction.address) != 0:
+        return 'Auction holds {} Wei'.format(simulation.s.block.get_balance(auction.address))
+    if auction.totalReceived() > auction.ceiling():
+        return 'Total received {} exceeds ceiling {}'.format(auction.totalReceived(), auction.ceiling())
+    claimed = sum(token.balanceOf(accounts[bidder]) for bidder in BIDDERS)
+    wallet_tokens = token.balanceOf(wallet)
+    auction_tokens = token.balanceOf(auction.address)
+    if claimed + wallet_tokens + auction_tokens != TOTAL_TOKENS:
+        return 'Claimed {}, wallet {} and auction {} tokens do not add up to {}'.format(
+            claimed, wallet_tokens, auction_tokens, TOTAL_TOKENS)
+    if auction.stage() < 3:
+        if auction_tokens != AuctionSimulation.MAX_TOKENS_SOLD or claimed != 0:
+            return 'Tokens moved before auction ended'
+        return None
+    final_price = auction.finalPrice()
+    sold_tokens = auction.totalReceived() * 10 ** 18 / final_price
+    if wallet_tokens != AuctionSimulation.PREASSIGNED_TOKENS + AuctionSimulation.MAX_TOKENS_SOLD - sold_tokens:
+        return 'Wallet holds {} tokens, {} unsold tokens expected'.format(
+            wallet_tokens, AuctionSimulation.MAX_TOKENS_SOLD - sold_tokens)
+    outstanding = sum(auction.bids(accounts[bidder]) * 10 ** 18 / final_price for bidder in BIDDERS)
+    if outstanding > auction_tokens:
+        return 'Outstanding claims {} exceed auction balance {}'.format(outstanding, auction_tokens)
+    return None
+
+
+def run_sequence(simulation, snapshot, steps):
+    """
+    Runs steps from snapshot and checks invariants after every step. Returns (step index, violation) or None.
+    """
+    simulation.revert(snapshot)
+    for i, step in enumerate(steps):
+        execute_step(simulation, step)
+        violation = check_invariants(simulation)
+        if violation:
+            return i, violation
+    return None
+
+
+def shrink(steps, fails):
+    """
+    Returns a smaller sequence for which fails still returns True. Chunks of steps are removed first, then bid values
+    and advances are halved.
+    """
+    chunk = len(steps) / 2
+    while chunk >= 1:
+        i = 0
+        while i < len(steps):
+            candidate = steps[:i] + steps[i + chunk:]
+            if candidate and fails(candidate):
+                steps = candidate
+            else:
+                i += chunk
+        chunk /= 2
+    for i, step in enumerate(steps):
+        while True:
+            if step[0] == 'bid' and step[3] > 1:
+                smaller = step[:3] + (step[3] / 2,)
+            elif step[0] == 'advance' and (step[1] or step[2]):
+                smaller = ('advance', step[1] / 2, step[2] / 2)
+            else:
+                break
+            candidate = steps[:i] + [smaller] + steps[i + 1:]
+            if not fails(candidate):
+                break
+            steps = candidate
+            step = smaller
+    return steps
+
+
+def setup_simulation(contract_dir):
+    simulation = AuctionSimulation(contract_dir=contract_dir)
+    simulation.start()
+    return simulation, simulation.snapshot()
+
+
+def init_worker(contract_dir):
+    global _simulation, _snapshot
+    _simulation, _snapshot = setup_simulation(contract_dir)
+
+
+def fuzz_seed(args):
+    seed, length = args
+    steps = generate_sequence(random.Random(seed), length)
+    return seed, run_sequence(_simulation, _snapshot, steps)
+
+
+class Fuzzer:
+    """
+    Runs random sequences of auction interactions in a process pool, every worker with its own deployed simulation.
+    Failing sequences are reproduced from their seed and shrunk.
+    """
+
+    def __init__(self, contract_dir='contracts/solidity/', processes=None, sequence_length=30, seed=0):
+        self.contract_dir = contract_dir
+        self.processes = processes
+        self.sequence_length = sequence_length
+        self.seed = seed
+
+    def run(self, sequences):
+        tasks = [(self.seed + i, self.sequence_length) for i in range(sequences)]
+        start_time = time.time()
+        if self.processes == 1:
+            init_worker(self.contract_dir)
+            results = map(fuzz_seed, tasks)
+        else:
+            pool = Pool(self.processes, initializer=init_worker, initargs=(self.contract_dir,))
+            results = pool.map(fuzz_seed, tasks, chunksize=max(1, sequences / (4 * (self.processes or 4))))
+            pool.close()
+            pool.join()
+        duration = time.time() - start_time
+        failures = [self.shrink_failure(seed) for seed, failure in results if failure]
+        return {
+            'sequences': sequences,
+            'duration': duration,
+            'sequences_per_second': sequences / duration if duration else 0,
+            'failures': failures,
+        }
+
+    def shrink_failure(self, seed):
+        simulation, snapshot = setup_simulation(self.contract_dir)
+        steps = generate_sequence(random.Random(seed), self.sequence_length)
+        steps = shrink(steps, lambda candidate: run_sequence(simulation, snapshot, candidate) is not None)
+        index, violation = run_sequence(simulation, snapshot, steps)
+        return {'seed': seed, 'steps': steps[:index + 1], 'violation': violation}
+
+
+@click.command()
+@click.option('-sequences', default=1000, help='Number of random sequences')
+@click.option('-length', default=30, help='Steps per sequence')
+@click.option('-processes', default=None, type=int, help='Worker processes, defaults to number of CPUs')
+@click.option('-seed', default=0, help='Seed of the first sequence')
+@click.option('-contract_dir', default='solidity/', help='Import directory')
+def setup(sequences, length, processes, seed, contract_dir):
+    fuzzer = Fuzzer(contract_dir, processes, length, seed)
+    result = fuzzer.run(sequences)
+    logging.info('Ran {} sequences in {:.3f} seconds, {:.1f} sequences/sec'.format(
+        result['sequences'], result['duration'], result['sequences_per_second']))
+    for failure in result['failures']:
+        logging.info('Seed {} violates invariant: {}'.format(failure['seed'], failure['violation']))
+        logging.info('Shrunk sequence: {}'.format(json.dumps(failure['steps'])))
+    if result['failures']:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    setup()
@@ -0,0 +1,245 @@
+from ethereum.slogging import LogRecorder
+from artifacts import compile_combined
+from collections import defaultdict
+import bisect
+import click
+import logging
+logging.basicConfig(level=logging.INFO)
+
+CALL_OPS = ('CALL', 'CALLCODE', 'DELEGATECALL')
+# Gas not spent by an opcode of the trace: intrinsic gas of the transaction minus refunds
+INTRINSIC = '[intrinsic and refunds]'
+
+
+def instruction_indexes(runtime):
+    """
+    Returns the instruction index of every program counter in hex runtime bytecode, push data is skipped.
+    """
+    code = runtime.decode('hex')
+    indexes = {}
+    pc = 0
+    index = 0
+    while pc < len(code):
+        indexes[pc] = index
+        op = ord(code[pc])
+        pc += 1 + (op - 0x5f if 0x60 <= op <= 0x7f else 0)
+        index += 1
+    return indexes
+
+
+def decode_source_map(source_map):
+    """
+    Expands a compressed solc source map into (start, length, file index, jump) per instruction. Empty fields repeat
+    the value of the previous instruction.
+    """
+    entries = []
+    entry = [0, 0, 0, '-']
+    for item in source_map.split(';'):
+        for position, field in enumerate(item.split(':')):
+            if field:
+                entry[position] = field if position == 3 else int(field)
+        entries.append(tuple(entry))
+    return entries
+
+
+class ContractSource:
+    """
+    Preprocessed source of a deployed contract with the source map of its runtime bytecode.
+    """
+
+    def __init__(self, name, code, runtime, source_map=None):
+        self.name = name
+        self.code = code
+        self.line_starts = [0] + [index + 1 for index, char in enumerate(code) if char == '\n']
+        self.instructions = instruction_indexes(runtime)
+        self.source_map = decode_source_map(source_map) if source_map else []
+
+    def line(self, pc):
+        """
+        Returns the line of the source mapped to the instruction at pc or None for compiler generated code.
+        """
+        index = self.instructions.get(pc)
+        if index is None or index >= len(self.source_map):
+            return None
+        start, _, file_index, _ = self.source_map[index]
+        if file_index < 0:
+            return None
+        return bisect.bisect_right(self.line_starts, start)
+
+
+class GasProfiler:
+    """
+    Runs tester calls with VM tracing and attributes their gas to opcodes and lines of the preprocessed source. The
+    gas of an instruction is the gas left before it minus the gas left before the next instruction of the same call
+    frame, gas of nested calls is attributed to the instructions of the called contract.
+    """
+
+    def __init__(self, state):
+        self.s = state
+        self.contracts = {}
+        # opcode -> [count, gas]
+        self.opcodes = defaultdict(lambda: [0, 0])
+        # (contract name, line) -> gas
+        self.lines = defaultdict(int)
+        # folded stack -> gas
+        self.stacks = defaultdict(int)
+        self.total_gas = 0
+
+    def add_contract(self, contract, name, code):
+        """
+        Registers the preprocessed source of a deployed contract. Lines are only attributed if solc produces the
+        deployed runtime bytecode, otherwise gas is attributed to opcodes only.
+        """
+        runtime = self.s.block.get_code(contract.address).encode('hex')
+        compiled = compile_combined(code, 'bin-runtime,srcmap-runtime')
+        source_map = None
+        if compiled and compiled['bin-runtime'] == runtime:
+            source_map = compiled['srcmap-runtime']
+        else:
+            logging.info('No source map for {}, gas is attributed to opcodes only.'.format(name))
+        self.contracts[contract.address.encode('hex')] = ContractSource(name, code, runtime, source_map)
+
+    def trace(self, contract, function_name, *args, **kwargs):
+        """
+        Calls a contract function with VM tracing. Returns the profiling result of the tester and the traced steps.
+        """
+        recorder = LogRecorder(log_config=':info,eth.vm.op:trace')
+        try:
+            result = getattr(contract, function_name)(*args, profiling=True, **kwargs)
+        finally:
+            records = recorder.pop_records()
+        return result, [record for record in records if record['event'] == 'vm']
+
+    def name(self, address):
+        return self.contracts[address].name if address in self.contracts else address
+
+    def line(self, address, pc):
+        return self.name(address), self.contracts[address].line(pc) if address in self.contracts else None
+
+    def label(self, address, pc):
+        name, line = self.line(address, pc)
+        return '{}:{}'.format(name, line or '?')
+
+    def profile(self, contract, function_name, *args, **kwargs):
+        """
+        Profiles one call and adds its gas to the totals. Returns the output of the call.
+        """
+        result, steps = self.trace(contract, function_name, *args, **kwargs)
+        root = '{}.{}'.format(self.name(contract.address.encode('hex')), function_name)
+        costs = [0] * len(steps)
+        children = [0] * len(steps)
+        # Code address and opening call step of every active depth
+        frames = [contract.address.encode('hex')]
+        openers = [None]
+        # Step of every active depth waiting for its cost
+        previous = {}
+        lines = []
+        stacks = []
+        for index, step in enumerate(steps):
+            depth = int(step['depth'])
+            while len(frames) - 1 > depth:
+                # Last instruction of a returned frame, STOP and RETURN cost nothing beyond memory paid before
+                previous.pop(len(frames) - 1, None)
+                frames.pop()
+                openers.pop()
+            if depth == len(frames):
+                opener = previous[depth - 1]
+                # Stack before the call: gas, address, ...
+                frames.append('{:040x}'.format(int(steps[opener]['stack'][-2]) % 2 ** 160))
+                openers.append(opener)
+            if depth in previous:
+                last = previous[depth]
+                costs[last] = int(steps[last]['gas']) - int(step['gas'])
+                if openers[depth] is not None:
+                    children[openers[depth]] += costs[last]
+            previous[depth] = index
+            pc = int(step['pc'])
+            lines.append(self.line(frames[depth], pc))
+            # Calling lines of all outer frames, then the current line
+            stacks.append([self.label(frames[d], int(steps[openers[d + 1]]['pc'])) for d in range(depth)] +
+                          [self.label(frames[depth], pc)])
+        for index, step in enumerate(steps):
+            op = step['op']
+            gas = costs[index] - children[index] if op in CALL_OPS else costs[index]
+            self.opcodes[op][0] += 1
+            self.opcodes[op][1] += gas
+            self.lines[lines[index]] += gas
+            self.stacks[';'.join([root] + stacks[index] + [op])] += gas
+        traced_gas = sum(costs[index] for index, step in enumerate(steps) if int(step['depth']) == 0)
+        self.opcodes[INTRINSIC][0] += 1
+        self.opcodes[INTRINSIC][1] += result['gas'] - traced_gas
+        self.stacks[';'.join([root, INTRINSIC.replace(' ', '_')])] += result['gas'] - traced_gas
+        self.total_gas += result['gas']
+        return result['output']
+
+    def opcode_report(self):
+        lines = ['{:<28} {:>8} {:>12} {:>7}'.format('Opcode', 'Count', 'Gas', '%')]
+        for op, (count, gas) in sorted(self.opcodes.iteritems(), key=lambda item: item[1][1], reverse=True):
+            lines.append('{:<28} {:>8} {:>12} {:>7.2f}'.format(op, count, gas, 100.0 * gas / (self.total_gas or 1)))
+        return '\n'.join(lines) + '\n'
+
+    def annotated_source(self):
+        """
+        Returns the source of every profiled contract with the gas attributed to each line in front of it.
+        """
+        sections = []
+        for source in sorted(self.contracts.values(), key=lambda contract_source: contract_source.name):
+            lines = ['{} ({} gas, {} gas without source line)'.format(
+                source.name, sum(gas for (name, _), gas in self.lines.iteritems() if name == source.name),
+                self.lines.get((source.name, None), 0))]
+            for line_number, text in enumerate(source.code.split('\n'), 1):
+                gas = self.lines.get((source.name, line_number), 0)
+                lines.append('{:>10} {:>5}  {}'.format(gas or '', line_number, text))
+            sections.append('\n'.join(lines))
+        return '\n\n'.join(sections) + '\n'
+
+    def write_reports(self, report_file_name, folded_file_name):
+        """
+        Writes opcode and annotated source report and the folded stacks used by flamegraph.pl.
+        """
+        with open(report_file_name, 'w') as report_file:
+            report_file.write(self.opcode_report() + '\n' + self.annotated_source())
+        with open(folded_file_name, 'w') as folded_file:
+            for stack, gas in sorted(self.stacks.iteritems()):
+                if gas > 0:
+                    folded_file.write('{} {}\n'.format(stack, gas))
+
+
+@click.command()
+@click.option('-contract_dir', default='solidity/', help='Import directory')
+@click.option('-report', default='gas_report.txt', help='Opcode and annotated source report')
+@click.option('-folded', default='gas.folded', help='Folded stacks for flamegraph.pl')
+@click.option('-path', default='all', help='Hot path to profile: bid, finalize, claim or all')
+def setup(contract_dir, report, folded, path):
+    from simulation import AuctionSimulation
+    from preprocessor import PreProcessor
+    from ethereum.tester import keys, accounts
+    simulation = AuctionSimulation(contract_dir=contract_dir)
+    simulation.start()
+    pp = PreProcessor()
+    profiler = GasProfiler(simulation.s)
+    profiler.add_contract(simulation.dutch_auction, 'DutchAuction',
+                          pp.process('DO/DutchAuction.sol', contract_dir=contract_dir))
+    profiler.add_contract(simulation.gnosis_token, 'GnosisToken',
+                          pp.process('Tokens/GnosisToken.sol', contract_dir=contract_dir))
+    bidder = simulation.BIDDER
+    simulation.s.block.set_balance(accounts[bidder], AuctionSimulation.CEILING * 2)
+    # A first bid, a bid reaching the ceiling and finalizing the auction, and a claim after the waiting period
+    if path in ('bid', 'all'):
+        profiler.profile(simulation.dutch_auction, 'bid', accounts[bidder], sender=keys[bidder], value=10 ** 18)
+    else:
+        simulation.bid(10 ** 18)
+    if path in ('finalize', 'all'):
+        profiler.profile(simulation.dutch_auction, 'bid', accounts[bidder], sender=keys[bidder],
+                         value=AuctionSimulation.CEILING)
+    else:
+        simulation.bid(AuctionSimulation.CEILING)
+    simulation.advance(seconds=AuctionSimulation.WAITING_PERIOD + 1)
+    if path in ('claim', 'all'):
+        profiler.profile(simulation.dutch_auction, 'claimTokens', accounts[bidder], sender=keys[bidder])
+    profiler.write_reports(report, folded)
+    logging.info('Profiled {} gas, report written to {} and folded stacks to {}.'.format(profiler.total_gas, report,
+                                                                                     folded))
+
+if __name__ == '__main__':
+    setup()
@@ -1,6 +1,8 @@
-from ethereum.tester import languages
+from artifacts import Artifact
 from preprocessor import PreProcessor
 import json
+import os
+import re
 
 pp = PreProcessor()
 contracts = ['DO/DutchAuction.sol',
@@ -8,13 +10,23 @@ contracts = ['DO/DutchAuction.sol',
              'DO/ClaimProxy.sol',
              'DO/Disbursement.sol']
 contract_dir = 'solidity/'
+artifact_dir = 'build/'
+
+if not os.path.isdir(artifact_dir):
+    os.makedirs(artifact_dir)
 
 for contract_name in contracts:
-    code = pp.process(contract_name, add_dev_code=False, contract_dir=contract_dir, replace_unknown_addresses=True)
-    compiled = languages["solidity"].combined(code)[-1][1]
-    # save abi
+    code = pp.process(contract_name, add_dev_code=False, contract_dir=contract_dir)
+    placeholders = sorted(set(re.findall(r'\{\{(\S*?)\}\}', code)))
+    # Replace unknown addresses with 0x0
+    code = re.sub(r'\{\{\S*\}\}', '0x0', code)
     file_name = contract_name.split(".")[0].split("/")[-1]
+    artifact = Artifact.compile(code, file_name, placeholders=placeholders)
+    # save abi
     h = open("abi/{}.json".format(file_name), "w+")
-    h.write(json.dumps(compiled["abi"]))
+    h.write(json.dumps(artifact.abi))
     h.close()
     print '{} ABI generated.'.format(file_name)
+    # save artifact
+    artifact.save(artifact_dir)
+    print '{} artifact generated.'.format(file_name)
@@ -0,0 +1,182 @@
+from multiprocessing.pool import ThreadPool
+from packed_encoding import encode_uint
+import random
+import click
+import json
+import logging
+logging.basicConfig(level=logging.INFO)
+
+# sha3('Transfer(address,address,uint256)')
+TRANSFER_TOPIC = '0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef'
+ZERO_ADDRESS = '0' * 40
+# Selectors of balanceOf(address) and totalSupply()
+BALANCE_OF = '0x70a08231'
+TOTAL_SUPPLY = '0x18160ddd'
+ADDRESS_SIZE = 20
+BALANCE_SIZE = 32
+
+
+def decode_transfer(log):
+    """
+    Returns sender, receiver and value of a Transfer log returned by eth_getLogs or emitted by the tester.
+    """
+    if isinstance(log, dict):
+        return log["topics"][1][-40:], log["topics"][2][-40:], int(log["data"][2:] or '0', 16)
+    sender = '{:064x}'.format(log.topics[1])[-40:]
+    receiver = '{:064x}'.format(log.topics[2])[-40:]
+    return sender, receiver, int(log.data.encode('hex') or '0', 16)
+
+
+def fold_transfers(logs, balances=None):
+    """
+    Adds balance changes of Transfer logs to balances. Changes commute, so chunks can be folded in any order.
+    """
+    balances = balances if balances is not None else {}
+    for log in logs:
+        sender, receiver, value = decode_transfer(log)
+        balances[sender] = balances.get(sender, 0) - value
+        balances[receiver] = balances.get(receiver, 0) + value
+    return balances
+
+
+def write_snapshot(file_name, balances, header):
+    """
+    Writes balances in columnar format: a JSON header line followed by the address column with 20 bytes per holder
+    and the balance column with 32 bytes per holder, both sorted by address.
+    """
+    addresses = sorted(balances)
+    header = dict(header, count=len(addresses),
+                  columns=[['address', ADDRESS_SIZE], ['balance', BALANCE_SIZE]])
+    with open(file_name, 'wb') as snapshot_file:
+        snapshot_file.write(json.dumps(header) + '\n')
+        snapshot_file.write(''.join(address.decode('hex') for address in addresses))
+        snapshot_file.write(''.join(encode_uint(balances[address]) for address in addresses))
+
+
+def read_snapshot(file_name):
+    """
+    Returns header and balances of a snapshot written by write_snapshot.
+    """
+    with open(file_name, 'rb') as snapshot_file:
+        header = json.loads(snapshot_file.readline())
+        count = header['count']
+        addresses = snapshot_file.read(count * ADDRESS_SIZE)
+        balances = snapshot_file.read(count * BALANCE_SIZE)
+    return header, dict(
+        (addresses[i * ADDRESS_SIZE:(i + 1) * ADDRESS_SIZE].encode('hex'),
+         int(balances[i * BALANCE_SIZE:(i + 1) * BALANCE_SIZE].encode('hex'), 16))
+        for i in range(count))
+
+
+class HolderSnapshot:
+    """
+    Computes balances of all token holders at a block from Transfer events. Block ranges are fetched concurrently
+    and folded into balance changes by the worker threads, so only one change per holder and chunk is kept in
+    memory.
+    """
+
+    def __init__(self, json_rpc, token_address, from_block=0, chunk_size=5000, threads=8):
+        self.json_rpc = json_rpc
+        self.token_address = token_address
+        self.from_block = from_block
+        self.chunk_size = chunk_size
+        self.threads = threads
+        self.transfer_count = 0
+
+    def fetch_chunk(self, block_range):
+        """
+        Returns folded balance changes of a block range. Ranges rejected by the node, e.g. because of too many
+        results, are split in halves.
+        """
+        from_block, to_block = block_range
+        response = self.json_rpc.call("eth_getLogs", [{"address": self.token_address,
+                                                       "fromBlock": hex(from_block).rstrip("L"),
+                                                       "toBlock": hex(to_block).rstrip("L"),
+                                                       "topics": [TRANSFER_TOPIC]}])
+        if "error" in response:
+            if from_block == to_block:
+                raise ValueError('Fetching logs of block {} failed with error {}'.format(from_block,
+                                                                                         response["error"]))
+            middle = (from_block + to_block) / 2
+            changes, count = self.fetch_chunk((from_block, middle))
+            upper_changes, upper_count = self.fetch_chunk((middle + 1, to_block))
+            for address, change in upper_changes.iteritems():
+                changes[address] = changes.get(address, 0) + change
+            return changes, count + upper_count
+        return fold_transfers(response["result"]), len(response["result"])
+
+    def balances(self, block):
+        """
+        Returns balances of all holders with a positive balance at block.
+        """
+        ranges = [(start, min(start + self.chunk_size - 1, block))
+                  for start in range(self.from_block, block + 1, self.chunk_size)]
+        pool = ThreadPool(self.threads)
+        balances = {}
+        self.transfer_count = 0
+        try:
+            for changes, count in pool.imap_unordered(self.fetch_chunk, ranges):
+                self.transfer_count += count
+                for address, change in changes.iteritems():
+                    balances[address] = balances.get(address, 0) + change
+        finally:
+            pool.close()
+            pool.join()
+        # Minted tokens are transferred from the zero address
+        balances.pop(ZERO_ADDRESS, None)
+        return dict((address, balance) for address, balance in balances.iteritems() if balance)
+
+    def cross_check(self, balances, block, sample_size=100, rnd=random):
+        """
+        Compares totalSupply and balanceOf of a random sample of holders at block with balances. Returns a list of
+        mismatches as (address, expected, actual), address None for totalSupply.
+        """
+        block_tag = hex(block).rstrip("L")
+        sample = rnd.sample(sorted(balances), min(sample_size, len(balances)))
+        calls = [("eth_call", [{"to": self.token_address, "data": TOTAL_SUPPLY}, block_tag])]
+        calls += [("eth_call", [{"to": self.token_address, "data": BALANCE_OF + address.zfill(64)}, block_tag])
+                  for address in sample]
+        responses = self.json_rpc.batch(calls)
+        for response in responses:
+            if "error" in response:
+                raise ValueError('Call at block {} failed with error {}'.format(block, response["error"]))
+        results = [int(response["result"], 16) for response in responses]
+        mismatches = []
+        if results[0] != sum(balances.itervalues()):
+            mismatches.append((None, sum(balances.itervalues()), results[0]))
+        for address, actual in zip(sample, results[1:]):
+            if balances[address] != actual:
+                mismatches.append((address, balances[address], actual))
+        return mismatches
+
+    def export(self, file_name, block=None, sample_size=100):
+        if block is None:
+            block = self.json_rpc.block_number()
+        balances = self.balances(block)
+        mismatches = self.cross_check(balances, block, sample_size)
+        if mismatches:
+            raise ValueError('Snapshot at block {} does not match token state: {}'.format(block, mismatches))
+        write_snapshot(file_name, balances, {'token': self.token_address, 'block': block})
+        return balances
+
+
+@click.command()
+@click.option('-protocol', default="http", help='Ethereum server protocol')
+@click.option('-host', default="localhost", help='Ethereum server host')
+@click.option('-port', default='8545', help='Ethereum server port')
+@click.option('-token', help='Gnosis token address')
+@click.option('-f', help='Output file')
+@click.option('-block', default=None, type=int, help='Snapshot block, defaults to latest block')
+@click.option('-from_block', default=0, help='Block the token was created in')
+@click.option('-chunk_size', default=5000, help='Blocks per eth_getLogs request')
+@click.option('-threads', default=8, help='Concurrent requests')
+@click.option('-sample_size', default=100, help='Holders cross-checked with balanceOf')
+def setup(protocol, host, port, token, f, block, from_block, chunk_size, threads, sample_size):
+    from rpc import JsonRpc
+    snapshot = HolderSnapshot(JsonRpc(protocol, host, port), token, from_block, chunk_size, threads)
+    balances = snapshot.export(f, block, sample_size)
+    logging.info('Folded {} transfers into {} holders, written to {}.'.format(snapshot.transfer_count,
+                                                                              len(balances), f))
+
+if __name__ == '__main__':
+    setup()
@@ -0,0 +1,114 @@
+from string import Template
+import json
+import csv
+import os
+import re
+
+
+def read_rows(file_name, int_columns=()):
+    """
+    Yields rows of a data table as dicts. CSV files need a header line, cells are strings except for int_columns,
+    which are converted to int. JSON Lines files contain one object per line.
+    """
+    with open(file_name) as data_file:
+        if file_name.endswith('.csv'):
+            for row in csv.DictReader(data_file):
+                for column in int_columns:
+                    row[column] = int(row[column])
+                yield row
+        else:
+            for line in data_file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def read_json_list(data_file, chunk_size=2 ** 16):
+    """
+    Yields the items of a JSON list one by one. The file is read in chunks, only the item being decoded is held in
+    memory.
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(lambda: data_file.read(chunk_size), '')
+    buffer = ''
+    # start: before the opening bracket, first: before the first item or the closing bracket, item: after a comma,
+    # next: after an item
+    state = 'start'
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            buffer = next(chunks, None)
+            if buffer is None:
+                raise ValueError('JSON list in {} is not closed'.format(data_file.name))
+        elif state == 'start':
+            if buffer[0] != '[':
+                raise ValueError('{} does not contain a JSON list'.format(data_file.name))
+            buffer, state = buffer[1:], 'first'
+        elif state == 'next' and buffer[0] == ',':
+            buffer, state = buffer[1:], 'item'
+        elif state in ('first', 'next') and buffer[0] == ']':
+            return
+        elif state == 'next':
+            raise ValueError('Expected , or ] in JSON list in {}'.format(data_file.name))
+        else:
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except ValueError:
+                end = None
+            # An item not followed by a separator may continue in the next chunk, like a number split after a digit
+            if end is None or buffer[end:].lstrip()[:1] not in (',', ']'):
+                chunk = next(chunks, None)
+                if chunk is not None:
+                    buffer += chunk
+                    continue
+                if end is None:
+                    raise ValueError('Invalid item in JSON list in {}'.format(data_file.name))
+            yield item
+            buffer, state = buffer[end:], 'next'
+
+
+def substitute(value, row):
+    """
+    Replaces $column and ${column} in all strings of an instruction with values of row. A string consisting of one
+    placeholder only is replaced with the typed value.
+    """
+    if isinstance(value, list):
+        return [substitute(v, row) for v in value]
+    if isinstance(value, dict):
+        return dict((k, substitute(v, row)) for k, v in value.iteritems())
+    if isinstance(value, basestring) and '$' in value:
+        match = re.match(r'^\$(?:\{(\w+)\}|(\w+))$', value)
+        column = match and (match.group(1) or match.group(2))
+        if column in row:
+            return row[column]
+        return Template(value).safe_substitute(row)
+    return value
+
+
+def expand(instruction, base_dir):
+    """
+    Yields instructions, expanding repeat instructions over the rows of their data table. CSV columns listed in
+    int_columns of the repeat instruction are converted to int.
+    """
+    if instruction["type"] != "repeat":
+        yield instruction
+        return
+    for row in read_rows(os.path.join(base_dir, instruction["data"]), instruction.get("int_columns", ())):
+        for step in instruction["steps"]:
+            for expanded in expand(substitute(step, row), base_dir):
+                yield expanded
+
+
+def read_instructions(file_name):
+    """
+    Yields instructions one by one while the file is read. Files ending with .jsonl contain one instruction per line,
+    other files a JSON list.
+    """
+    base_dir = os.path.dirname(file_name)
+    with open(file_name) as data_file:
+        if file_name.endswith('.jsonl'):
+            instructions = (json.loads(line) for line in data_file if line.strip())
+        else:
+            instructions = read_json_list(data_file)
+        for instruction in instructions:
+            for expanded in expand(instruction, base_dir):
+                yield expanded
@@ -0,0 +1,336 @@
+from ethereum import tester as t
+from ethereum.tester import keys, accounts, TransactionFailed
+from ethereum.transactions import Transaction
+from ethereum.processblock import apply_transaction
+from ethereum.utils import mk_contract_address
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+import threading
+import random
+import json
+import time
+import rlp
+import click
+import logging
+logging.basicConfig(level=logging.INFO)
+
+HOMESTEAD_BLOCK = 1150000
+SEND_METHODS = ('eth_sendTransaction', 'eth_sendRawTransaction')
+
+
+def to_hex(value):
+    return hex(value).rstrip("L")
+
+
+def to_int(value, default=0):
+    if value is None:
+        return default
+    if isinstance(value, basestring):
+        return int(value, 16)
+    return value
+
+
+def address_to_hex(address):
+    return "0x" + address.encode("hex")
+
+
+def hex_to_address(address):
+    return address[2:].decode("hex") if address.startswith("0x") else address.decode("hex")
+
+
+class RpcError(Exception):
+    pass
+
+
+class LocalNode:
+    """
+    JSON-RPC node backed by an ethereum.tester state. Transactions are kept in a mempool and mined every block_time
+    seconds, or instantly if block_time is 0. Latency and random errors of send methods can be injected. Transactions
+    below min_gas_price stay in the mempool until they are replaced with a higher gas price. An existing tester state,
+    e.g. of an AuctionSimulation, can be served instead of a new one.
+    """
+
+    def __init__(self, block_time=0, latency=0, error_rate=0, error_methods=SEND_METHODS, min_gas_price=0,
+                 seed=0, gas_limit=4712388, state=None):
+        self.block_time = block_time
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_methods = error_methods
+        self.min_gas_price = min_gas_price
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        if state is None:
+            state = t.state()
+            state.block.number = HOMESTEAD_BLOCK
+        self.s = state
+        t.gas_limit = gas_limit
+        # (sender, nonce) -> transaction waiting to be mined
+        self.mempool = {}
+        self.receipts = {}
+        # Hash -> reason of transactions dropped while mining
+        self.rejected = {}
+        self.logs = []
+        self.current_receipt = None
+        self.attach_log_listener()
+        self.server = None
+        self.miner = None
+        self.running = False
+        self.methods = {
+            'eth_coinbase': self.eth_coinbase,
+            'eth_blockNumber': self.eth_blockNumber,
+            'eth_getBalance': self.eth_getBalance,
+            'eth_getCode': self.eth_getCode,
+            'eth_getTransactionCount': self.eth_getTransactionCount,
+            'eth_sendTransaction': self.eth_sendTransaction,
+            'eth_sendRawTransaction': self.eth_sendRawTransaction,
+            'eth_getTransactionReceipt': self.eth_getTransactionReceipt,
+            'eth_call': self.eth_call,
+            'eth_getLogs': self.eth_getLogs,
+        }
+
+    def attach_log_listener(self):
+        # Mining and reverting replace the tester block, listeners have to be attached to the new block
+        self.s.block.log_listeners.append(self.record_log)
+
+    def record_log(self, log):
+        receipt = self.current_receipt
+        if receipt is None:
+            return
+        rpc_log = {
+            "address": address_to_hex(log.address),
+            "topics": ["0x{:064x}".format(topic) for topic in log.topics],
+            "data": "0x" + log.data.encode("hex"),
+            "blockNumber": receipt["blockNumber"],
+            "transactionHash": receipt["transactionHash"],
+            "logIndex": to_hex(len(self.logs)),
+        }
+        receipt["logs"].append(rpc_log)
+        self.logs.append(rpc_log)
+
+    # JSON-RPC methods
+
+    def eth_coinbase(self):
+        return address_to_hex(accounts[0])
+
+    def eth_blockNumber(self):
+        return to_hex(self.s.block.number)
+
+    def eth_getBalance(self, address, block_tag="latest"):
+        return to_hex(self.s.block.get_balance(hex_to_address(address)))
+
+    def eth_getCode(self, address, block_tag="latest"):
+        return "0x" + self.s.block.get_code(hex_to_address(address)).encode("hex")
+
+    def eth_getTransactionCount(self, address, block_tag="latest"):
+        sender = hex_to_address(address)
+        nonce = self.s.block.get_nonce(sender)
+        if block_tag == "pending":
+            while (sender, nonce) in self.mempool:
+                nonce += 1
+        return to_hex(nonce)
+
+    def eth_sendTransaction(self, transaction):
+        sender = hex_to_address(transaction["from"])
+        if sender not in accounts:
+            raise RpcError('Unknown account {}'.format(transaction["from"]))
+        key = keys[accounts.index(sender)]
+        nonce = transaction.get("nonce")
+        if nonce is None:
+            nonce = int(self.eth_getTransactionCount(transaction["from"], "pending"), 16)
+        tx = Transaction(to_int(nonce), to_int(transaction.get("gasPrice"), t.gas_price),
+                         to_int(transaction.get("gas"), t.gas_limit),
+                         hex_to_address(transaction["to"]) if transaction.get("to") else '',
+                         to_int(transaction.get("value")), hex_to_address(transaction.get("data", "0x")))
+        tx.sign(key)
+        return self.add_transaction(tx)
+
+    def eth_sendRawTransaction(self, raw_tx):
+        return self.add_transaction(rlp.decode(hex_to_address(raw_tx), Transaction))
+
+    def eth_getTransactionReceipt(self, transaction_hash):
+        return self.receipts.get(transaction_hash)
+
+    def eth_call(self, transaction, block_tag="latest"):
+        """
+        Executes a call on the latest state and reverts it. Calls at earlier blocks are executed on the latest state
+        as well.
+        """
+        sender = hex_to_address(transaction["from"]) if transaction.get("from") else accounts[0]
+        key = keys[accounts.index(sender)] if sender in accounts else keys[0]
+        snapshot = self.s.snapshot()
+        try:
+            output = self.s.send(key, hex_to_address(transaction["to"]), to_int(transaction.get("value")),
+                                 evmdata=hex_to_address(transaction.get("data", "0x")))
+        except TransactionFailed:
+            output = ''
+        finally:
+            self.s.revert(snapshot)
+            self.attach_log_listener()
+        return "0x" + output.encode("hex")
+
+    def eth_getLogs(self, log_filter):
+        from_block = to_int(log_filter.get("fromBlock"), 0)
+        to_block = to_int(log_filter.get("toBlock"), self.s.block.number)
+        address = log_filter.get("address")
+        topics = log_filter.get("topics") or []
+        return [log for log in self.logs
+                if from_block <= int(log["blockNumber"], 16) <= to_block and
+                (address is None or log["address"] == address.lower()) and
+                all(topic is None or topic == log_topic for topic, log_topic in zip(topics, log["topics"]))]
+
+    # Mempool and mining
+
+    def add_transaction(self, tx):
+        transaction_hash = "0x" + tx.hash.encode("hex")
+        if transaction_hash in self.receipts:
+            raise RpcError('Known transaction {}'.format(transaction_hash))
+        if tx.nonce < self.s.block.get_nonce(tx.sender):
+            raise RpcError('Nonce too low')
+        pending = self.mempool.get((tx.sender, tx.nonce))
+        if pending:
+            if pending.hash == tx.hash:
+                raise RpcError('Known transaction {}'.format(transaction_hash))
+            if tx.gasprice * 10 < pending.gasprice * 11:
+                raise RpcError('Replacement transaction underpriced')
+        self.mempool[(tx.sender, tx.nonce)] = tx
+        if not self.block_time:
+            self.mine()
+            if transaction_hash in self.rejected:
+                raise RpcError(self.rejected[transaction_hash])
+        return transaction_hash
+
+    def mine(self):
+        """
+        Applies all executable transactions of the mempool in nonce order and mines a block.
+        """
+        applied = True
+        while applied:
+            applied = False
+            for (sender, nonce), tx in sorted(self.mempool.items(), key=lambda item: -item[1].gasprice):
+                if nonce != self.s.block.get_nonce(sender) or tx.gasprice < self.min_gas_price:
+                    continue
+                del self.mempool[(sender, nonce)]
+                try:
+                    self.apply(tx)
+                except Exception as e:
+                    # Invalid transactions, e.g. with insufficient balance or startgas, are dropped like by a client
+                    self.current_receipt = None
+                    self.rejected["0x" + tx.hash.encode("hex")] = '{}: {}'.format(type(e).__name__, e)
+                    logging.info('Dropped transaction {}: {}'.format(tx.hash.encode("hex"), e))
+                    continue
+                applied = True
+        self.s.mine(1)
+        self.attach_log_listener()
+
+    def apply(self, tx):
+        transaction_hash = "0x" + tx.hash.encode("hex")
+        gas_used = self.s.block.gas_used
+        contract_address = address_to_hex(mk_contract_address(tx.sender, tx.nonce)) if not tx.to else None
+        self.current_receipt = {
+            "transactionHash": transaction_hash,
+            "blockNumber": to_hex(self.s.block.number),
+            "contractAddress": contract_address,
+            "logs": [],
+        }
+        success, _ = apply_transaction(self.s.block, tx)
+        receipt = self.current_receipt
+        self.current_receipt = None
+        receipt["gasUsed"] = to_hex(self.s.block.gas_used - gas_used)
+        receipt["cumulativeGasUsed"] = to_hex(self.s.block.gas_used)
+        if not success:
+            receipt["contractAddress"] = None
+        self.receipts[transaction_hash] = receipt
+
+    def mine_periodically(self):
+        while self.running:
+            time.sleep(self.block_time)
+            try:
+                with self.lock:
+                    self.mine()
+            except Exception as e:
+                logging.info('Mining failed: {}'.format(e))
+
+    # Request handling
+
+    def handle(self, request):
+        if isinstance(request, list):
+            return [self.handle(single_request) for single_request in request]
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        method = request.get("method")
+        if method not in self.methods:
+            response["error"] = {"code": -32601, "message": 'Method {} not found'.format(method)}
+            return response
+        if method in self.error_methods and self.random.random() < self.error_rate:
+            response["error"] = {"code": -32000, "message": 'Injected error'}
+            return response
+        try:
+            with self.lock:
+                response["result"] = self.methods[method](*request.get("params", []))
+        except Exception as e:
+            response["error"] = {"code": -32000, "message": str(e) or type(e).__name__}
+        return response
+
+    def start(self, host="localhost", port=0):
+        """
+        Serves JSON-RPC requests in a background thread. Returns the port.
+        """
+        node = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+
+            def do_POST(self):
+                if node.latency:
+                    time.sleep(node.latency)
+                request = json.loads(self.rfile.read(int(self.headers.getheader('content-length'))))
+                body = json.dumps(node.handle(request))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self.server = Server((host, port), RequestHandler)
+        self.running = True
+        server_thread = threading.Thread(target=self.server.serve_forever)
+        # A node that is never stopped doesn't keep the interpreter alive
+        server_thread.daemon = True
+        server_thread.start()
+        if self.block_time:
+            self.miner = threading.Thread(target=self.mine_periodically)
+            self.miner.daemon = True
+            self.miner.start()
+        return self.server.server_address[1]
+
+    def stop(self):
+        self.running = False
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+@click.command()
+@click.option('-host', default="localhost", help='Host to listen on')
+@click.option('-port', default=8545, help='Port to listen on')
+@click.option('-block_time', default=0.0, help='Seconds between blocks, 0 mines every transaction instantly')
+@click.option('-latency', default=0.0, help='Seconds added to every request')
+@click.option('-error_rate', default=0.0, help='Share of send requests failing with an error')
+@click.option('-min_gas_price', default=0, help='Transactions with a lower gas price are not mined')
+def setup(host, port, block_time, latency, error_rate, min_gas_price):
+    node = LocalNode(block_time, latency, error_rate, min_gas_price=min_gas_price)
+    node.start(host, port)
+    logging.info('Local node listening on {}:{}'.format(host, port))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        node.stop()
+
+if __name__ == '__main__':
+    setup()
@@ -0,0 +1,192 @@
+from rpc import JsonRpc
+from Queue import Queue, Empty
+from urlparse import urlparse
+import threading
+import time
+import logging
+
+
+def endpoint_from_url(url, timeout=30):
+    parsed = urlparse(url if '://' in url else 'http://' + url)
+    return JsonRpc(parsed.scheme, parsed.hostname, parsed.port or 8545, timeout)
+
+
+class Endpoint:
+    """
+    A node with its health: smoothed latency, consecutive failures and last seen block number.
+    """
+
+    def __init__(self, json_rpc):
+        self.json_rpc = json_rpc
+        self.latency = 0
+        self.failures = 0
+        self.block_number = None
+        self.ejected = False
+
+    @property
+    def url(self):
+        return self.json_rpc.url
+
+    def call(self, method, params, timeout=None):
+        start = time.time()
+        try:
+            response = self.json_rpc.call(method, params, timeout)
+        except Exception as e:
+            self.failures += 1
+            return {"error": 'Request to {} failed: {}'.format(self.url, e)}
+        self.failures = 0
+        self.latency = 0.8 * self.latency + 0.2 * (time.time() - start) if self.latency else time.time() - start
+        return response
+
+
+class MultiJsonRpc:
+    """
+    Drop-in replacement for EthJsonRpc in Deploy using several nodes. Raw transactions are broadcast to all nodes,
+    reads are sent to the fastest node and hedged with a second node if no response arrived after hedge_delay seconds.
+    Nodes failing max_failures times in a row or more than max_lag blocks behind the best node are ejected until the
+    next health check finds them healthy again. Health checks time out after health_timeout seconds and, except for
+    the first one, run in the background, so a hung node never stalls requests.
+    """
+
+    def __init__(self, endpoints, hedge_delay=0.5, max_lag=3, max_failures=3, health_interval=10, health_timeout=2):
+        self.endpoints = [Endpoint(json_rpc) for json_rpc in endpoints]
+        self.hedge_delay = hedge_delay
+        self.max_lag = max_lag
+        self.max_failures = max_failures
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.last_health_check = None
+        self.health_thread = None
+
+    def check_health(self):
+        """
+        Fetches block numbers of all nodes concurrently and ejects failing and lagging nodes.
+        """
+        responses = self.call_all("eth_blockNumber", [], timeout=self.health_timeout)
+        for endpoint, response in zip(self.endpoints, responses):
+            endpoint.block_number = int(response["result"], 16) if "result" in response else None
+        block_numbers = [endpoint.block_number for endpoint in self.endpoints if endpoint.block_number is not None]
+        best_block_number = max(block_numbers) if block_numbers else None
+        for endpoint in self.endpoints:
+            ejected = endpoint.block_number is None or endpoint.failures >= self.max_failures or \
+                endpoint.block_number < best_block_number - self.max_lag
+            if ejected != endpoint.ejected:
+                logging.info('Node {} {} at block {}.'.format(endpoint.url, 'ejected' if ejected else 'restored',
+                                                              endpoint.block_number))
+            endpoint.ejected = ejected
+        self.last_health_check = time.time()
+
+    def healthy_endpoints(self):
+        """
+        Returns usable nodes ordered by latency. If all nodes were ejected, all of them are used.
+        """
+        if self.last_health_check is None:
+            self.check_health()
+        elif time.time() - self.last_health_check > self.health_interval and \
+                not (self.health_thread and self.health_thread.is_alive()):
+            # Requests use the last known health until the refresh completes
+            self.health_thread = threading.Thread(target=self.check_health)
+            self.health_thread.daemon = True
+            self.health_thread.start()
+        healthy = [endpoint for endpoint in self.endpoints
+                   if not endpoint.ejected and endpoint.failures < self.max_failures]
+        return sorted(healthy or self.endpoints, key=lambda endpoint: endpoint.latency)
+
+    def call_all(self, method, params, endpoints=None, timeout=None):
+        """
+        Sends a request to several nodes concurrently. Returns responses in the order of the nodes.
+        """
+        endpoints = endpoints or self.endpoints
+        responses = [None] * len(endpoints)
+
+        def call(index):
+            responses[index] = endpoints[index].call(method, params, timeout)
+        threads = [threading.Thread(target=call, args=(index,)) for index in range(len(endpoints))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def call(self, method, params):
+        """
+        Sends a read to the fastest node, then to the next node whenever hedge_delay passes without a successful
+        response. Ejected nodes are only asked after all healthy nodes failed. Returns the first successful response
+        or the last error.
+        """
+        healthy = self.healthy_endpoints()
+        endpoints = healthy + [endpoint for endpoint in self.endpoints if endpoint not in healthy]
+        responses = Queue()
+
+        def send(endpoint):
+            thread = threading.Thread(target=lambda: responses.put(endpoint.call(method, params)))
+            thread.daemon = True
+            thread.start()
+        send(endpoints[0])
+        sent = 1
+        received = 0
+        response = None
+        while received < sent:
+            try:
+                response = responses.get(timeout=self.hedge_delay if sent < len(healthy) else None)
+            except Empty:
+                # Hedge a slow node with the next one
+                send(endpoints[sent])
+                sent += 1
+                continue
+            received += 1
+            if "error" not in response:
+                return response
+            if received == sent and sent < len(endpoints):
+                # All nodes asked so far failed
+                send(endpoints[sent])
+                sent += 1
+        return response
+
+    def broadcast(self, method, params):
+        """
+        Sends a transaction to all healthy nodes. Returns the first successful response, otherwise the error of the
+        fastest node.
+        """
+        responses = self.call_all(method, params, self.healthy_endpoints())
+        for response in responses:
+            if "error" not in response:
+                return response
+        return responses[0]
+
+    # EthJsonRpc methods used by Deploy and TransactionManager
+
+    def eth_coinbase(self):
+        return self.call("eth_coinbase", [])
+
+    def eth_getBalance(self, address, default_block="latest"):
+        return self.call("eth_getBalance", [address, default_block])
+
+    def eth_getCode(self, address, default_block="latest"):
+        return self.call("eth_getCode", [address, default_block])
+
+    def eth_getTransactionCount(self, address, default_block="latest"):
+        return self.call("eth_getTransactionCount", [address, default_block])
+
+    def eth_getTransactionReceipt(self, transaction_hash):
+        return self.call("eth_getTransactionReceipt", [transaction_hash])
+
+    def eth_call(self, to_address, data=None, from_address=None, default_block="latest"):
+        transaction = {"to": to_address, "data": data}
+        if from_address:
+            transaction["from"] = from_address
+        return self.call("eth_call", [transaction, default_block])
+
+    def eth_sendRawTransaction(self, data):
+        return self.broadcast("eth_sendRawTransaction", [data])
+
+    def eth_sendTransaction(self, from_address, to_address=None, gas=None, gas_price=None, value=None, data=None,
+                            nonce=None):
+        # Signed by the account of the node. Hedging could make two nodes sign and send it, so only the fastest node
+        # gets it and failures are left to the transaction manager.
+        transaction = {"from": from_address}
+        for key, field in (("to", to_address), ("gas", gas), ("gasPrice", gas_price), ("value", value),
+                           ("data", data), ("nonce", nonce)):
+            if field is not None:
+                transaction[key] = field if key in ("to", "data") else hex(field).rstrip("L")
+        return self.healthy_endpoints()[0].call("eth_sendTransaction", [transaction])
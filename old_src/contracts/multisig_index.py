@@ -0,0 +1,198 @@
+from ethereum.abi import ContractTranslator
+import json
+
+# Events shared by MultiSigWallet and MultiSigWalletWithDailyLimit
+EVENTS_ABI = [
+    {"type": "event", "name": "Confirmation", "anonymous": False,
+     "inputs": [{"indexed": True, "type": "address", "name": "sender"},
+                {"indexed": True, "type": "uint256", "name": "transactionId"}]},
+    {"type": "event", "name": "Revocation", "anonymous": False,
+     "inputs": [{"indexed": True, "type": "address", "name": "sender"},
+                {"indexed": True, "type": "uint256", "name": "transactionId"}]},
+    {"type": "event", "name": "Submission", "anonymous": False,
+     "inputs": [{"indexed": True, "type": "uint256", "name": "transactionId"}]},
+    {"type": "event", "name": "Execution", "anonymous": False,
+     "inputs": [{"indexed": True, "type": "uint256", "name": "transactionId"}]},
+    {"type": "event", "name": "ExecutionFailure", "anonymous": False,
+     "inputs": [{"indexed": True, "type": "uint256", "name": "transactionId"}]},
+    {"type": "event", "name": "OwnerAddition", "anonymous": False,
+     "inputs": [{"indexed": True, "type": "address", "name": "owner"}]},
+    {"type": "event", "name": "OwnerRemoval", "anonymous": False,
+     "inputs": [{"indexed": True, "type": "address", "name": "owner"}]},
+]
+
+
+class RpcLog:
+    """
+    Adapts a log returned by eth_getLogs to the interface expected by ContractTranslator.listen.
+    """
+
+    def __init__(self, log):
+        self.address = normalize_address(log["address"])
+        self.topics = [int(topic, 16) for topic in log["topics"]]
+        self.data = log["data"][2:].decode("hex")
+
+
+def normalize_address(address):
+    address = address.lower()
+    return address[2:] if address.startswith("0x") else address
+
+
+class MultiSigTransactionIndex:
+    """
+    Incrementally maintained index of MultiSigWallet transactions built from wallet events. Pending transactions per
+    owner and confirmations per transaction are kept up to date on every event, so queries do not depend on the
+    number of transactions ever submitted.
+    """
+
+    def __init__(self, wallet_address, owners=None, last_block=-1):
+        self.wallet_address = wallet_address
+        self.translator = ContractTranslator(EVENTS_ABI)
+        self.last_block = last_block
+        self.owners = set()
+        # Raw confirmations like in contract storage, may include confirmations of removed owners
+        self.confirmed_by = {}
+        self.executed = set()
+        self.pending = set()
+        self.failed_executions = {}
+        # owner -> pending transactions the owner has not confirmed
+        self.awaiting = {}
+        for owner in owners or []:
+            self.add_owner(owner)
+
+    def add_owner(self, owner):
+        owner = normalize_address(owner)
+        self.owners.add(owner)
+        self.awaiting[owner] = set(transaction_id for transaction_id in self.pending
+                                   if owner not in self.confirmed_by[transaction_id])
+
+    def remove_owner(self, owner):
+        owner = normalize_address(owner)
+        self.owners.discard(owner)
+        self.awaiting.pop(owner, None)
+
+    def ingest(self, event):
+        """
+        Applies a decoded event as returned by ContractTranslator.listen.
+        """
+        event_type = event["_event_type"]
+        if event_type == "Submission":
+            transaction_id = event["transactionId"]
+            self.confirmed_by[transaction_id] = set()
+            self.pending.add(transaction_id)
+            for awaiting in self.awaiting.itervalues():
+                awaiting.add(transaction_id)
+        elif event_type == "Confirmation":
+            transaction_id = event["transactionId"]
+            sender = normalize_address(event["sender"])
+            # Transactions submitted before the first ingested block are only known from later events
+            self.confirmed_by.setdefault(transaction_id, set()).add(sender)
+            if sender in self.awaiting:
+                self.awaiting[sender].discard(transaction_id)
+        elif event_type == "Revocation":
+            transaction_id = event["transactionId"]
+            sender = normalize_address(event["sender"])
+            self.confirmed_by.setdefault(transaction_id, set()).discard(sender)
+            if sender in self.awaiting and transaction_id in self.pending:
+                self.awaiting[sender].add(transaction_id)
+        elif event_type == "Execution":
+            transaction_id = event["transactionId"]
+            self.pending.discard(transaction_id)
+            self.executed.add(transaction_id)
+            for awaiting in self.awaiting.itervalues():
+                awaiting.discard(transaction_id)
+        elif event_type == "ExecutionFailure":
+            transaction_id = event["transactionId"]
+            self.failed_executions[transaction_id] = self.failed_executions.get(transaction_id, 0) + 1
+        elif event_type == "OwnerAddition":
+            self.add_owner(event["owner"])
+        elif event_type == "OwnerRemoval":
+            self.remove_owner(event["owner"])
+
+    def ingest_log(self, log):
+        """
+        Decodes and applies a log returned by eth_getLogs or emitted by the tester. Logs of other contracts are
+        ignored.
+        """
+        if isinstance(log, dict):
+            log = RpcLog(log)
+            address = log.address
+        else:
+            # Tester logs have binary addresses
+            address = log.address.encode("hex")
+        if address != normalize_address(self.wallet_address):
+            return
+        event = self.translator.listen(log, noprint=True)
+        if event:
+            self.ingest(event)
+
+    def sync(self, json_rpc, to_block=None, chunk_size=10000):
+        """
+        Fetches and ingests all wallet events since the last checkpoint. Returns the number of ingested logs.
+        """
+        if to_block is None:
+            to_block = json_rpc.block_number()
+        count = 0
+        from_block = self.last_block + 1
+        while from_block <= to_block:
+            chunk_end = min(from_block + chunk_size - 1, to_block)
+            response = json_rpc.call("eth_getLogs", [{"address": self.wallet_address,
+                                                      "fromBlock": hex(from_block).rstrip("L"),
+                                                      "toBlock": hex(chunk_end).rstrip("L")}])
+            if "error" in response:
+                raise ValueError('Fetching logs failed with error {}'.format(response["error"]))
+            for log in response["result"]:
+                self.ingest_log(log)
+                count += 1
+            # Checkpoint only advances after a chunk was applied completely
+            self.last_block = chunk_end
+            from_block = chunk_end + 1
+        return count
+
+    def pending_for(self, owner):
+        """
+        Returns pending transactions still waiting for a confirmation of owner as a frozenset, the index keeps
+        its own sets.
+        """
+        return frozenset(self.awaiting.get(normalize_address(owner), ()))
+
+    def confirmations(self, transaction_id):
+        """
+        Returns current owners who confirmed transaction_id, like getConfirmations.
+        """
+        return self.confirmed_by.get(transaction_id, set()) & self.owners
+
+    def transaction_count(self, pending, executed):
+        return (len(self.pending) if pending else 0) + (len(self.executed) if executed else 0)
+
+    def transaction_ids(self, from_index, to_index, pending, executed):
+        """
+        Returns the same ids as getTransactionIds.
+        """
+        ids = sorted((self.pending if pending else set()) | (self.executed if executed else set()))
+        return ids[from_index:to_index]
+
+    def save(self, file_name):
+        state = {
+            "wallet_address": self.wallet_address,
+            "last_block": self.last_block,
+            "owners": sorted(self.owners),
+            "confirmed_by": dict((str(k), sorted(v)) for k, v in self.confirmed_by.iteritems()),
+            "executed": sorted(self.executed),
+            "failed_executions": dict((str(k), v) for k, v in self.failed_executions.iteritems()),
+        }
+        with open(file_name, "w") as checkpoint_file:
+            json.dump(state, checkpoint_file)
+
+    @classmethod
+    def load(cls, file_name):
+        with open(file_name) as checkpoint_file:
+            state = json.load(checkpoint_file)
+        index = cls(state["wallet_address"], last_block=state["last_block"])
+        index.confirmed_by = dict((int(k), set(v)) for k, v in state["confirmed_by"].iteritems())
+        index.executed = set(state["executed"])
+        index.pending = set(index.confirmed_by) - index.executed
+        index.failed_executions = dict((int(k), v) for k, v in state["failed_executions"].iteritems())
+        for owner in state["owners"]:
+            index.add_owner(owner)
+        return index
@@ -0,0 +1,131 @@
+from ethereum.utils import sha3
+import struct
+
+UINT256 = struct.Struct('>4Q')
+UINT64 = struct.Struct('>Q')
+MASK_64 = 2 ** 64 - 1
+
+UINT = 'uint'
+BYTES = 'bytes'
+RAW = 'raw'
+
+
+def uint_size(value, size):
+    if value < 0:
+        raise ValueError('Cannot encode negative integer {}'.format(value))
+    # Values not fitting into size are written with their full width, like format(value, 'x').zfill(...)
+    return max(size, (value.bit_length() + 7) // 8)
+
+
+def pack_uint_into(buffer, offset, value, size):
+    if size == 32 and value >> 256 == 0:
+        UINT256.pack_into(buffer, offset, value >> 192, value >> 128 & MASK_64, value >> 64 & MASK_64, value & MASK_64)
+        return
+    end = offset + size
+    while end - offset >= 8:
+        end -= 8
+        UINT64.pack_into(buffer, end, value & MASK_64)
+        value >>= 64
+    while end > offset:
+        end -= 1
+        buffer[end] = value & 0xff
+        value >>= 8
+
+
+class PackedEncoder:
+    """
+    Writes tightly packed fields into a preallocated buffer, as expected by sha3 calls in contracts. The buffer is
+    reused between records, call reset before encoding the next one.
+    """
+
+    def __init__(self, size=1024):
+        self.buffer = bytearray(size)
+        self.length = 0
+
+    def reset(self):
+        self.length = 0
+        return self
+
+    def reserve(self, size):
+        end = self.length + size
+        if end > len(self.buffer):
+            self.buffer.extend(bytearray(max(end, 2 * len(self.buffer)) - len(self.buffer)))
+        return end
+
+    def write_uint(self, value, size=32):
+        """
+        Writes an unsigned integer big-endian with size bytes.
+        """
+        size = uint_size(value, size)
+        end = self.reserve(size)
+        pack_uint_into(self.buffer, self.length, value, size)
+        self.length = end
+        return self
+
+    def write_bytes(self, value, size=32):
+        """
+        Writes a byte string left padded with zero bytes to size bytes.
+        """
+        padding = size - len(value)
+        if padding > 0:
+            end = self.reserve(size)
+            self.buffer[self.length:self.length + padding] = b'\x00' * padding
+            self.buffer[self.length + padding:end] = value
+            self.length = end
+            return self
+        return self.write_raw(value)
+
+    def write_raw(self, value):
+        end = self.reserve(len(value))
+        self.buffer[self.length:end] = value
+        self.length = end
+        return self
+
+    def write(self, kind, value, size=32):
+        if kind == UINT:
+            return self.write_uint(value, size)
+        elif kind == BYTES:
+            return self.write_bytes(value, size)
+        return self.write_raw(value)
+
+    def getvalue(self):
+        return bytes(self.buffer[:self.length])
+
+    def sha3(self):
+        return sha3(self.getvalue())
+
+
+def encode_uint(value, size=32):
+    size = uint_size(value, size)
+    buffer = bytearray(size)
+    pack_uint_into(buffer, 0, value, size)
+    return bytes(buffer)
+
+
+def encode_bytes(value, size=32):
+    return b'\x00' * (size - len(value)) + value if len(value) < size else value
+
+
+def encode_packed(fields, encoder=None):
+    """
+    Encodes a list of (kind, value) or (kind, value, size) fields.
+    """
+    encoder = (encoder or PackedEncoder()).reset()
+    for field in fields:
+        encoder.write(*field)
+    return encoder.getvalue()
+
+
+def hash_many(records, layout):
+    """
+    Hashes many records sharing the same layout, a list of (kind, size) tuples. Every record is a sequence of values
+    matching the layout. One buffer is reused for all records.
+    """
+    encoder = PackedEncoder()
+    hashes = []
+    for record in records:
+        encoder.reset()
+        for (kind, size), value in zip(layout, record):
+            encoder.write(kind, value, size)
+        hashes.append(encoder.sha3())
+    return hashes
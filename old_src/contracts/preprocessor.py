@@ -1,7 +1,78 @@
+from collections import deque
+from itertools import chain
+import heapq
+import os
 import re
 
+# Token kinds
+WHITESPACE = 'whitespace'
+COMMENT = 'comment'
+STRING = 'string'
+PLACEHOLDER = 'placeholder'
+IDENTIFIER = 'identifier'
+NUMBER = 'number'
+SYMBOL = 'symbol'
+IMPORT = 'import'
+
+TOKEN_PATTERN = re.compile(r'''
+    (?P<whitespace>\s+)
+  | (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<placeholder>\{\{[^\s{}]*\}\})
+  | (?P<identifier>[A-Za-z_$][A-Za-z0-9_$]*)
+  | (?P<number>[0-9][A-Za-z0-9_.]*)
+  | (?P<symbol>.)
+''', re.VERBOSE | re.DOTALL)
+
+
+def join(tokens):
+    return ''.join(token[1] for token in tokens)
+
+
+def is_import(tokens, i):
+    # import "path";
+    return tokens[i][1] == 'import' and tokens[i][0] == IDENTIFIER and i + 3 < len(tokens) and \
+        tokens[i + 1][0] == WHITESPACE and tokens[i + 2][0] == STRING and tokens[i + 2][1][0] == '"' and \
+        tokens[i + 3][1] == ';'
+
+
+def tokenize(code):
+    """
+    Splits Solidity code into (kind, text, value) tokens. Joining all texts returns the code. Import statements are
+    merged into one token with the imported path as value, placeholders have their name as value.
+    """
+    tokens = [(match.lastgroup, match.group(), None) for match in TOKEN_PATTERN.finditer(code)]
+    merged = []
+    i = 0
+    while i < len(tokens):
+        kind, text, _ = tokens[i]
+        if kind == IDENTIFIER and is_import(tokens, i):
+            merged.append((IMPORT, join(tokens[i:i + 4]), tokens[i + 2][1][1:-1]))
+            i += 4
+            continue
+        merged.append((kind, text, text[2:-2]) if kind == PLACEHOLDER else tokens[i])
+        i += 1
+    return merged
+
+
+class ImportSlot:
+    """
+    Import statement in the tree of resolved files, replaced by the tokens of the imported file or by nothing. Keys
+    of slots sort like their positions in the resolved code.
+    """
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.items = []
+
 
 class PreProcessor:
+    """
+    Resolves imports and macros, inserts dev code and replaces address placeholders. Every file is tokenized once,
+    all stages work on the token stream, so comments and strings are never changed.
+    """
+
     def __init__(self):
         self.dev_code = """
     event Log(uint);
@@ -14,79 +85,195 @@ class PreProcessor:
     event LogByte(bytes1);
     event LogBool(bool);
     """
+        # Dev code declarations by event name
+        self.dev_events = re.findall(r'(    event (\w+)\(.*\n)', self.dev_code)
+        # Tokens by path and modification time
+        self.tokenized_files = {}
 
-    @staticmethod
-    def find_macro(code):
-        return re.search(r'macro:(.*?);', code)
+    def tokenize_file(self, path):
+        key = (path, os.path.getmtime(path))
+        if key not in self.tokenized_files:
+            with open(path) as source_file:
+                self.tokenized_files[key] = tokenize(source_file.read())
+        return self.tokenized_files[key]
 
     @staticmethod
-    def find_scope_end(code, start_pos):
+    def find_scope_end(tokens, start):
         brackets_counter = 0
-        index = 0
-        for index, char in enumerate(code[start_pos:]):
-            if char == "{":
+        for index in range(start, len(tokens)):
+            if tokens[index][1] == "{":
                 brackets_counter += 1
-            elif char == "}":
+            elif tokens[index][1] == "}":
                 brackets_counter -= 1
-            if brackets_counter < 0:
-                break
-        return start_pos + index
-
-    def resolve_macros(self, code):
-        # replace macros
-        macro = self.find_macro(code)
-        while macro:
-            token, solidity_code = [x.strip() for x in macro.group()[6:-1].split("=")]
-            scope_end = self.find_scope_end(code, macro.end())
-            new_code = code[macro.end():scope_end].replace(token, solidity_code)
-            code = code[:macro.start()] + new_code + code[scope_end:]
-            macro = self.find_macro(code)
-        return code
+                if brackets_counter < 0:
+                    return index
+        return len(tokens)
+
     @staticmethod
-    def resolve_imports(code, file_dir, contract_dir):
+    def replace_in_scope(tokens, pattern, replacement):
+        """
+        Yields tokens with every occurrence of the pattern texts replaced until the end of the enclosing scope, later
+        tokens are passed through. Replacements are not scanned again.
+        """
+        tokens = iter(tokens)
+        window = deque()
+        depth = 0
+        while pattern:
+            while len(window) < len(pattern):
+                token = next(tokens, None)
+                if token is None:
+                    break
+                window.append(token)
+            if not window:
+                return
+            if len(window) == len(pattern) and all(token[1] == text for token, text in zip(window, pattern)):
+                for token in replacement:
+                    yield token
+                window.clear()
+                continue
+            token = window.popleft()
+            yield token
+            if token[1] == "{":
+                depth += 1
+            elif token[1] == "}":
+                depth -= 1
+                if depth < 0:
+                    break
+        for token in window:
+            yield token
+        for token in tokens:
+            yield token
+
+    def resolve_macros(self, tokens):
+        """
+        Replaces statements macro:token=code; on a single line in one pass. Every macro wraps the remaining token
+        stream in a stage replacing its token until the end of the enclosing scope, so later macros see the
+        replacements of earlier ones.
+        """
+        stream = iter(tokens)
+        # Tokens read ahead while looking for the end of a statement
+        pending = deque()
+        resolved = []
+        while True:
+            token = pending.popleft() if pending else next(stream, None)
+            if token is None:
+                return resolved
+            if token[1] != 'macro' or token[0] != IDENTIFIER:
+                resolved.append(token)
+                continue
+            statement = [token]
+            while True:
+                next_token = pending.popleft() if pending else next(stream, None)
+                if next_token is None:
+                    break
+                statement.append(next_token)
+                if len(statement) == 2 and next_token[1] != ':' or next_token[1] == ';' or '\n' in next_token[1]:
+                    break
+            if len(statement) < 3 or statement[-1][1] != ';':
+                # Not a macro, tokens after macro are examined again
+                resolved.append(token)
+                pending.extendleft(reversed(statement[1:]))
+                continue
+            name, solidity_code = [x.strip() for x in join(statement[2:-1]).split("=")]
+            pattern = [t[1] for t in tokenize(name)]
+            stream = self.replace_in_scope(chain(pending, stream), pattern, tokenize(solidity_code))
+            pending = deque()
+
+    def resolve_imports(self, tokens, file_dir, contract_dir):
+        """
+        Replaces import statements breadth first with the imported files, every round replaces the first remaining
+        import of each path found at the beginning of the round. Imported tokens are never spliced into the list:
+        imports are slots of a tree ordered by position keys, which is joined in one forward pass at the end. Every
+        file is imported once, abstract contracts are skipped if their implementation was imported before.
+        """
         def get_file_name(_file_dir):
             return _file_dir.split("/")[-1]
         imported_codes = [get_file_name(file_dir)]
-        while len(re.findall(r'import "(\S*)";', code)):
-            for file_dir in re.findall(r'import "(\S*)";', code):
-                file_name = get_file_name(file_dir)
+        # Heaps of (position key, slot) of unresolved imports by path
+        unresolved = {}
+
+        def add_items(file_tokens, key):
+            items = []
+            for token in file_tokens:
+                if token[0] == IMPORT:
+                    slot = ImportSlot(token[2], key + (len(items),))
+                    heapq.heappush(unresolved.setdefault(slot.path, []), (slot.key, slot))
+                    items.append(slot)
+                else:
+                    items.append(token)
+            return items
+        root = add_items(tokens, ())
+        while unresolved:
+            paths = [slot.path for _, slot in sorted(item for heap in unresolved.itervalues() for item in heap)]
+            for path in paths:
+                _, slot = heapq.heappop(unresolved[path])
+                if not unresolved[path]:
+                    del unresolved[path]
+                file_name = get_file_name(path)
                 if file_name not in imported_codes and (not file_name.startswith("Abstract") or file_name.startswith("Abstract") and file_name[8:] not in imported_codes):
-                    imported_code = open(contract_dir + file_dir).read()
+                    slot.items = add_items(self.tokenize_file(contract_dir + path), slot.key)
                     imported_codes.append(file_name)
-                else:
-                    imported_code = ""
-                code = code.replace('import "{}";'.format(file_dir), imported_code, 1)
-        return code
-
-    @staticmethod
-    def insert_addresses(code, replace_dict):
-        for placeholder, address in replace_dict.iteritems():
-            code = code.replace("{{%s}}" % placeholder, address)
-        return code
+        resolved = []
+        stack = [iter(root)]
+        while stack:
+            item = next(stack[-1], None)
+            if item is None:
+                stack.pop()
+            elif isinstance(item, ImportSlot):
+                stack.append(iter(item.items))
+            else:
+                resolved.append(item)
+        return resolved
 
     @staticmethod
-    def contract_names(code):
-        return [m.end() for m in re.finditer(r'^(contract|library) [^\{]*{', code, re.MULTILINE)]
+    def contract_names(tokens):
+        """
+        Returns indexes of opening brackets of contracts and libraries declared at the beginning of a line.
+        """
+        positions = []
+        for index, (kind, text, _) in enumerate(tokens):
+            if kind != IDENTIFIER or text not in ('contract', 'library'):
+                continue
+            at_line_start = index == 0 or tokens[index - 1][1].endswith('\n')
+            if at_line_start and index + 1 < len(tokens) and tokens[index + 1][1].startswith(' '):
+                for body in range(index + 1, len(tokens)):
+                    if tokens[body][1] == '{':
+                        positions.append(body)
+                        break
+        return positions
 
-    def insert_dev_code(self, code):
-        added_code_len = 0
-        for pos in self.contract_names(code):
-            code = code[:pos + added_code_len] + self.dev_code + code[pos + added_code_len:]
-            added_code_len += len(self.dev_code)
-        return code
+    def dev_code_for(self, tokens, start, end):
+        """
+        Returns dev code declaring only the Log events referenced between start and end.
+        """
+        names = set(text for kind, text, _ in tokens[start:end] if kind == IDENTIFIER and text.startswith('Log'))
+        declarations = [declaration for declaration, name in self.dev_events if name in names]
+        if not declarations:
+            return ''
+        return '\n' + ''.join(declarations) + '    '
 
     def process(self, file_name, add_dev_code=False, contract_dir="", addresses=None, replace_unknown_addresses=False):
-        code = open(contract_dir + file_name).read()
+        tokens = self.tokenize_file(contract_dir + file_name)
         # resolve imports
-        code = self.resolve_imports(code, file_name, contract_dir)
+        tokens = self.resolve_imports(tokens, file_name, contract_dir)
         # resolve macros
-        code = self.resolve_macros(code)
-        # insert admin code
+        tokens = self.resolve_macros(tokens)
+        # insert admin code after opening brackets of contracts, only events used in the contract body are declared
+        dev_code_positions = {}
         if add_dev_code:
-            code = self.insert_dev_code(code)
-        if addresses:
-            code = self.insert_addresses(code, addresses)
-        if replace_unknown_addresses:
-            # Replace unknown addresses with 0x0
-            code = re.sub(r'\{\{\S*\}\}', '0x0', code)
-        return code
+            for position in self.contract_names(tokens):
+                dev_code_positions[position] = self.dev_code_for(tokens, position,
+                                                                 self.find_scope_end(tokens, position + 1))
+        addresses = addresses or {}
+        parts = []
+        for index, (kind, text, value) in enumerate(tokens):
+            if kind == PLACEHOLDER:
+                if value in addresses:
+                    text = addresses[value]
+                elif replace_unknown_addresses:
+                    # Replace unknown addresses with 0x0
+                    text = '0x0'
+            parts.append(text)
+            if index in dev_code_positions:
+                parts.append(dev_code_positions[index])
+        return ''.join(parts)
@@ -0,0 +1,143 @@
+from ethereum.tester import TransactionFailed, keys, accounts
+from ethereum.utils import sha3
+from collections import namedtuple
+import json
+import csv
+
+Bid = namedtuple('Bid', ['block', 'sender', 'receiver', 'value'])
+Checkpoint = namedtuple('Checkpoint', ['block', 'snapshot'])
+
+
+def strip_0x(address):
+    return address[2:] if address.startswith('0x') else address
+
+
+def load_bids(file_name):
+    """
+    Loads a bid history from a CSV file with header block,sender,receiver,value or a JSON list of objects with the
+    same keys. Bids are returned ordered by block, bids within one block keep their order.
+    """
+    with open(file_name) as bids_file:
+        if file_name.endswith('.csv'):
+            rows = list(csv.DictReader(bids_file))
+        else:
+            rows = json.load(bids_file)
+    bids = [Bid(int(row['block']), strip_0x(row['sender']), strip_0x(row.get('receiver') or '') or None,
+                int(row['value'])) for row in rows]
+    return sorted(bids, key=lambda bid: bid.block)
+
+
+class BidReplay:
+    """
+    Replays a bid history through a freshly started auction of an AuctionSimulation. Tester state is checkpointed
+    every checkpoint_interval blocks, so what-if runs changing only later bids resume from the nearest checkpoint.
+    What-if runs with another ceiling or price factor restart the auction from the state before the start and replay
+    all bids. Bids are sent one transaction at a time, like on chain, so every bid sees the state left by the bids
+    before it, and from one account per recorded sender.
+    """
+
+    def __init__(self, simulation, bids, start_block=None, checkpoint_interval=1000, seconds_per_block=15,
+                 ceiling=None, price_factor=None):
+        self.simulation = simulation
+        self.bids = bids
+        self.start_block = start_block if start_block is not None else bids[0].block
+        self.checkpoint_interval = checkpoint_interval
+        self.seconds_per_block = seconds_per_block
+        self.ceiling = ceiling
+        self.price_factor = price_factor
+        self.sender_keys = {}
+        # Deployed state before the start, settings can only be changed before the auction started
+        self.deployed = self.simulation.snapshot()
+        self.checkpoints = [Checkpoint(self.start_block, self.start(ceiling, price_factor))]
+
+    def start(self, ceiling, price_factor):
+        """
+        Starts the auction with the given settings from the deployed state and returns a snapshot of the started
+        auction.
+        """
+        self.simulation.revert(self.deployed)
+        self.simulation.start(ceiling=ceiling, price_factor=price_factor, block_number=self.start_block)
+        return self.simulation.snapshot()
+
+    def sender_key(self, sender):
+        """
+        Returns the private key bids of a recorded sender are sent with. Tester accounts bid with their own key,
+        other senders with a key derived from their address.
+        """
+        if sender not in self.sender_keys:
+            address = sender.decode('hex')
+            self.sender_keys[sender] = keys[accounts.index(address)] if address in accounts else \
+                sha3('replay sender {}'.format(sender))
+        return self.sender_keys[sender]
+
+    def nearest_checkpoint(self, block):
+        return [checkpoint for checkpoint in self.checkpoints if checkpoint.block <= block][-1]
+
+    def advance_to(self, block):
+        blocks = block - self.simulation.s.block.number
+        if blocks > 0:
+            self.simulation.advance(blocks, blocks * self.seconds_per_block)
+
+    def apply(self, bids, from_block, record_checkpoints):
+        accepted = []
+        rejected = []
+        end_block = None
+        next_checkpoint = from_block + self.checkpoint_interval
+        for bid in bids:
+            if bid.block < from_block:
+                continue
+            if record_checkpoints and bid.block >= next_checkpoint:
+                # All bids before bid.block were applied
+                self.advance_to(bid.block)
+                self.checkpoints.append(Checkpoint(bid.block, self.simulation.snapshot()))
+                next_checkpoint = bid.block + self.checkpoint_interval
+            self.advance_to(bid.block)
+            try:
+                amount = self.simulation.bid(bid.value, receiver=bid.receiver or bid.sender,
+                                             key=self.sender_key(bid.sender))
+                accepted.append((bid, amount))
+            except TransactionFailed:
+                rejected.append(bid)
+            if end_block is None and self.simulation.dutch_auction.stage() >= 3:
+                end_block = bid.block
+        return accepted, rejected, end_block
+
+    def run(self, bids=None, from_block=None, finalize_block=None, ceiling=None, price_factor=None):
+        """
+        Replays bids, the recorded history by default. With from_block, state is restored from the nearest checkpoint
+        and only bids from that checkpoint on are applied. With a ceiling or price factor other than the ones of the
+        history, the auction is restarted with them and all bids are replayed, checkpoints only hold the settings of
+        the history. Returns a summary of the outcome.
+        """
+        ceiling = ceiling if ceiling is not None else self.ceiling
+        price_factor = price_factor if price_factor is not None else self.price_factor
+        settings_changed = (ceiling, price_factor) != (self.ceiling, self.price_factor)
+        if settings_changed and from_block is not None:
+            raise ValueError('Runs with other settings cannot resume from a checkpoint of the history')
+        record_checkpoints = bids is None and not settings_changed
+        bids = self.bids if bids is None else sorted(bids, key=lambda bid: bid.block)
+        checkpoint = self.nearest_checkpoint(from_block) if from_block is not None else self.checkpoints[0]
+        if record_checkpoints:
+            # Checkpoints are only recorded once, for the recorded history
+            del self.checkpoints[self.checkpoints.index(checkpoint) + 1:]
+        if settings_changed:
+            checkpoint = Checkpoint(self.start_block, self.start(ceiling, price_factor))
+        self.simulation.revert(checkpoint.snapshot)
+        accepted, rejected, end_block = self.apply(bids, checkpoint.block, record_checkpoints)
+        if finalize_block is not None:
+            self.advance_to(finalize_block)
+            self.simulation.update_stage()
+        auction = self.simulation.dutch_auction
+        stage = auction.stage()
+        if end_block is None and stage >= 3 and finalize_block is not None:
+            end_block = finalize_block
+        return {
+            'resumed_from_block': checkpoint.block,
+            'stage': stage,
+            'total_received': auction.totalReceived(),
+            'final_price': auction.finalPrice(),
+            'end_block': end_block,
+            'accepted_bids': len(accepted),
+            'rejected_bids': len(rejected),
+            'gas_used': self.simulation.gas_used,
+        }
@@ -0,0 +1,59 @@
+import requests
+import threading
+import json
+import itertools
+
+
+class JsonRpc:
+    """
+    Minimal JSON-RPC client supporting batch requests. Responses are returned as decoded dicts, errors are reported
+    in the "error" field like with EthJsonRpc. Every thread keeps its own connection session, so a client can be
+    shared by worker threads.
+    """
+
+    def __init__(self, protocol="http", host="localhost", port=8545, timeout=30):
+        self.url = "{}://{}:{}".format(protocol, host, port)
+        self.timeout = timeout
+        self.local = threading.local()
+        self.request_ids = itertools.count(1)
+
+    @property
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def build_request(self, method, params=None):
+        return {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params if params is not None else [],
+            "id": next(self.request_ids)
+        }
+
+    def post(self, payload, timeout=None):
+        response = self.session.post(self.url,
+                                     data=json.dumps(payload),
+                                     headers={"Content-Type": "application/json"},
+                                     timeout=timeout or self.timeout)
+        return response.json()
+
+    def call(self, method, params=None, timeout=None):
+        return self.post(self.build_request(method, params), timeout)
+
+    def batch(self, calls):
+        """
+        Sends a list of (method, params) tuples in a single request. Responses are returned in the order of calls.
+        """
+        if not calls:
+            return []
+        requests_ = [self.build_request(method, params) for method, params in calls]
+        responses = self.post(requests_)
+        if isinstance(responses, dict):
+            # Node rejected the whole batch
+            return [responses] * len(requests_)
+        responses_by_id = dict((response.get("id"), response) for response in responses)
+        return [responses_by_id.get(request["id"], {"error": "Missing response"}) for request in requests_]
+
+    def block_number(self):
+        return int(self.call("eth_blockNumber")["result"], 16)
@@ -0,0 +1,204 @@
+from packed_encoding import encode_uint
+from itertools import islice
+import mmap
+import json
+import csv
+import click
+import logging
+logging.basicConfig(level=logging.INFO)
+
+MAX_TOKENS_SOLD = 9000000 * 10 ** 18
+# JSON header padded to a fixed size, records start at a fixed offset
+HEADER_SIZE = 1024
+ADDRESS_SIZE = 20
+UINT_SIZE = 32
+# Receiver, bid in Wei and token allocation
+RECORD_SIZE = ADDRESS_SIZE + 2 * UINT_SIZE
+
+
+def strip_0x(address):
+    return address[2:] if address.startswith('0x') else address
+
+
+def allocation(bid, final_price):
+    # Same integer division as claimTokens
+    return bid * 10 ** 18 / final_price
+
+
+def wallet_transfer(total_received, final_price):
+    # Unsold tokens transferred to the wallet by finalizeAuction
+    return MAX_TOKENS_SOLD - total_received * 10 ** 18 / final_price
+
+
+def chunks(iterable, chunk_size):
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, chunk_size))
+
+
+def read_bidders(file_name):
+    """
+    Yields (receiver, bid) from a CSV file with header receiver,bid one line at a time.
+    """
+    with open(file_name) as bidders_file:
+        for row in csv.DictReader(bidders_file):
+            yield strip_0x(row['receiver']).lower(), int(row['bid'])
+
+
+def read_receivers(file_name):
+    """
+    Yields receivers from a file with one address per line, e.g. collected from BidSubmission events.
+    """
+    with open(file_name) as receivers_file:
+        for line in receivers_file:
+            if line.strip():
+                yield strip_0x(line.strip()).lower()
+
+
+def unique_receivers(receivers):
+    """
+    Yields every receiver of a sorted stream once. BidSubmission events have one entry per bid, so receivers of
+    repeat bids are skipped as equal neighbours without holding seen receivers in memory. Unsorted input raises a
+    ValueError, sort receivers first, e.g. with sort.
+    """
+    previous = None
+    for receiver in receivers:
+        if previous is not None and receiver < previous:
+            raise ValueError('Receivers are not sorted, {} follows {}'.format(receiver, previous))
+        if receiver != previous:
+            yield receiver
+        previous = receiver
+
+
+def bids_from_rpc(json_rpc, auction_address, receivers, chunk_size=500, block_tag='latest'):
+    """
+    Yields (receiver, bid) reading bids(receiver) in JSON-RPC batches of chunk_size calls. Receivers have to be sorted
+    and are read once. Claimed bids are reset to 0, so block_tag has to be a block before the first claim.
+    """
+    from ethereum.abi import ContractTranslator
+    from contract_abi import load_abi
+    translator = ContractTranslator(load_abi('DutchAuction'))
+    for chunk in chunks(unique_receivers(receivers), chunk_size):
+        responses = json_rpc.batch([("eth_call", [{"to": auction_address,
+                                                   "data": "0x" + translator.encode('bids', [receiver]).encode("hex")},
+                                                  block_tag]) for receiver in chunk])
+        for receiver, response in zip(chunk, responses):
+            if "error" in response:
+                raise ValueError('Reading bid of {} failed with error {}'.format(receiver, response["error"]))
+            yield receiver, int(response["result"], 16)
+
+
+def verify(header):
+    """
+    Checks that bids sum to totalReceived and allocations to the tokens sold, MAX_TOKENS_SOLD minus the wallet
+    transfer. Every allocation is rounded down, so allocations may be short of the tokens sold by less than one token
+    unit per bidder.
+    """
+    if header['total_bids'] != header['total_received']:
+        raise ValueError('Bids sum to {} Wei but totalReceived is {} Wei'.format(header['total_bids'],
+                                                                                 header['total_received']))
+    sold_tokens = MAX_TOKENS_SOLD - header['wallet_transfer']
+    rounding = sold_tokens - header['total_tokens']
+    if not 0 <= rounding < max(header['count'], 1):
+        raise ValueError('Allocations sum to {} but {} tokens were sold'.format(header['total_tokens'], sold_tokens))
+    return rounding
+
+
+def settle(bidders, final_price, total_received, file_name, chunk_size=10000):
+    """
+    Computes token allocations of a stream of (receiver, bid) and writes them to a result file with fixed size
+    records. Only one chunk of bidders is held in memory. Returns the verified header.
+    """
+    count = 0
+    total_bids = 0
+    total_tokens = 0
+    with open(file_name, 'wb') as result_file:
+        result_file.write(' ' * HEADER_SIZE)
+        for chunk in chunks(bidders, chunk_size):
+            records = []
+            for receiver, bid in chunk:
+                tokens = allocation(bid, final_price)
+                records.append(receiver.decode('hex') + encode_uint(bid) + encode_uint(tokens))
+                total_bids += bid
+                total_tokens += tokens
+            result_file.write(''.join(records))
+            count += len(chunk)
+        header = {'count': count, 'final_price': final_price, 'total_received': total_received,
+                  'total_bids': total_bids, 'total_tokens': total_tokens,
+                  'wallet_transfer': wallet_transfer(total_received, final_price),
+                  'record': [['receiver', ADDRESS_SIZE], ['bid', UINT_SIZE], ['tokens', UINT_SIZE]]}
+        header['rounding'] = verify(header)
+        encoded_header = json.dumps(header)
+        if len(encoded_header) >= HEADER_SIZE:
+            raise ValueError('Header does not fit into {} bytes'.format(HEADER_SIZE))
+        result_file.seek(0)
+        result_file.write(encoded_header.ljust(HEADER_SIZE - 1) + '\n')
+    return header
+
+
+class SettlementFile:
+    """
+    Memory-mapped result file written by settle. Records are read on access, so files of any size can be checked
+    against claims without loading them.
+    """
+
+    def __init__(self, file_name):
+        self.file = open(file_name, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.header = json.loads(self.map[:HEADER_SIZE])
+
+    def __len__(self):
+        return self.header['count']
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        offset = HEADER_SIZE + index * RECORD_SIZE
+        record = self.map[offset:offset + RECORD_SIZE]
+        return record[:ADDRESS_SIZE].encode('hex'), \
+            int(record[ADDRESS_SIZE:ADDRESS_SIZE + UINT_SIZE].encode('hex'), 16), \
+            int(record[ADDRESS_SIZE + UINT_SIZE:].encode('hex'), 16)
+
+    def __iter__(self):
+        for index in xrange(len(self)):
+            yield self[index]
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+@click.command()
+@click.option('-protocol', default="http", help='Ethereum server protocol')
+@click.option('-host', default="localhost", help='Ethereum server host')
+@click.option('-port', default='8545', help='Ethereum server port')
+@click.option('-auction', help='Dutch auction address, final price and total received are read from it')
+@click.option('-bids', help='CSV file with header receiver,bid instead of reading bids from the auction')
+@click.option('-receivers', help='Sorted file with one bidder address per line, bids are read from the auction')
+@click.option('-block', default='latest', help='Block to read the auction at, before the first claim')
+@click.option('-final_price', default=None, type=int, help='Final price, if the auction is not read')
+@click.option('-total_received', default=None, type=int, help='Total received Wei, if the auction is not read')
+@click.option('-f', help='Result file')
+@click.option('-chunk_size', default=10000, help='Bidders processed at a time')
+def setup(protocol, host, port, auction, bids, receivers, block, final_price, total_received, f, chunk_size):
+    json_rpc = None
+    if auction:
+        from rpc import JsonRpc
+        from auction_reader import AuctionStateReader
+        json_rpc = JsonRpc(protocol, host, port)
+        block = json_rpc.block_number() if block == 'latest' else int(block)
+        state = AuctionStateReader(json_rpc, auction, fields=('finalPrice', 'totalReceived')).read(block)
+        final_price, total_received = state['finalPrice'], state['totalReceived']
+    if bids:
+        bidders = read_bidders(bids)
+    else:
+        bidders = bids_from_rpc(json_rpc, auction, read_receivers(receivers), block_tag=hex(block).rstrip("L"))
+    header = settle(bidders, final_price, total_received, f, chunk_size)
+    logging.info('Allocated {} tokens to {} bidders at final price {}, {} tokens were transferred to the wallet, '
+                 '{} lost to rounding.'.format(header['total_tokens'], header['count'], final_price,
+                                               header['wallet_transfer'], header['rounding']))
+
+if __name__ == '__main__':
+    setup()
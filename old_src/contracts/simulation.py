@@ -0,0 +1,110 @@
+from ethereum import tester as t
+from ethereum.tester import keys, accounts
+from ethereum.utils import privtoaddr
+from preprocessor import PreProcessor
+
+
+class AuctionSimulation:
+    """
+    Deploys wallet, DutchAuction and GnosisToken in a tester state, set up like the token launch and ready to start.
+    State can be snapshotted and reverted to run many scenarios from the same deployment.
+    """
+
+    HOMESTEAD_BLOCK = 1150000
+    GAS_LIMIT = 4712388
+    CEILING = 250000 * 10 ** 18
+    PRICE_FACTOR = 4000
+    PREASSIGNED_TOKENS = 1000000 * 10 ** 18
+    MAX_TOKENS_SOLD = 9000000 * 10 ** 18
+    WAITING_PERIOD = 60 * 60 * 24 * 7
+    WALLET_OWNER = 1
+    BIDDER = 2
+
+    def __init__(self, contract_dir='contracts/solidity/', ceiling=CEILING, price_factor=PRICE_FACTOR,
+                 add_dev_code=False):
+        self.pp = PreProcessor()
+        self.s = t.state()
+        self.s.block.number = self.HOMESTEAD_BLOCK
+        t.gas_limit = self.GAS_LIMIT
+        self.gas_used = 0
+        # Create wallet
+        self.multisig_wallet = self.s.abi_contract(
+            self.pp.process('Wallets/MultiSigWalletWithDailyLimit.sol', add_dev_code=add_dev_code,
+                            contract_dir=contract_dir),
+            language='solidity',
+            constructor_parameters=([accounts[self.WALLET_OWNER]], 1, 0)
+        )
+        # Create dutch auction
+        self.dutch_auction = self.s.abi_contract(self.pp.process('DO/DutchAuction.sol',
+                                                                 add_dev_code=add_dev_code,
+                                                                 contract_dir=contract_dir),
+                                                 constructor_parameters=(self.multisig_wallet.address,
+                                                                         ceiling,
+                                                                         price_factor),
+                                                 language='solidity')
+        # Create Gnosis token
+        self.gnosis_token = self.s.abi_contract(self.pp.process('Tokens/GnosisToken.sol',
+                                                                add_dev_code=add_dev_code,
+                                                                contract_dir=contract_dir),
+                                                language='solidity',
+                                                constructor_parameters=(self.dutch_auction.address,
+                                                                        [self.multisig_wallet.address],
+                                                                        [self.PREASSIGNED_TOKENS]))
+        # Setup dutch auction
+        self.dutch_auction.setup(self.gnosis_token.address)
+
+    def snapshot(self):
+        return self.s.snapshot(), self.gas_used
+
+    def revert(self, snapshot):
+        state, self.gas_used = snapshot
+        self.s.revert(state)
+
+    def call(self, function, *args, **kwargs):
+        """
+        Calls a contract function and adds its gas to gas_used.
+        """
+        result = function(*args, profiling=True, **kwargs)
+        self.gas_used += result['gas']
+        return result['output']
+
+    def submit_wallet_transaction(self, name, params):
+        data = self.dutch_auction.translator.encode(name, params)
+        self.call(self.multisig_wallet.submitTransaction, self.dutch_auction.address, 0, data,
+                  sender=keys[self.WALLET_OWNER])
+
+    def start(self, ceiling=None, price_factor=None, block_number=None):
+        """
+        Optionally changes settings and starts the auction at block_number.
+        """
+        if ceiling is not None or price_factor is not None:
+            self.submit_wallet_transaction('changeSettings', [
+                ceiling if ceiling is not None else self.dutch_auction.ceiling(),
+                price_factor if price_factor is not None else self.dutch_auction.priceFactor()
+            ])
+        if block_number is not None:
+            self.s.block.number = block_number
+        self.submit_wallet_transaction('startAuction', [])
+
+    def bid(self, value, receiver=None, sender=BIDDER, key=None):
+        """
+        Places a bid for receiver, funded by a tester account or by the account of a private key. Returns the
+        accepted amount.
+        """
+        key = key or keys[sender]
+        self.s.block.set_balance(privtoaddr(key), value * 2)
+        if receiver:
+            return self.call(self.dutch_auction.bid, receiver, sender=key, value=value)
+        return self.call(self.dutch_auction.bid, sender=key, value=value)
+
+    def advance(self, blocks=0, seconds=0):
+        self.s.block.number += blocks
+        self.s.block.timestamp += seconds
+
+    def update_stage(self):
+        return self.call(self.dutch_auction.updateStage)
+
+    def claim_tokens(self, receiver=None, sender=BIDDER):
+        if receiver:
+            return self.call(self.dutch_auction.claimTokens, receiver, sender=keys[sender])
+        return self.call(self.dutch_auction.claimTokens, sender=keys[sender])
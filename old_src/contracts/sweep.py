@@ -0,0 +1,173 @@
+from ethereum.tester import TransactionFailed
+from simulation import AuctionSimulation
+from end_predictor import crossing_offset, PRICE_OFFSET
+from multiprocessing import Pool
+import itertools
+import random
+import click
+import time
+import csv
+import logging
+logging.basicConfig(level=logging.INFO)
+
+# Bid arrival profiles: exponent of the arrival time distribution, total demand in Ether and arrival window as a
+# multiple of the horizon. Arrival blocks are window * horizon * u ** exponent for uniform u, an exponent above 1
+# moves bids to the start, below 1 to the end. Stragglers keep bidding after the auction may have ended.
+PROFILES = {
+    'early': (3.0, 300000, 1),
+    'uniform': (1.0, 300000, 1),
+    'late': (1 / 3.0, 300000, 1),
+    'thin': (1.0, 100000, 1),
+    'stragglers': (1.0, 100000, 8),
+}
+COLUMNS = ('ceiling', 'price_factor', 'profile', 'final_price', 'end_block', 'tokens_sold', 'total_received',
+           'accepted_bids', 'gas')
+SECONDS_PER_BLOCK = 15
+
+# Simulation of a worker process, deployed once and reverted to its snapshot for every grid point
+_simulation = None
+_snapshot = None
+
+
+def generate_bids(rnd, profile, price_factor, count):
+    """
+    Returns count (block offset, value in Wei, receiver) tuples sorted by block offset. The horizon is the block the
+    price would reach the stop price if all demand was accepted, with a window of 1 no bid is sent to an ended auction
+    because of its arrival time.
+    """
+    exponent, demand, window = PROFILES[profile]
+    demand *= 10 ** 18
+    horizon = crossing_offset(price_factor, demand) - PRICE_OFFSET
+    weights = [rnd.uniform(0.1, 1) for _ in range(count)]
+    offsets = sorted(int(window * horizon * rnd.random() ** exponent) for _ in range(count))
+    return [(offset, int(demand * weight / sum(weights)), '{:040x}'.format(rnd.getrandbits(160)))
+            for offset, weight in zip(offsets, weights)]
+
+
+def run_lifecycle(simulation, snapshot, ceiling, price_factor, profile, bid_count, seed):
+    """
+    Runs start, bids, finalization and claims of all accepted bidders from the deployed snapshot. Returns a row
+    of the results table, end_block is the number of blocks between start and end of the auction.
+    """
+    simulation.revert(snapshot)
+    simulation.start(ceiling, price_factor)
+    auction = simulation.dutch_auction
+    start_block = simulation.s.block.number
+    end_block = None
+    accepted = []
+    for offset, value, receiver in generate_bids(random.Random(seed), profile, price_factor, bid_count):
+        blocks = start_block + offset - simulation.s.block.number
+        simulation.advance(blocks, blocks * SECONDS_PER_BLOCK)
+        if auction.calcTokenPrice() <= auction.calcStopPrice():
+            # The price reached the stop price before this bid arrived, the next transaction finalizes the auction
+            simulation.update_stage()
+            end_block = crossing_offset(price_factor, auction.totalReceived()) - PRICE_OFFSET
+            break
+        try:
+            simulation.bid(value, receiver)
+        except TransactionFailed:
+            continue
+        accepted.append(receiver)
+        if auction.stage() != 2:
+            # Ceiling or maximum of sold tokens reached
+            end_block = offset
+            break
+    if end_block is None:
+        end_block = crossing_offset(price_factor, auction.totalReceived()) - PRICE_OFFSET
+        blocks = start_block + end_block - simulation.s.block.number
+        simulation.advance(blocks, blocks * SECONDS_PER_BLOCK)
+        simulation.update_stage()
+    simulation.advance(seconds=AuctionSimulation.WAITING_PERIOD + 1)
+    for receiver in accepted:
+        simulation.claim_tokens(receiver)
+    final_price = auction.finalPrice()
+    return {
+        'ceiling': ceiling,
+        'price_factor': price_factor,
+        'profile': profile,
+        'final_price': final_price,
+        'end_block': end_block,
+        'tokens_sold': auction.totalReceived() * 10 ** 18 / final_price,
+        'total_received': auction.totalReceived(),
+        'accepted_bids': len(accepted),
+        'gas': simulation.gas_used,
+    }
+
+
+def init_worker(contract_dir):
+    global _simulation, _snapshot
+    _simulation = AuctionSimulation(contract_dir=contract_dir)
+    _snapshot = _simulation.snapshot()
+
+
+def run_point(args):
+    return run_lifecycle(_simulation, _snapshot, *args)
+
+
+class Sweep:
+    """
+    Runs the auction lifecycle for every point of a grid of ceilings, price factors and bid arrival profiles in a
+    process pool. Every worker deploys the contracts once and reverts to the deployed state for every point.
+    """
+
+    def __init__(self, contract_dir='contracts/solidity/', processes=None, bid_count=20, seed=0):
+        self.contract_dir = contract_dir
+        self.processes = processes
+        self.bid_count = bid_count
+        self.seed = seed
+
+    def grid(self, ceilings, price_factors, profiles):
+        # The same seed for all points, so every profile has the same bids across ceilings and price factors
+        return [(ceiling, price_factor, profile, self.bid_count, self.seed)
+                for ceiling, price_factor, profile in itertools.product(ceilings, price_factors, profiles)]
+
+    def run(self, ceilings, price_factors, profiles):
+        tasks = self.grid(ceilings, price_factors, profiles)
+        start_time = time.time()
+        if self.processes == 1:
+            init_worker(self.contract_dir)
+            rows = map(run_point, tasks)
+        else:
+            pool = Pool(self.processes, initializer=init_worker, initargs=(self.contract_dir,))
+            rows = pool.map(run_point, tasks, chunksize=1)
+            pool.close()
+            pool.join()
+        logging.info('Ran {} grid points in {:.3f} seconds.'.format(len(tasks), time.time() - start_time))
+        return rows
+
+
+def write_table(file_name, rows):
+    with open(file_name, 'w') as table_file:
+        writer = csv.DictWriter(table_file, COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def format_table(rows):
+    lines = ['{:>12} {:>12} {:>10} {:>20} {:>9} {:>14} {:>12} {:>5} {:>10}'.format(
+        'Ceiling', 'Price factor', 'Profile', 'Final price', 'End block', 'Tokens sold', 'Received', 'Bids', 'Gas')]
+    for row in rows:
+        lines.append('{:>12} {:>12} {:>10} {:>20} {:>9} {:>14} {:>12} {:>5} {:>10}'.format(
+            row['ceiling'] / 10 ** 18, row['price_factor'], row['profile'], row['final_price'], row['end_block'],
+            row['tokens_sold'] / 10 ** 18, row['total_received'] / 10 ** 18, row['accepted_bids'], row['gas']))
+    return '\n'.join(lines)
+
+
+@click.command()
+@click.option('-ceilings', default='200000,250000,300000', help='Comma separated ceilings in Ether')
+@click.option('-price_factors', default='2000,4000,6000', help='Comma separated price factors')
+@click.option('-profiles', default=','.join(sorted(PROFILES)), help='Comma separated bid arrival profiles')
+@click.option('-bids', default=20, help='Bids per grid point')
+@click.option('-processes', default=None, type=int, help='Worker processes, defaults to number of CPUs')
+@click.option('-seed', default=0, help='Seed of the bids')
+@click.option('-contract_dir', default='solidity/', help='Import directory')
+@click.option('-f', default='sweep.csv', help='Results table')
+def setup(ceilings, price_factors, profiles, bids, processes, seed, contract_dir, f):
+    sweep = Sweep(contract_dir, processes, bids, seed)
+    rows = sweep.run([int(ceiling) * 10 ** 18 for ceiling in ceilings.split(',')],
+                     [int(price_factor) for price_factor in price_factors.split(',')], profiles.split(','))
+    write_table(f, rows)
+    logging.info('Results of {} grid points written to {}:\n{}'.format(len(rows), f, format_table(rows)))
+
+if __name__ == '__main__':
+    setup()
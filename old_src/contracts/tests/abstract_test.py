@@ -3,10 +3,25 @@ from ethereum import tester as t
 from ethereum.tester import keys, accounts, TransactionFailed
 from ethereum.utils import sha3
 from contracts.preprocessor import PreProcessor
+from contracts.packed_encoding import PackedEncoder, encode_uint, encode_bytes
+from contracts.tests.profiler import CallProfiler, ProfiledState
+from contracts.compile_cache import CachingCompiler
 # signing
 from bitcoin import ecdsa_raw_sign
 # standard libraries
 from unittest import TestCase
+import atexit
+import os
+
+# Set CONTRACT_PROFILE to a file name to profile all contract calls of the suite
+PROFILE_REPORT = os.environ.get('CONTRACT_PROFILE')
+profiler = CallProfiler() if PROFILE_REPORT else None
+if profiler:
+    atexit.register(profiler.write_report, PROFILE_REPORT)
+
+# Contracts are compiled once per source, set CONTRACT_COMPILE_CACHE to a directory to keep results across runs.
+# The cache replaces the tester compiler while a test runs.
+compile_cache = CachingCompiler(t.languages['solidity'], os.environ.get('CONTRACT_COMPILE_CACHE'))
 
 
 class AbstractTestContract(TestCase):
@@ -35,7 +50,8 @@ class AbstractTestContract(TestCase):
     def __init__(self, *args, **kwargs):
         super(AbstractTestContract, self).__init__(*args, **kwargs)
         self.pp = PreProcessor()
-        self.s = t.state()
+        self.encoder = PackedEncoder()
+        self.s = ProfiledState(profiler) if profiler else t.state()
         self.s.block.number = self.HOMESTEAD_BLOCK
         t.gas_limit = 4712388
         self.coinbase = self.s.block.coinbase.encode("hex")
@@ -63,6 +79,11 @@ class AbstractTestContract(TestCase):
         self.oraclize_oracle_name = self.ORACLES_DIR + 'OraclizeOracle.sol'
 
     def setUp(self):
+        # Restored also if deploying the contracts below fails and tearDown is not run
+        t.languages['solidity'] = compile_cache
+        self.addCleanup(t.languages.__setitem__, 'solidity', compile_cache.compiler)
+        if profiler:
+            profiler.start_test(self.id())
         if self.do_name in self.deploy_contracts:
             self.do = self.s.abi_contract(self.pp.process(self.do_name,
                                                           add_dev_code=True,
@@ -184,35 +205,34 @@ class AbstractTestContract(TestCase):
 
     @staticmethod
     def i2b(_integer, zfill=64):
-        return format(_integer, 'x').zfill(zfill).decode('hex')
+        return encode_uint(_integer, zfill / 2)
 
     @staticmethod
     def s2b(_string):
-        return _string.encode('hex').zfill(64).decode('hex')
+        return encode_bytes(_string)
+
+    def write_values(self, values):
+        for value in values:
+            if type(value) == int:
+                self.encoder.write_uint(value)
+            else:
+                self.encoder.write_bytes(value)
 
     def get_state_hash(self, addresses, state_validity, trades, tokens, hash_lock):
-        return sha3(
-            self.s2b(addresses[0]) +
-            self.s2b(addresses[1]) +
-            self.i2b(state_validity[0]) +
-            self.i2b(state_validity[1]) +
-            ''.join([self.i2b(trade) if type(trade) == int else (self.s2b(trade)) for trade in trades]) +
-            ''.join([self.i2b(token) if type(token) == int else self.s2b(token) for token in tokens]) +
-            hash_lock
-        ).encode('hex')
+        encoder = self.encoder.reset()
+        encoder.write_bytes(addresses[0]).write_bytes(addresses[1])
+        encoder.write_uint(state_validity[0]).write_uint(state_validity[1])
+        self.write_values(trades)
+        self.write_values(tokens)
+        encoder.write_raw(hash_lock)
+        return encoder.sha3().encode('hex')
 
     def get_fee_hash(self, description_hash, fee, token_address):
-        return sha3(
-            description_hash +
-            self.i2b(fee) +
-            token_address
-        ).encode('hex')
+        return self.encoder.reset().write_raw(description_hash).write_uint(fee).write_raw(token_address)\
+            .sha3().encode('hex')
 
     def get_result_hash(self, description_hash, result):
-        return sha3(
-            description_hash +
-            self.i2b(result)
-        ).encode('hex')
+        return self.encoder.reset().write_raw(description_hash).write_uint(result).sha3().encode('hex')
 
     def get_event_hash(self,
                        description_hash,
@@ -223,16 +243,12 @@ class AbstractTestContract(TestCase):
                        token_address,
                        resolver_address,
                        event_data):
-        return sha3(
-            description_hash +
-            self.i2b(is_ranged, 2) +
-            self.i2b(lower_bound) +
-            self.i2b(upper_bound) +
-            self.i2b(outcome_count, 2) +
-            token_address +
-            resolver_address +
-            ''.join([self.i2b(datum) if type(datum) == int else self.s2b(datum) for datum in event_data])
-        )
+        encoder = self.encoder.reset()
+        encoder.write_raw(description_hash)
+        encoder.write_uint(is_ranged, 1).write_uint(lower_bound).write_uint(upper_bound).write_uint(outcome_count, 1)
+        encoder.write_raw(token_address).write_raw(resolver_address)
+        self.write_values(event_data)
+        return encoder.sha3()
 
     @staticmethod
     def get_market_hash(event_hash, sender_address, market_maker_address):
@@ -251,16 +267,13 @@ class AbstractTestContract(TestCase):
                           market_maker_address,
                           closing_at_block,
                           initial_shares):
-        return sha3(
-            market_address +
-            event_hash +
-            self.i2b(fee) +
-            self.i2b(initial_funding) +
-            self.i2b(total_funding) +
-            market_maker_address +
-            self.i2b(closing_at_block) +
-            ''.join([self.i2b(share) for share in initial_shares])
-        )
+        encoder = self.encoder.reset()
+        encoder.write_raw(market_address).write_raw(event_hash)
+        encoder.write_uint(fee).write_uint(initial_funding).write_uint(total_funding)
+        encoder.write_raw(market_maker_address).write_uint(closing_at_block)
+        for share in initial_shares:
+            encoder.write_uint(share)
+        return encoder.sha3()
 
     def sign_data(self, data, private_key):
         v, r, s = ecdsa_raw_sign(data, private_key)
@@ -0,0 +1,67 @@
+from ..abstract_test import AbstractTestContract
+from contracts.artifacts import Artifact, ArtifactStore
+from contracts.local_node import LocalNode
+from contracts.deploy import Deploy
+import tempfile
+import json
+import os
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_artifacts
+    """
+
+    CODE = 'contract Counter { uint public count; function Counter(uint _count) { count = _count; } }'
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        # Artifacts are written to and loaded from the artifact directory
+        artifact_dir = tempfile.mkdtemp()
+        artifact = Artifact.compile(self.CODE, 'Counter')
+        artifact.save(artifact_dir)
+        store = ArtifactStore(artifact_dir)
+        loaded = store.get('Counter')
+        self.assertEqual(loaded.to_dict(), artifact.to_dict())
+        self.assertTrue(loaded.matches_source(self.CODE))
+        self.assertIs(store.get('Counter'), loaded)
+        self.assertIsNone(store.get('Missing'))
+        # Deployments from artifacts neither read nor compile the source, the contract directory is empty
+        instructions_file_name = os.path.join(tempfile.mkdtemp(), 'instructions.json')
+        with open(instructions_file_name, 'w') as instructions_file:
+            json.dump([{'type': 'deployment', 'file': 'Tokens/Counter.sol', 'params': [5]},
+                       {'type': 'assertion', 'contract': 'Counter', 'name': 'count', 'params': [], 'return': 5}],
+                      instructions_file)
+        node = LocalNode()
+        port = node.start()
+        try:
+            deploy = Deploy('http', 'localhost', port, 'false', 'true', tempfile.mkdtemp() + '/', 4712388, 1, None,
+                            artifact_dir=artifact_dir)
+            deploy.process(instructions_file_name)
+            self.assertEqual(deploy.compiled, {})
+            deployed_code = node.eth_getCode(deploy.contract_addresses['Counter'])
+            self.assertGreater(len(deployed_code), 2)
+            if loaded.runtime_bytecode:
+                self.assertEqual(deployed_code, '0x' + loaded.runtime_bytecode)
+            # Artifacts are only used if they were built from the sources of the contract directory
+            contract_dir = tempfile.mkdtemp() + '/'
+            os.makedirs(contract_dir + 'Tokens')
+            with open(contract_dir + 'Tokens/Counter.sol', 'w') as contract_file:
+                contract_file.write(self.CODE)
+            Artifact.compile(self.pp.process('Tokens/Counter.sol', contract_dir=contract_dir), 'Counter').save(
+                artifact_dir)
+            deploy = Deploy('http', 'localhost', port, 'false', 'true', contract_dir, 4712388, 1, None,
+                            artifact_dir=artifact_dir)
+            deploy.process(instructions_file_name)
+            self.assertEqual(deploy.compiled, {})
+            with open(contract_dir + 'Tokens/Counter.sol', 'w') as contract_file:
+                contract_file.write(self.CODE[:-1] + 'function reset() { count = 0; } }')
+            deploy = Deploy('http', 'localhost', port, 'false', 'true', contract_dir, 4712388, 1, None,
+                            artifact_dir=artifact_dir)
+            deploy.process(instructions_file_name)
+            self.assertEqual(len(deploy.compiled), 1)
+            self.assertIn('reset', deploy.translators['Tokens/Counter.sol'].function_data)
+        finally:
+            node.stop()
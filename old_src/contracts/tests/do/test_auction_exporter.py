@@ -0,0 +1,75 @@
+from ..abstract_test import AbstractTestContract, accounts
+from contracts.simulation import AuctionSimulation
+from contracts.local_node import LocalNode
+from contracts.auction_exporter import AuctionExporter
+from contracts.rpc import JsonRpc
+import threading
+import urllib2
+
+
+class CountingJsonRpc(JsonRpc):
+
+    def __init__(self, *args, **kwargs):
+        JsonRpc.__init__(self, *args, **kwargs)
+        self.requests = 0
+
+    def post(self, payload, timeout=None):
+        self.requests += 1
+        return JsonRpc.post(self, payload, timeout)
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_auction_exporter
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        simulation = AuctionSimulation(contract_dir=self.contract_dir)
+        simulation.start()
+        node = LocalNode(state=simulation.s)
+        port = node.start()
+        server = None
+        try:
+            auction_address = '0x' + simulation.dutch_auction.address.encode('hex')
+            json_rpc = CountingJsonRpc(port=port)
+            exporter = AuctionExporter(json_rpc, auction_address)
+            self.assertTrue(exporter.poll())
+            self.assertEqual(exporter.state['stage'], 2)
+            # Nothing but the block number is requested until the next block, scrapes cost no RPC
+            self.assertFalse(exporter.poll())
+            self.assertEqual(json_rpc.requests, 3)
+            server = exporter.serve()
+            for _ in range(3):
+                text = urllib2.urlopen('http://localhost:{}/metrics'.format(server.server_address[1])).read()
+            self.assertEqual(json_rpc.requests, 3)
+            self.assertIn('# TYPE dutch_auction_exporter_scrapes_total counter\n'
+                          'dutch_auction_exporter_scrapes_total{{auction="{}"}} 3\n'.format(auction_address), text)
+            # Concurrent scrapes are all counted
+            threads = [threading.Thread(target=lambda: [exporter.scrape() for _ in range(50)]) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(exporter.scrapes, 203)
+            # Bids of several blocks are counted with one batch
+            bidder = '0x' + accounts[AuctionSimulation.BIDDER].encode('hex')
+            data = '0x' + simulation.dutch_auction.translator.encode('bid', [bidder]).encode('hex')
+            for _ in range(2):
+                json_rpc.call('eth_sendTransaction', [{'from': bidder, 'to': auction_address, 'data': data,
+                                                       'value': hex(10 * 10 ** 18).rstrip('L')}])
+            requests = json_rpc.requests
+            self.assertTrue(exporter.poll())
+            self.assertEqual(json_rpc.requests, requests + 2)
+            self.assertEqual(exporter.bids, 2)
+            self.assertEqual(exporter.state['totalReceived'], 20 * 10 ** 18)
+            label = '{{auction="{}"}}'.format(auction_address)
+            self.assertIn('dutch_auction_total_received_wei{} {}\n'.format(label, 20 * 10 ** 18), exporter.text)
+            self.assertIn('dutch_auction_bids_total{} 2\n'.format(label), exporter.text)
+            self.assertIn('dutch_auction_stage{} 2\n'.format(label), exporter.text)
+        finally:
+            if server:
+                server.shutdown()
+            node.stop()
@@ -0,0 +1,90 @@
+from ..abstract_test import AbstractTestContract
+from contracts.simulation import AuctionSimulation
+from contracts.local_node import LocalNode
+from contracts.auction_reader import AuctionStateReader
+from contracts.rpc import JsonRpc
+
+
+class CountingJsonRpc(JsonRpc):
+    """
+    Counts requests and batches.
+    """
+
+    def __init__(self, *args, **kwargs):
+        JsonRpc.__init__(self, *args, **kwargs)
+        self.requests = 0
+        self.batches = 0
+
+    def post(self, payload, timeout=None):
+        self.requests += 1
+        return JsonRpc.post(self, payload, timeout)
+
+    def batch(self, calls):
+        self.batches += 1
+        return JsonRpc.batch(self, calls)
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_auction_reader
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        simulation = AuctionSimulation(contract_dir=self.contract_dir)
+        simulation.start()
+        receivers = ['{:040x}'.format(index) for index in range(1, 4)]
+        simulation.bid(10 * 10 ** 18, receivers[0])
+        simulation.bid(20 * 10 ** 18, receivers[1])
+        node = LocalNode(state=simulation.s)
+        port = node.start()
+        try:
+            json_rpc = CountingJsonRpc(port=port)
+            # Batches are answered in the order of calls with one request, errors are reported per call
+            self.assertEqual(json_rpc.batch([]), [])
+            self.assertEqual(json_rpc.requests, 0)
+            responses = json_rpc.batch([('eth_blockNumber', []), ('eth_unknown', []), ('eth_coinbase', [])])
+            self.assertEqual(json_rpc.requests, 1)
+            self.assertEqual(int(responses[0]['result'], 16), simulation.s.block.number)
+            self.assertEqual(responses[1]['error']['code'], -32601)
+            self.assertEqual(responses[2]['result'], node.eth_coinbase())
+            # The latest block is read with its block number and one batch
+            reader = AuctionStateReader(json_rpc, '0x' + simulation.dutch_auction.address.encode('hex'),
+                                        watch_list=receivers[:2])
+            requests = json_rpc.requests
+            batches = json_rpc.batches
+            state = reader.read()
+            self.assertEqual(json_rpc.requests, requests + 2)
+            self.assertEqual(json_rpc.batches, batches + 1)
+            self.assertEqual(state['block'], simulation.s.block.number)
+            self.assertEqual(state['stage'], 2)
+            self.assertEqual(state['totalReceived'], 30 * 10 ** 18)
+            self.assertEqual(state['ceiling'], AuctionSimulation.CEILING)
+            self.assertEqual(state['bids'], {receivers[0]: 10 * 10 ** 18, receivers[1]: 20 * 10 ** 18})
+            # Reads of the cached block cost no RPC, latest reads in the same block only the block number
+            self.assertIs(reader.read(state['block']), state)
+            self.assertEqual(json_rpc.requests, requests + 2)
+            self.assertIs(reader.read(), state)
+            self.assertEqual(json_rpc.requests, requests + 3)
+            self.assertEqual(json_rpc.batches, batches + 1)
+            # Watching and unwatching addresses invalidates the cached snapshot
+            reader.watch(receivers[2])
+            state = reader.read(state['block'])
+            self.assertEqual(json_rpc.requests, requests + 4)
+            self.assertEqual(state['bids'][receivers[2]], 0)
+            reader.unwatch(receivers[0])
+            state = reader.read(state['block'])
+            self.assertEqual(json_rpc.requests, requests + 5)
+            self.assertEqual(sorted(state['bids']), receivers[1:])
+            # A new block is read with one batch pinned to it
+            simulation.advance(1)
+            simulation.bid(5 * 10 ** 18, receivers[1])
+            batches = json_rpc.batches
+            state = reader.read()
+            self.assertEqual(json_rpc.batches, batches + 1)
+            self.assertEqual(state['block'], simulation.s.block.number)
+            self.assertEqual(state['bids'][receivers[1]], 25 * 10 ** 18)
+        finally:
+            node.stop()
@@ -0,0 +1,42 @@
+from ..abstract_test import AbstractTestContract, compile_cache
+from contracts.benchmark import generate_tree, Benchmark, write_results, compare, STAGES
+import tempfile
+import shutil
+import os
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_benchmark
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        contract_dir = tempfile.mkdtemp() + '/'
+        leaf_files = generate_tree(contract_dir, files=20, chain_depth=5, macros=2, placeholders=2)
+        self.assertEqual(len(leaf_files), 5)
+        benchmark = Benchmark(contract_dir, leaf_files, placeholders=2, repeat=1, compile_count=1, deploy_count=3)
+        # Generated leaves preprocess to complete contracts
+        code = benchmark.run_process(self.pp)[0]
+        self.assertNotIn('macro:', code)
+        self.assertNotIn('{{TARGET', code)
+        self.assertIn('"{{NOT_A_PLACEHOLDER}}"', code)
+        # The compile stage runs solc instead of the compile cache installed for tests
+        cached = len(compile_cache.results)
+        benchmark.run_compile([code])
+        self.assertEqual(len(compile_cache.results), cached)
+        # All stages run, deployments are asserted against the local node
+        results = benchmark.run()
+        self.assertEqual([result['stage'] for result in results], list(STAGES))
+        file_name = os.path.join(tempfile.mkdtemp(), 'benchmark.jsonl')
+        write_results(file_name, results, {'files': 20}, commit='base')
+        write_results(file_name, [dict(result, seconds=result['seconds'] * 2) for result in results], {'files': 20},
+                      commit='head')
+        rows = compare(file_name, 'base', 'head')
+        self.assertEqual(len(rows), len(STAGES))
+        for stage, base_seconds, seconds, ratio in rows:
+            self.assertAlmostEqual(ratio, 2)
+        shutil.rmtree(contract_dir)
+        shutil.rmtree(os.path.dirname(file_name))
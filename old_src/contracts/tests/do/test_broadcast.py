@@ -0,0 +1,89 @@
+from ..abstract_test import AbstractTestContract, keys
+from contracts.local_node import LocalNode
+from contracts.deploy import Deploy
+from contracts.bundle import read_bundle, sign_transaction
+from contracts.broadcast import BundleBroadcaster
+from contracts.rpc import JsonRpc
+import tempfile
+import json
+import os
+
+
+class CountingJsonRpc(JsonRpc):
+
+    def __init__(self, *args, **kwargs):
+        JsonRpc.__init__(self, *args, **kwargs)
+        self.requests = 0
+
+    def post(self, payload, timeout=None):
+        self.requests += 1
+        return JsonRpc.post(self, payload, timeout)
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_broadcast
+    """
+
+    CODE = '''contract Counter {
+    uint public count;
+    function Counter(uint _count) {
+        count = _count;
+    }
+    function increase() {
+        count += 1;
+    }
+}
+'''
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        contract_dir = tempfile.mkdtemp() + '/'
+        with open(os.path.join(contract_dir, 'Counter.sol'), 'w') as contract_file:
+            contract_file.write(self.CODE)
+        instructions_file_name = os.path.join(tempfile.mkdtemp(), 'instructions.json')
+        with open(instructions_file_name, 'w') as instructions_file:
+            json.dump([{'type': 'deployment', 'file': 'Counter.sol', 'reference': 'COUNTER', 'params': [1]}] +
+                      [{'type': 'transaction', 'contract': 'COUNTER', 'name': 'increase', 'params': []}] * 4 +
+                      [{'type': 'assertion', 'contract': 'COUNTER', 'name': 'count', 'params': [], 'return': 5}],
+                      instructions_file)
+        node = LocalNode()
+        port = node.start()
+        try:
+            # Transactions are signed into a bundle without sending anything
+            bundle_file_name = os.path.join(tempfile.mkdtemp(), 'bundle.jsonl')
+            deploy = Deploy('http', 'localhost', port, 'false', 'false', contract_dir, 4712388, 1,
+                            keys[0].encode('hex'), bundle=bundle_file_name, nonce='0')
+            deploy.process(instructions_file_name)
+            self.assertEqual(node.receipts, {})
+            entries = list(read_bundle(bundle_file_name))
+            transactions = [entry for entry in entries if entry['type'] == 'transaction']
+            self.assertEqual([tx['nonce'] for tx in transactions], range(5))
+            self.assertEqual(transactions[0]['contract_address'], deploy.contract_addresses['COUNTER'])
+            # Broadcast in batches, receipts are checked against precomputed addresses and assertions hold
+            json_rpc = CountingJsonRpc(port=port)
+            broadcaster = BundleBroadcaster(json_rpc, batch_size=2, poll_interval=0, max_attempts=3)
+            broadcaster.run(bundle_file_name)
+            self.assertEqual(sorted(receipt['transactionHash'] for receipt in node.receipts.values()),
+                             sorted(tx['hash'] for tx in transactions))
+            self.assertEqual([receipt['contractAddress'] for receipt in node.receipts.values()
+                              if receipt['contractAddress']], [deploy.contract_addresses['COUNTER']])
+            # A second run finds all transactions sent
+            self.assertEqual(broadcaster.unsent_transactions(entries[0]['sender'], transactions), [])
+            broadcaster.run(bundle_file_name)
+            # A transaction with a used nonce fails without retries
+            raw_tx, transaction_hash = sign_transaction((keys[0].encode('hex'), 0, 1, 100000, '', ''))
+            stale = {'name': 'stale', 'nonce': 0, 'raw': raw_tx, 'hash': '0x' + transaction_hash}
+            requests = json_rpc.requests
+            self.assertRaises(ValueError, broadcaster.broadcast, [stale])
+            self.assertEqual(json_rpc.requests, requests + 1)
+            # Transient errors are retried at most max_attempts times
+            node.error_rate = 1
+            raw_tx, transaction_hash = sign_transaction((keys[0].encode('hex'), 5, 1, 100000, '', ''))
+            self.assertRaises(ValueError, broadcaster.broadcast, [{'name': 'next', 'nonce': 5, 'raw': raw_tx,
+                                                                   'hash': '0x' + transaction_hash}])
+            self.assertEqual(json_rpc.requests, requests + 4)
+        finally:
+            node.stop()
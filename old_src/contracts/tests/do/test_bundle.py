@@ -0,0 +1,43 @@
+from ..abstract_test import AbstractTestContract, accounts, keys
+from contracts.bundle import TransactionBundle, read_bundle
+from ethereum.transactions import Transaction
+from ethereum.abi import ContractTranslator
+from ethereum.processblock import apply_transaction
+from ethereum.utils import mk_contract_address
+from ethereum.tester import languages
+import rlp
+import tempfile
+import os
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_bundle
+    """
+
+    CODE = 'contract Counter { uint public count; function increase() { count += 1; } }'
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        compiled = languages['solidity'].combined(self.CODE)[-1][1]
+        nonce = self.s.block.get_nonce(accounts[0])
+        contract_address = '0x' + mk_contract_address(accounts[0], nonce).encode('hex')
+        bundle = TransactionBundle(accounts[0].encode('hex'), keys[0].encode('hex'), 1000000, 1, processes=2)
+        bundle.add_transaction(nonce, '', compiled['bin_hex'], 'Counter', contract_address)
+        increase_data = ContractTranslator(compiled['abi']).encode('increase', [])
+        for i in range(1, 20):
+            bundle.add_transaction(nonce + i, contract_address, increase_data.encode('hex'), 'increase')
+        file_name = os.path.join(tempfile.mkdtemp(), 'bundle.jsonl')
+        bundle.write(file_name)
+        entries = list(read_bundle(file_name))
+        self.assertEqual(entries[0]['transactions'], 20)
+        # Signed transactions apply in nonce order
+        for entry in entries[1:]:
+            tx = rlp.decode(entry['raw'].decode('hex'), Transaction)
+            self.assertEqual(tx.sender, accounts[0])
+            self.assertEqual('0x' + tx.hash.encode('hex'), entry['hash'])
+            success, _ = apply_transaction(self.s.block, tx)
+            self.assertTrue(success)
+        self.assertEqual(self.s.block.get_storage_data(contract_address[2:].decode('hex'), 0), 19)
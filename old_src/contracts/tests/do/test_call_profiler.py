@@ -0,0 +1,68 @@
+from ..abstract_test import AbstractTestContract, TransactionFailed
+from contracts.tests.profiler import CallProfiler, ProfiledState
+from ethereum import tester as t
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_call_profiler
+    """
+
+    CODE = '''contract Counter {
+    uint public count;
+    function increase() {
+        count += 1;
+    }
+    function fail() {
+        throw;
+    }
+}
+  library Helper {
+    function help() returns (uint) {
+        return 1;
+    }
+}
+'''
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        profiler = CallProfiler()
+        state = ProfiledState(profiler)
+        # Contracts are labeled with the name of the deployed contract, not the first or last declared one
+        counter = state.abi_contract(self.CODE, language='solidity', contract_name='Counter')
+        helper = state.abi_contract(self.CODE, language='solidity')
+        self.assertNotIn('abi_contract', state.__dict__)
+        # Names are found without compiling the source again
+        compiler = t.languages['solidity']
+        t.languages['solidity'] = None
+        try:
+            self.assertEqual(CallProfiler.contract_name(self.CODE, 'solidity'), 'Helper')
+            self.assertEqual(CallProfiler.contract_name(self.CODE, 'solidity', 'Counter'), 'Counter')
+        finally:
+            t.languages['solidity'] = compiler
+        profiler.start_test('first')
+        counter.increase()
+        self.assertEqual(counter.count(), 1)
+        self.assertEqual(helper.help(), 1)
+        profiler.start_test('second')
+        self.assertEqual(counter.increase(profiling=True)['output'], None)
+        self.assertRaises(TransactionFailed, counter.fail)
+        self.assertEqual(sorted(profiler.functions),
+                         [('Counter', 'count'), ('Counter', 'fail'), ('Counter', 'increase'), ('Helper', 'help')])
+        increase = profiler.functions[('Counter', 'increase')]
+        self.assertEqual(increase['calls'], 2)
+        self.assertGreater(increase['gas'], 0)
+        self.assertEqual(increase['failed'], 0)
+        fail = profiler.functions[('Counter', 'fail')]
+        self.assertEqual((fail['calls'], fail['gas'], fail['failed']), (1, 0, 1))
+        # Successful and failed calls are timed with the same wall clock
+        for entry in profiler.functions.values():
+            self.assertGreater(entry['time'], 0)
+        self.assertEqual(profiler.tests['first']['calls'], 3)
+        self.assertEqual(profiler.tests['second']['calls'], 2)
+        report = profiler.report()
+        self.assertIn('Counter.increase', report)
+        self.assertIn('Helper.help', report)
+        self.assertIn('second', report)
@@ -0,0 +1,56 @@
+from ..abstract_test import AbstractTestContract
+from contracts.compile_cache import CachingCompiler
+from ethereum import tester as t
+import tempfile
+
+
+class CountingCompiler:
+
+    def __init__(self, compiler):
+        self.compiler = compiler
+        self.calls = []
+
+    def combined(self, code, *args, **kwargs):
+        self.calls.append('combined')
+        return self.compiler.combined(code, *args, **kwargs)
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_compile_cache
+    """
+
+    CODE = '''contract Counter {
+    uint public count;
+    function increase() {
+        count += 1;
+    }
+}
+'''
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        compiler = t.languages['solidity'].compiler
+        counting = CountingCompiler(compiler)
+        cache_dir = tempfile.mkdtemp()
+        cache = CachingCompiler(counting, cache_dir)
+        # Bytecode and ABI come from one compilation
+        self.assertEqual(cache.compile(self.CODE), compiler.compile(self.CODE))
+        self.assertEqual(cache.mk_full_signature(self.CODE), compiler.mk_full_signature(self.CODE))
+        self.assertEqual(counting.calls, ['combined'])
+        # Deployments through the tester use the cache
+        t.languages['solidity'] = cache
+        counter = self.s.abi_contract(self.CODE, language='solidity')
+        counter.increase()
+        self.assertEqual(counter.count(), 1)
+        self.assertEqual(counting.calls, ['combined'])
+        # Results are kept in the cache directory per compiler version
+        cache = CachingCompiler(counting, cache_dir)
+        cache.compile(self.CODE)
+        self.assertEqual(counting.calls, ['combined'])
+        cache = CachingCompiler(counting, cache_dir)
+        cache.version = 'Version: 0.0.0'
+        cache.compile(self.CODE)
+        self.assertEqual(counting.calls, ['combined', 'combined'])
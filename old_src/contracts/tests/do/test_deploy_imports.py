@@ -0,0 +1,26 @@
+from ..abstract_test import AbstractTestContract
+import contracts
+import subprocess
+import json
+import sys
+import os
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_deploy_imports
+    """
+
+    # Modules deploy.py imports in the code paths using them
+    DEFERRED_MODULES = ('ethereum.tester', 'bundle', 'transaction_manager', 'multi_rpc')
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        # A fresh interpreter, modules imported by other tests are not loaded
+        script = 'import sys, json, deploy; print json.dumps([name for name in {!r} if name in sys.modules])'.format(
+            self.DEFERRED_MODULES)
+        output = subprocess.check_output([sys.executable, '-c', script],
+                                         cwd=os.path.dirname(os.path.abspath(contracts.__file__)))
+        self.assertEqual(json.loads(output.strip().split('\n')[-1]), [])
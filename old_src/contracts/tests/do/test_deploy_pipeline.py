@@ -0,0 +1,56 @@
+from ..abstract_test import AbstractTestContract, keys
+from contracts.local_node import LocalNode
+from contracts.deploy import Deploy
+import tempfile
+import os
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_deploy_pipeline
+    """
+
+    CODE = '''contract Counter {
+    uint public count;
+    function Counter(uint _count) {
+        count = _count;
+    }
+    function increase() {
+        count += 1;
+    }
+}
+'''
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        contract_dir = tempfile.mkdtemp() + '/'
+        with open(os.path.join(contract_dir, 'Counter.sol'), 'w') as contract_file:
+            contract_file.write(self.CODE)
+        # Blocks are only mined when the test mines them
+        node = LocalNode(block_time=3600)
+        port = node.start()
+        try:
+            deploy = Deploy('http', 'localhost', port, 'false', 'true', contract_dir, 4712388, 1,
+                            keys[0].encode('hex'), pipeline='true')
+            deploy.deploy_code('Counter.sol', 'COUNTER_1', [1], None)
+            deploy.deploy_code('Counter.sol', 'COUNTER_2', [2], None)
+            deploy.send_transaction('COUNTER_2', 'increase', [])
+            # All transactions were sent before any of them was mined, with addresses known in advance
+            self.assertEqual(len(node.mempool), 3)
+            self.assertEqual(node.receipts, {})
+            predicted_addresses = dict(deploy.contract_addresses)
+            self.assertEqual(len(set(predicted_addresses.values())), 2)
+            with node.lock:
+                node.mine()
+            deploy.wait_for_pending_transactions()
+            # Receipts of the deployments have the predicted addresses
+            self.assertEqual(sorted(receipt['contractAddress'] for receipt in node.receipts.values()
+                                    if receipt['contractAddress']), sorted(predicted_addresses.values()))
+            for contract_address in predicted_addresses.values():
+                self.assertGreater(len(node.eth_getCode(contract_address)), 2)
+            deploy.assert_call('COUNTER_1', 'count', [], 1)
+            deploy.assert_call('COUNTER_2', 'count', [], 3)
+        finally:
+            node.stop()
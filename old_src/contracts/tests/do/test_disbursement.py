@@ -1,4 +1,5 @@
 from ..abstract_test import AbstractTestContract, accounts, keys
+from contracts.vesting import DisbursementSchedule, VestingCalculator
 
 
 class TestContract(AbstractTestContract):
@@ -102,10 +103,28 @@ class TestContract(AbstractTestContract):
         self.s.block.timestamp += self.ONE_YEAR
         self.assertEqual(self.disbursement_1.calcMaxWithdraw(), self.PREASSIGNED_TOKENS/2/2)
         self.assertEqual(self.disbursement_2.calcMaxWithdraw(), self.PREASSIGNED_TOKENS/2/2)
+        # Vesting model matches contract for the whole grid
+        calculator = VestingCalculator([DisbursementSchedule.from_contract(self.disbursement_1, self.gnosis_token),
+                                        DisbursementSchedule.from_contract(self.disbursement_2, self.gnosis_token)])
+        timestamps = [start_date - 1, start_date, start_date + self.ONE_YEAR, self.s.block.timestamp,
+                      start_date + self.FOUR_YEARS - 1, start_date + self.FOUR_YEARS]
+        expected = []
+        for disbursement in (self.disbursement_1, self.disbursement_2):
+            row = []
+            for timestamp in timestamps:
+                self.s.block.timestamp = timestamp
+                row.append(disbursement.calcMaxWithdraw())
+            expected.append(row)
+        self.s.block.timestamp = start_date + 2 * self.ONE_YEAR
+        self.assertEqual(calculator.calc_max_withdraw(timestamps), expected)
         # Owner withdraws shares
         self.disbursement_1.withdraw(accounts[8], self.disbursement_1.calcMaxWithdraw())
         self.assertEqual(self.disbursement_1.calcMaxWithdraw(), 0)
         self.assertEqual(self.gnosis_token.balanceOf(self.disbursement_1.address), self.PREASSIGNED_TOKENS/4)
+        # Withdrawn tokens are taken into account by the model
+        schedule = DisbursementSchedule.from_contract(self.disbursement_1, self.gnosis_token)
+        self.assertEqual(schedule.max_withdraw(self.s.block.timestamp), 0)
+        self.assertEqual(schedule.max_withdraw(start_date + self.FOUR_YEARS), self.PREASSIGNED_TOKENS/4)
         # Wallet withdraws remaining tokens
         wallet_withdraw_data = self.disbursement_1.translator.encode('walletWithdraw', [])
         old_balance = self.gnosis_token.balanceOf(self.multisig_wallet.address)
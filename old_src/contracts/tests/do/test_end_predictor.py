@@ -0,0 +1,61 @@
+from ..abstract_test import AbstractTestContract
+from contracts.simulation import AuctionSimulation
+from contracts.end_predictor import AuctionEndPredictor, crossing_offset
+import random
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_end_predictor
+    """
+
+    START_BLOCK = 3900000
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        # Closed form matches stepping block by block
+        rnd = random.Random(0)
+        for _ in range(20):
+            price_factor = rnd.randint(1, 10000)
+            total_received = rnd.randint(10 ** 18, 10 ** 24)
+            stop_price = total_received * 10 ** 18 / AuctionSimulation.MAX_TOKENS_SOLD + 1
+            d = crossing_offset(price_factor, total_received)
+            self.assertLessEqual(price_factor * 10 ** 18 / d + 1, stop_price)
+            self.assertGreater(price_factor * 10 ** 18 / (d - 1) + 1, stop_price)
+        # Prediction matches the block the auction is finalized in
+        simulation = AuctionSimulation(contract_dir=self.contract_dir)
+        simulation.start(block_number=self.START_BLOCK)
+        snapshot = simulation.snapshot()
+        predictor = AuctionEndPredictor(simulation.dutch_auction.address, simulation.dutch_auction.priceFactor(),
+                                        self.START_BLOCK, ceiling=simulation.dutch_auction.ceiling())
+        for value in [10000 * 10 ** 18, 30000 * 10 ** 18]:
+            simulation.bid(value)
+            predictor.add_bid(value)
+        self.assertEqual(predictor.total_received, simulation.dutch_auction.totalReceived())
+        prediction = predictor.predict(self.START_BLOCK)
+        self.assertFalse(prediction['ceiling_reached'])
+        simulation.advance(prediction['end_block'] - self.START_BLOCK - 1)
+        self.assertEqual(simulation.update_stage(), 2)
+        simulation.advance(1)
+        self.assertEqual(simulation.update_stage(), 3)
+        self.assertEqual(simulation.dutch_auction.finalPrice(), prediction['final_price'])
+        # Extra inflow ends the auction earlier, reaching the ceiling ends it immediately
+        self.assertLess(predictor.predict(self.START_BLOCK, 50000 * 10 ** 18)['end_block'], prediction['end_block'])
+        self.assertTrue(predictor.predict(self.START_BLOCK, 250000 * 10 ** 18)['ceiling_reached'])
+        # An inflow above the Wei buying all tokens at the current price is capped and ends the auction immediately
+        current_block = self.START_BLOCK + 500000
+        predictor = AuctionEndPredictor(simulation.dutch_auction.address, simulation.dutch_auction.priceFactor(),
+                                        self.START_BLOCK, ceiling=simulation.dutch_auction.ceiling())
+        prediction = predictor.predict(current_block, 100000 * 10 ** 18)
+        self.assertEqual(prediction['end_block'], current_block)
+        self.assertEqual(prediction['blocks_left'], 0)
+        self.assertFalse(prediction['ceiling_reached'])
+        self.assertLess(prediction['total_received'], 100000 * 10 ** 18)
+        simulation.revert(snapshot)
+        simulation.advance(current_block - self.START_BLOCK)
+        simulation.bid(100000 * 10 ** 18)
+        self.assertEqual(simulation.dutch_auction.stage(), 3)
+        self.assertEqual(simulation.dutch_auction.totalReceived(), prediction['total_received'])
+        self.assertEqual(simulation.dutch_auction.finalPrice(), prediction['final_price'])
@@ -0,0 +1,22 @@
+from ..abstract_test import AbstractTestContract
+from contracts.fuzz import Fuzzer, shrink
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_fuzz
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        # Shrinking keeps only the steps needed for a failure
+        steps = [('advance', 100, 1500), ('bid', 2, None, 10 ** 18), ('update_stage',), ('bid', 3, 4, 5 * 10 ** 18)]
+        fails = lambda candidate: any(step[0] == 'bid' and step[3] >= 10 ** 9 for step in candidate)
+        self.assertEqual(shrink(steps, fails), [('bid', 3, 4, 5 * 10 ** 18 / 2 ** 32)])
+        # Random sequences don't violate auction invariants
+        fuzzer = Fuzzer(contract_dir=self.contract_dir, processes=1, sequence_length=20)
+        result = fuzzer.run(5)
+        self.assertEqual(result['failures'], [])
+        self.assertGreater(result['sequences_per_second'], 0)
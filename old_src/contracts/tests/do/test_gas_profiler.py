@@ -0,0 +1,48 @@
+from ..abstract_test import AbstractTestContract, accounts, keys
+from contracts.simulation import AuctionSimulation
+from contracts.gas_profiler import GasProfiler, INTRINSIC
+import tempfile
+import os
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_gas_profiler
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        simulation = AuctionSimulation(contract_dir=self.contract_dir)
+        simulation.start()
+        profiler = GasProfiler(simulation.s)
+        code = self.pp.process('DO/DutchAuction.sol', contract_dir=self.contract_dir)
+        profiler.add_contract(simulation.dutch_auction, 'DutchAuction', code)
+        profiler.add_contract(simulation.gnosis_token, 'GnosisToken',
+                              self.pp.process('Tokens/GnosisToken.sol', contract_dir=self.contract_dir))
+        bidder = AuctionSimulation.BIDDER
+        simulation.s.block.set_balance(accounts[bidder], AuctionSimulation.CEILING * 2)
+        # Bid reaching the ceiling, change is sent back and the auction is finalized
+        amount = profiler.profile(simulation.dutch_auction, 'bid', accounts[bidder], sender=keys[bidder],
+                                  value=AuctionSimulation.CEILING + 10 ** 18)
+        self.assertEqual(amount, AuctionSimulation.CEILING)
+        self.assertEqual(simulation.dutch_auction.stage(), 3)
+        # All gas is attributed
+        self.assertEqual(sum(gas for _, gas in profiler.opcodes.values()), profiler.total_gas)
+        self.assertEqual(sum(profiler.lines.values()) + profiler.opcodes[INTRINSIC][1], profiler.total_gas)
+        self.assertEqual(profiler.opcodes['CALL'][0], 3)
+        self.assertGreater(profiler.opcodes['SSTORE'][1], 20000)
+        # Lines of the bid and of the token transfer in finalizeAuction are attributed
+        bid_line = code[:code.index('bids[receiver] += amount;')].count('\n') + 1
+        self.assertGreater(profiler.lines[('DutchAuction', bid_line)], 0)
+        self.assertGreater(sum(gas for (name, _), gas in profiler.lines.items() if name == 'GnosisToken'), 0)
+        report_file_name = os.path.join(tempfile.mkdtemp(), 'report.txt')
+        folded_file_name = os.path.join(tempfile.mkdtemp(), 'gas.folded')
+        profiler.write_reports(report_file_name, folded_file_name)
+        with open(folded_file_name) as folded_file:
+            stacks = [line.rsplit(' ', 1) for line in folded_file]
+        self.assertTrue(all(stack.startswith('DutchAuction.bid;') for stack, _ in stacks))
+        self.assertTrue(any('GnosisToken:' in stack for stack, _ in stacks))
+        with open(report_file_name) as report_file:
+            self.assertIn('bids[receiver] += amount;', report_file.read())
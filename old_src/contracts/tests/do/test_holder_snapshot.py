@@ -0,0 +1,118 @@
+from ..abstract_test import AbstractTestContract, accounts, keys
+from contracts.holder_snapshot import fold_transfers, write_snapshot, read_snapshot, ZERO_ADDRESS, HolderSnapshot
+from contracts.local_node import LocalNode
+from contracts.rpc import JsonRpc
+from ethereum.abi import ContractTranslator
+from ethereum.tester import languages
+import threading
+import tempfile
+import random
+import os
+
+
+class RangeLimitedJsonRpc(JsonRpc):
+    """
+    Rejects eth_getLogs over more than max_blocks blocks, like nodes limiting the results of a query. Records the
+    requested ranges and the session used by every thread.
+    """
+
+    def __init__(self, max_blocks, *args, **kwargs):
+        JsonRpc.__init__(self, *args, **kwargs)
+        self.max_blocks = max_blocks
+        self.ranges = []
+        self.sessions = set()
+
+    def call(self, method, params=None, timeout=None):
+        if method == "eth_getLogs":
+            block_range = int(params[0]["fromBlock"], 16), int(params[0]["toBlock"], 16)
+            self.ranges.append(block_range)
+            self.sessions.add((threading.current_thread().ident, id(self.session)))
+            if block_range[1] - block_range[0] + 1 > self.max_blocks:
+                return {"error": {"code": -32005, "message": "query returned more than 10000 results"}}
+        return JsonRpc.call(self, method, params, timeout)
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_holder_snapshot
+    """
+
+    PREASSIGNED_TOKENS = 1000000 * 10 ** 18
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        logs = []
+        self.s.block.log_listeners.append(logs.append)
+        # Account 0 takes the role of the auction
+        self.gnosis_token = self.s.abi_contract(self.pp.process(self.gnosis_token_name,
+                                                                add_dev_code=True,
+                                                                contract_dir=self.contract_dir),
+                                                language='solidity',
+                                                constructor_parameters=(accounts[0], [accounts[1]],
+                                                                        [self.PREASSIGNED_TOKENS]))
+        self.gnosis_token.transfer(accounts[2], 1000 * 10 ** 18, sender=keys[0])
+        self.gnosis_token.transfer(accounts[3], 300 * 10 ** 18, sender=keys[2])
+        self.gnosis_token.transfer(accounts[2], 300 * 10 ** 18, sender=keys[3])
+        self.gnosis_token.transfer(accounts[4], 5 * 10 ** 18, sender=keys[1])
+        # Chunks fold into the same balances in any order
+        balances = fold_transfers(logs[3:])
+        fold_transfers(logs[:3], balances)
+        self.assertEqual(balances.pop(ZERO_ADDRESS), -self.gnosis_token.totalSupply())
+        holders = dict((address, balance) for address, balance in balances.iteritems() if balance)
+        self.assertEqual(set(holders), set(accounts[i].encode('hex') for i in [0, 1, 2, 4]))
+        for address, balance in holders.iteritems():
+            self.assertEqual(self.gnosis_token.balanceOf(address.decode('hex')), balance)
+        self.assertEqual(sum(holders.values()), self.gnosis_token.totalSupply())
+        # Columnar file round trip
+        file_name = os.path.join(tempfile.mkdtemp(), 'snapshot.bin')
+        write_snapshot(file_name, holders, {'block': self.s.block.number})
+        header, read_balances = read_snapshot(file_name)
+        self.assertEqual(header['count'], 4)
+        self.assertEqual(read_balances, holders)
+        self.assertEqual(os.path.getsize(file_name) - len(open(file_name, 'rb').readline()), 4 * (20 + 32))
+        # Snapshot of a token served by a node, Transfer logs are fetched in concurrent chunks
+        node = LocalNode()
+        port = node.start()
+        try:
+            json_rpc = RangeLimitedJsonRpc(2, port=port)
+            from_block = json_rpc.block_number()
+            compiled = languages['solidity'].combined(self.pp.process(self.gnosis_token_name, add_dev_code=True,
+                                                                      contract_dir=self.contract_dir))[-1][1]
+            translator = ContractTranslator(compiled['abi'])
+            constructor_arguments = translator.encode_constructor_arguments(
+                [accounts[0], [accounts[1]], [self.PREASSIGNED_TOKENS]])
+            transaction_hash = json_rpc.call('eth_sendTransaction', [{
+                'from': '0x' + accounts[0].encode('hex'), 'gas': hex(4000000),
+                'data': '0x' + compiled['bin_hex'] + constructor_arguments.encode('hex')}])['result']
+            token_address = node.receipts[transaction_hash]['contractAddress']
+            for sender, receiver, value in [(0, 2, 1000), (2, 3, 300), (3, 2, 300), (1, 4, 5)]:
+                data = translator.encode('transfer', [accounts[receiver], value * 10 ** 18])
+                json_rpc.call('eth_sendTransaction', [{'from': '0x' + accounts[sender].encode('hex'),
+                                                       'to': token_address, 'data': '0x' + data.encode('hex')}])
+            block = json_rpc.block_number()
+            snapshot = HolderSnapshot(json_rpc, token_address, from_block, chunk_size=4, threads=3)
+            self.assertEqual(snapshot.balances(block), holders)
+            self.assertEqual(snapshot.transfer_count, len(logs))
+            # Ranges rejected by the node are split in halves
+            self.assertIn((from_block, from_block + 3), json_rpc.ranges)
+            self.assertIn((from_block, from_block + 1), json_rpc.ranges)
+            self.assertLessEqual(max(to_block for _, to_block in json_rpc.ranges), block)
+            # Every worker thread uses its own session
+            threads, sessions = zip(*json_rpc.sessions)
+            self.assertEqual(len(set(threads)), len(set(sessions)))
+            # Balances are cross-checked with totalSupply and balanceOf
+            self.assertEqual(snapshot.cross_check(holders, block, sample_size=2, rnd=random.Random(0)), [])
+            address = accounts[2].encode('hex')
+            mismatches = snapshot.cross_check(dict(holders, **{address: holders[address] + 1}), block,
+                                              sample_size=len(holders))
+            self.assertEqual(sorted(mismatches), [(None, sum(holders.values()) + 1, sum(holders.values())),
+                                                  (address, holders[address] + 1, holders[address])])
+            # Exported snapshots are cross-checked and read back
+            snapshot.export(file_name, block, sample_size=len(holders))
+            header, read_balances = read_snapshot(file_name)
+            self.assertEqual((header['token'], header['block']), (token_address, block))
+            self.assertEqual(read_balances, holders)
+        finally:
+            node.stop()
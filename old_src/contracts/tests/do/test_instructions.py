@@ -0,0 +1,103 @@
+from ..abstract_test import AbstractTestContract
+from contracts.instructions import read_instructions, read_json_list, substitute
+from contracts.local_node import LocalNode
+from contracts.deploy import Deploy
+import tempfile
+import json
+import os
+
+
+class CountingDeploy(Deploy):
+
+    def __init__(self, *args, **kwargs):
+        Deploy.__init__(self, *args, **kwargs)
+        self.balance_requests = 0
+
+    def log_balance(self):
+        self.balance_requests += 1
+        Deploy.log_balance(self)
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_instructions
+    """
+
+    CODE = '''contract Counter {
+    uint public count;
+    function Counter(uint _count) {
+        count = _count;
+    }
+    function increase() {
+        count += 1;
+    }
+}
+'''
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    @staticmethod
+    def write_lines(file_name, lines):
+        with open(file_name, 'w') as lines_file:
+            lines_file.write('\n'.join(lines) + '\n')
+
+    def test(self):
+        # Only whole placeholders are replaced with typed values, unbalanced braces are kept
+        row = {'name': '007', 'count': 5}
+        self.assertEqual(substitute('$count', row), 5)
+        self.assertEqual(substitute('${count}', row), 5)
+        self.assertEqual(substitute('${count', row), '${count')
+        self.assertEqual(substitute('$count}', row), '5}')
+        self.assertEqual(substitute(['COUNTER_${name}', {'value': '$name'}], row), ['COUNTER_007', {'value': '007'}])
+        # Repeated steps over a CSV table, only declared columns are converted to int
+        instructions_dir = tempfile.mkdtemp()
+        self.write_lines(os.path.join(instructions_dir, 'counters.csv'), ['name,count', 'alice,1', '007,2'])
+        instructions_file_name = os.path.join(instructions_dir, 'instructions.jsonl')
+        self.write_lines(instructions_file_name, [json.dumps(instruction) for instruction in [
+            {'type': 'repeat', 'data': 'counters.csv', 'int_columns': ['count'], 'steps': [
+                {'type': 'deployment', 'file': 'Counter.sol', 'reference': 'COUNTER_${name}', 'params': ['$count']},
+                {'type': 'assertion', 'contract': 'COUNTER_$name', 'name': 'count', 'params': [], 'return': '$count'}
+            ]},
+            {'type': 'transaction', 'contract': 'COUNTER_007', 'name': 'increase', 'params': []},
+            {'type': 'assertion', 'contract': 'COUNTER_007', 'name': 'count', 'params': [], 'return': 3},
+        ]])
+        instructions = list(read_instructions(instructions_file_name))
+        self.assertEqual([instruction['type'] for instruction in instructions],
+                         ['deployment', 'assertion', 'deployment', 'assertion', 'transaction', 'assertion'])
+        self.assertEqual(instructions[2]['reference'], 'COUNTER_007')
+        self.assertEqual(instructions[2]['params'], [2])
+        self.assertEqual(instructions[3]['return'], 2)
+        # JSON Lines files are executed while they are read, instructions before a broken line are yielded
+        broken_file_name = os.path.join(instructions_dir, 'broken.jsonl')
+        self.write_lines(broken_file_name, [json.dumps(instructions[0]), '{"type": '])
+        streamed = read_instructions(broken_file_name)
+        self.assertEqual(next(streamed), instructions[0])
+        self.assertRaises(ValueError, next, streamed)
+        # JSON lists are decoded item by item, also if items or numbers are split between chunks
+        list_file_name = os.path.join(instructions_dir, 'instructions.json')
+        with open(list_file_name, 'w') as list_file:
+            json.dump(instructions + [-7e3, 12345], list_file, indent=2)
+        for chunk_size in (1, 3, 7, 2 ** 16):
+            with open(list_file_name) as list_file:
+                self.assertEqual(list(read_json_list(list_file, chunk_size)), instructions + [-7e3, 12345])
+        broken_list_file_name = os.path.join(instructions_dir, 'broken.json')
+        self.write_lines(broken_list_file_name, ['[' + json.dumps(instructions[0]) + ', {"type": '])
+        streamed = read_instructions(broken_list_file_name)
+        self.assertEqual(next(streamed), instructions[0])
+        self.assertRaises(ValueError, next, streamed)
+        # Repeated deployments are executed against a node and share one translator
+        contract_dir = tempfile.mkdtemp() + '/'
+        with open(os.path.join(contract_dir, 'Counter.sol'), 'w') as contract_file:
+            contract_file.write(self.CODE)
+        node = LocalNode()
+        port = node.start()
+        try:
+            deploy = CountingDeploy('http', 'localhost', port, 'false', 'false', contract_dir, 4712388, 1, None)
+            deploy.process(instructions_file_name)
+            # The balance is logged before the first and after the last instruction, not for every instruction
+            self.assertEqual(deploy.balance_requests, 2)
+            self.assertEqual(sorted(deploy.contract_addresses), ['COUNTER_007', 'COUNTER_alice'])
+            self.assertEqual(deploy.translators.keys(), ['Counter.sol'])
+        finally:
+            node.stop()
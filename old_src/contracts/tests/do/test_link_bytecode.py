@@ -0,0 +1,72 @@
+from ..abstract_test import AbstractTestContract
+from contracts.artifacts import find_link_references, link_bytecode
+from contracts.local_node import LocalNode
+from contracts.deploy import Deploy
+import tempfile
+import json
+import os
+
+
+class CountingDeploy(Deploy):
+
+    def __init__(self, *args, **kwargs):
+        Deploy.__init__(self, *args, **kwargs)
+        self.compilations = 0
+
+    def compile_code(self, code, language):
+        self.compilations += 1
+        return Deploy.compile_code(code, language)
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_link_bytecode
+    """
+
+    CODE = 'contract Counter { uint public count; function Counter(uint _count) { count = _count; } }'
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    @staticmethod
+    def placeholder(library_name):
+        return '__{}'.format(library_name).ljust(40, '_')
+
+    def test(self):
+        # Placeholders are found at their byte offsets
+        bytecode = '6060' + self.placeholder('Math') + '01' + self.placeholder('Strings') + '02' + \
+            self.placeholder('Math')
+        link_references = find_link_references(bytecode)
+        self.assertEqual(link_references, {'Math': [2, 44], 'Strings': [23]})
+        # Addresses are patched at the offsets, libraries without address keep their placeholder
+        math_address = 'ab' * 20
+        linked = link_bytecode(bytecode, link_references, {'Math': '0x' + math_address})
+        self.assertEqual(linked, '6060' + math_address + '01' + self.placeholder('Strings') + '02' + math_address)
+        self.assertEqual(find_link_references(linked), {'Strings': [23]})
+        self.assertEqual(link_bytecode(linked, find_link_references(linked), {'Strings': 'cd' * 20}),
+                         '6060' + math_address + '01' + 'cd' * 20 + '02' + math_address)
+        self.assertEqual(link_bytecode(bytecode, link_references, None), bytecode)
+        self.assertEqual(link_bytecode(bytecode, link_references, {'Other': math_address}), bytecode)
+        # Repeated deployments of one file are preprocessed and compiled once
+        contract_dir = tempfile.mkdtemp() + '/'
+        with open(os.path.join(contract_dir, 'Counter.sol'), 'w') as contract_file:
+            contract_file.write(self.CODE)
+        instructions = []
+        for index in range(1, 4):
+            reference = 'COUNTER_{}'.format(index)
+            instructions.append({'type': 'deployment', 'file': 'Counter.sol', 'reference': reference,
+                                 'params': [index]})
+            instructions.append({'type': 'assertion', 'contract': reference, 'name': 'count', 'params': [],
+                                 'return': index})
+        instructions_file_name = os.path.join(tempfile.mkdtemp(), 'instructions.json')
+        with open(instructions_file_name, 'w') as instructions_file:
+            json.dump(instructions, instructions_file)
+        node = LocalNode()
+        port = node.start()
+        try:
+            deploy = CountingDeploy('http', 'localhost', port, 'false', 'false', contract_dir, 4712388, 1, None)
+            deploy.process(instructions_file_name)
+            self.assertEqual(deploy.compilations, 1)
+            self.assertEqual(len(set(deploy.contract_addresses.values())), 3)
+        finally:
+            node.stop()
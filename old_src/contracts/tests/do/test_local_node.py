@@ -0,0 +1,72 @@
+from ..abstract_test import AbstractTestContract, accounts, keys
+from contracts.local_node import LocalNode
+from contracts.bundle import sign_transaction
+from contracts.transaction_manager import TransactionManager, GasPricePolicy
+from contracts.rpc import JsonRpc
+from ethjsonrpc import EthJsonRpc
+from ethereum.abi import ContractTranslator
+from ethereum.tester import languages
+from ethereum.utils import sha3
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_local_node
+    """
+
+    CODE = 'contract Counter { uint public count; function increase() { count += 1; } }'
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        compiled = languages['solidity'].combined(self.CODE)[-1][1]
+        translator = ContractTranslator(compiled['abi'])
+        node = LocalNode(min_gas_price=3)
+        port = node.start()
+        try:
+            json_rpc = EthJsonRpc(host='localhost', port=port)
+            sender = '0x' + accounts[0].encode('hex')
+            self.assertEqual(json_rpc.eth_coinbase()['result'], sender)
+            # Transactions signed by the node
+            transaction_hash = json_rpc.eth_sendTransaction(sender, data=compiled['bin_hex'], gas=1000000,
+                                                            gas_price=3)['result']
+            contract_address = json_rpc.eth_getTransactionReceipt(transaction_hash)['result']['contractAddress']
+            self.assertGreater(len(json_rpc.eth_getCode(contract_address)['result']), 2)
+            # Raw transactions below the minimum gas price are replaced until they are mined
+            nonce = int(json_rpc.eth_getTransactionCount(sender)['result'], 16)
+            data = translator.encode('increase', []).encode('hex')
+
+            def raw_transaction(gas_price):
+                return '0x' + sign_transaction((keys[0].encode('hex'), nonce, gas_price, 1000000, contract_address,
+                                                data))[0]
+
+            def send(gas_price):
+                return json_rpc.eth_sendRawTransaction(raw_transaction(gas_price))
+            manager = TransactionManager(json_rpc, GasPricePolicy(timeout=0, factor=1.5), poll_interval=0,
+                                         sleep=lambda seconds: None)
+            transaction = manager.submit(send, 'increase', nonce, 1)
+            manager.wait(transaction)
+            self.assertEqual([gas_price for _, gas_price, _ in transaction.attempts], [1, 2, 4])
+            self.assertEqual(transaction.mined_hash, transaction.attempts[-1][0])
+            self.assertEqual(transaction.cost, int(transaction.receipt['gasUsed'], 16) * 4)
+            # Calls don't change state, resent transactions are rejected, batches are answered in order
+            batch = JsonRpc(port=port).batch([
+                ('eth_call', [{'to': contract_address, 'data': '0x' + translator.encode('count', []).encode('hex')},
+                              'latest']),
+                ('eth_sendRawTransaction', [raw_transaction(4)]),
+                ('eth_getBalance', [sender, 'latest'])])
+            self.assertEqual(translator.decode('count', batch[0]['result'][2:].decode('hex')), [1])
+            self.assertIn('error', batch[1])
+            self.assertGreater(int(batch[2]['result'], 16), 0)
+            # Transactions pyethereum cannot apply are answered with an error, the node keeps serving
+            empty_key = sha3('account without balance').encode('hex')
+            response = json_rpc.eth_sendRawTransaction(
+                '0x' + sign_transaction((empty_key, 0, 5, 1000000, contract_address, data))[0])
+            self.assertIn('InsufficientBalance', response['error']['message'])
+            self.assertGreater(int(json_rpc.eth_getBalance(sender)['result'], 16), 0)
+            # Injected errors
+            node.error_rate = 1
+            self.assertEqual(json_rpc.eth_sendRawTransaction(raw_transaction(5))['error']['message'], 'Injected error')
+        finally:
+            node.stop()
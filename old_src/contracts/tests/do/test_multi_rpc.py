@@ -0,0 +1,63 @@
+from ..abstract_test import AbstractTestContract, accounts, keys
+from contracts.local_node import LocalNode
+from contracts.multi_rpc import MultiJsonRpc, endpoint_from_url
+from contracts.bundle import sign_transaction
+import time
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_multi_rpc
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        slow_node = LocalNode()
+        fast_node = LocalNode()
+        slow_port = slow_node.start()
+        fast_port = fast_node.start()
+        try:
+            json_rpc = MultiJsonRpc([endpoint_from_url('localhost:{}'.format(port)) for port in (slow_port, fast_port)],
+                                    hedge_delay=0.05, max_lag=2, health_timeout=0.2)
+            sender = '0x' + accounts[0].encode('hex')
+            receiver = '0x' + accounts[1].encode('hex')
+            # Raw transactions reach all nodes
+            raw_tx, transaction_hash = sign_transaction((keys[0].encode('hex'), 0, 1, 21000, receiver, ''))
+            self.assertEqual(json_rpc.eth_sendRawTransaction('0x' + raw_tx)['result'], '0x' + transaction_hash)
+            self.assertIsNotNone(slow_node.eth_getTransactionReceipt('0x' + transaction_hash))
+            self.assertIsNotNone(fast_node.eth_getTransactionReceipt('0x' + transaction_hash))
+            # Reads of a slow node are hedged with the next node
+            slow_node.latency = 2
+            start = time.time()
+            self.assertEqual(int(json_rpc.eth_getTransactionCount(sender)['result'], 16), 1)
+            self.assertLess(time.time() - start, 1)
+            slow_node.latency = 0
+            # Lagging nodes are ejected on the next health check
+            for _ in range(3):
+                fast_node.mine()
+            json_rpc.check_health()
+            self.assertEqual([endpoint.ejected for endpoint in json_rpc.endpoints], [True, False])
+            self.assertEqual(json_rpc.healthy_endpoints(), json_rpc.endpoints[1:])
+            # Transactions signed by a node are sent to one node only
+            transaction_hash = json_rpc.eth_sendTransaction(sender, receiver, gas=21000, gas_price=1, value=1)['result']
+            self.assertIsNone(slow_node.eth_getTransactionReceipt(transaction_hash))
+            self.assertIsNotNone(fast_node.eth_getTransactionReceipt(transaction_hash))
+            # A hung node doesn't stall requests while the health is refreshed in the background
+            slow_node.latency = 5
+            json_rpc.last_health_check = 0
+            start = time.time()
+            self.assertEqual(int(json_rpc.eth_getTransactionCount(sender)['result'], 16), 2)
+            self.assertLess(time.time() - start, 1)
+            json_rpc.health_thread.join()
+            self.assertLess(time.time() - start, 1)
+            self.assertTrue(json_rpc.endpoints[0].ejected)
+            slow_node.latency = 0
+            # Nodes which are down fail over to the remaining node
+            fast_node.stop()
+            self.assertEqual(json_rpc.eth_coinbase()['result'], sender)
+            self.assertEqual(json_rpc.endpoints[1].failures, 1)
+        finally:
+            slow_node.stop()
+            fast_node.stop()
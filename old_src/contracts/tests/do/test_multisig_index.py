@@ -0,0 +1,83 @@
+from ..abstract_test import AbstractTestContract, accounts, keys
+from contracts.multisig_index import MultiSigTransactionIndex
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_multisig_index
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def assert_index_matches_wallet(self, index):
+        for pending, executed in ((True, False), (False, True), (True, True)):
+            count = self.multisig_wallet.getTransactionCount(pending, executed)
+            self.assertEqual(index.transaction_count(pending, executed), count)
+            self.assertEqual(index.transaction_ids(0, count, pending, executed),
+                             list(self.multisig_wallet.getTransactionIds(0, count, pending, executed)))
+        for transaction_id in range(self.multisig_wallet.transactionCount()):
+            self.assertEqual(index.confirmations(transaction_id),
+                             set(self.multisig_wallet.getConfirmations(transaction_id)))
+
+    def test(self):
+        # Create wallet
+        required_accounts = 2
+        wa_1 = 1
+        wa_2 = 2
+        wa_3 = 3
+        constructor_parameters = (
+            [accounts[wa_1], accounts[wa_2], accounts[wa_3]],
+            required_accounts,
+            0
+        )
+        wallet_code = self.pp.process(self.WALLETS_DIR + 'MultiSigWalletWithDailyLimit.sol', add_dev_code=True,
+                                      contract_dir=self.contract_dir)
+        self.multisig_wallet = self.s.abi_contract(
+            wallet_code,
+            language='solidity',
+            constructor_parameters=constructor_parameters
+        )
+        index = MultiSigTransactionIndex(self.a2h(self.multisig_wallet),
+                                         owners=[accounts[wa_1].encode('hex'), accounts[wa_2].encode('hex'),
+                                                 accounts[wa_3].encode('hex')])
+        self.s.block.log_listeners.append(index.ingest_log)
+        # Owner 1 submits two transactions
+        change_limit_data = self.multisig_wallet.translator.encode('changeDailyLimit', [10 ** 18])
+        change_requirement_data = self.multisig_wallet.translator.encode('changeRequirement', [3])
+        self.multisig_wallet.submitTransaction(self.multisig_wallet.address, 0, change_limit_data, sender=keys[wa_1])
+        self.multisig_wallet.submitTransaction(self.multisig_wallet.address, 0, change_requirement_data,
+                                               sender=keys[wa_1])
+        self.assertEqual(index.pending_for(accounts[wa_1].encode('hex')), set())
+        self.assertEqual(index.pending_for(accounts[wa_2].encode('hex')), {0, 1})
+        self.assertRaises(AttributeError, index.pending_for(accounts[wa_2].encode('hex')).discard, 0)
+        self.assert_index_matches_wallet(index)
+        # Owner 2 confirms the first transaction, owner 1 revokes the second
+        self.multisig_wallet.confirmTransaction(0, sender=keys[wa_2])
+        self.multisig_wallet.revokeConfirmation(1, sender=keys[wa_1])
+        self.assertEqual(index.pending_for(accounts[wa_1].encode('hex')), {1})
+        self.assertEqual(index.pending_for(accounts[wa_3].encode('hex')), {1})
+        self.assertEqual(self.multisig_wallet.dailyLimit(), 10 ** 18)
+        self.assert_index_matches_wallet(index)
+        # Owners 2 and 3 execute the requirement change
+        self.multisig_wallet.confirmTransaction(1, sender=keys[wa_2])
+        self.multisig_wallet.confirmTransaction(1, sender=keys[wa_3])
+        self.assertEqual(self.multisig_wallet.required(), 3)
+        for wa in (wa_1, wa_2, wa_3):
+            self.assertEqual(index.pending_for(accounts[wa].encode('hex')), set())
+        self.assert_index_matches_wallet(index)
+        # Events of other contracts are ignored
+        other_wallet = self.s.abi_contract(wallet_code, language='solidity',
+                                           constructor_parameters=constructor_parameters)
+        other_wallet.submitTransaction(other_wallet.address, 0, change_limit_data, sender=keys[wa_1])
+        self.assertEqual(index.transaction_count(True, True), 2)
+        self.assert_index_matches_wallet(index)
+        # An index started later in the history applies confirmations of transactions submitted before
+        partial_index = MultiSigTransactionIndex(self.a2h(other_wallet), owners=[accounts[wa_1].encode('hex'),
+                                                                                 accounts[wa_2].encode('hex'),
+                                                                                 accounts[wa_3].encode('hex')],
+                                                 last_block=self.s.block.number)
+        self.s.block.log_listeners.append(partial_index.ingest_log)
+        other_wallet.confirmTransaction(0, sender=keys[wa_2])
+        self.assertEqual(partial_index.confirmations(0), {accounts[wa_2].encode('hex')})
+        self.assertEqual(partial_index.transaction_count(False, True), 1)
@@ -0,0 +1,129 @@
+from ..abstract_test import AbstractTestContract
+from contracts.packed_encoding import PackedEncoder, encode_packed, hash_many, UINT, BYTES, RAW
+from ethereum.utils import sha3
+import sys
+
+
+class StringHelpers:
+    """
+    String based encoding helpers replaced by PackedEncoder, hashes signed in tests must not change.
+    """
+
+    @staticmethod
+    def i2b(_integer, zfill=64):
+        return format(_integer, 'x').zfill(zfill).decode('hex')
+
+    @staticmethod
+    def s2b(_string):
+        return _string.encode('hex').zfill(64).decode('hex')
+
+    def get_state_hash(self, addresses, state_validity, trades, tokens, hash_lock):
+        return sha3(
+            self.s2b(addresses[0]) +
+            self.s2b(addresses[1]) +
+            self.i2b(state_validity[0]) +
+            self.i2b(state_validity[1]) +
+            ''.join([self.i2b(trade) if type(trade) == int else (self.s2b(trade)) for trade in trades]) +
+            ''.join([self.i2b(token) if type(token) == int else self.s2b(token) for token in tokens]) +
+            hash_lock
+        ).encode('hex')
+
+    def get_fee_hash(self, description_hash, fee, token_address):
+        return sha3(
+            description_hash +
+            self.i2b(fee) +
+            token_address
+        ).encode('hex')
+
+    def get_result_hash(self, description_hash, result):
+        return sha3(
+            description_hash +
+            self.i2b(result)
+        ).encode('hex')
+
+    def get_event_hash(self, description_hash, is_ranged, lower_bound, upper_bound, outcome_count, token_address,
+                       resolver_address, event_data):
+        return sha3(
+            description_hash +
+            self.i2b(is_ranged, 2) +
+            self.i2b(lower_bound) +
+            self.i2b(upper_bound) +
+            self.i2b(outcome_count, 2) +
+            token_address +
+            resolver_address +
+            ''.join([self.i2b(datum) if type(datum) == int else self.s2b(datum) for datum in event_data])
+        )
+
+    def get_campaign_hash(self, market_address, event_hash, fee, initial_funding, total_funding, market_maker_address,
+                          closing_at_block, initial_shares):
+        return sha3(
+            market_address +
+            event_hash +
+            self.i2b(fee) +
+            self.i2b(initial_funding) +
+            self.i2b(total_funding) +
+            market_maker_address +
+            self.i2b(closing_at_block) +
+            ''.join([self.i2b(share) for share in initial_shares])
+        )
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_packed_encoding
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        helpers = StringHelpers()
+        address = '\x12' * 20
+        description_hash = sha3('description')
+        # Integers of uint256, address and single byte width, including zero, maxima and values wider than the field
+        for zfill in (64, 40, 2):
+            size = zfill / 2
+            for value in (0, 1, 0xff, 0x100, 2 ** 64 - 1, 2 ** 64, 2 ** (8 * size) - 1, 2 ** (8 * size + 8) - 1,
+                          2 ** 255, 2 ** 256 - 1, 2 ** 264 - 1, int(address.encode('hex'), 16)):
+                try:
+                    expected = helpers.i2b(value, zfill)
+                except TypeError:
+                    # Odd number of hex digits wider than the field, the full width is written with a leading zero
+                    expected = ('0' + format(value, 'x')).decode('hex')
+                self.assertEqual(self.i2b(value, zfill), expected, (value, zfill))
+                self.assertEqual(PackedEncoder().write_uint(value, size).getvalue(), expected)
+        # Negative integers cannot be encoded
+        self.assertRaises(TypeError, helpers.i2b, -1)
+        self.assertRaises(ValueError, self.i2b, -1)
+        self.assertRaises(ValueError, PackedEncoder().write_uint, -1)
+        # Byte strings shorter, as long as and longer than 32 bytes
+        for value in ('', '\x00', address, '\x01' * 32, '\xff' * 33):
+            self.assertEqual(self.s2b(value), helpers.s2b(value))
+            self.assertEqual(encode_packed([(BYTES, value)]), helpers.s2b(value))
+        # Hash helpers, integers in lists of values are int, long values are written as byte strings by both
+        for trades, tokens in (([1, sys.maxint], [address, 0]), ([], []), (['\x05' * 32], [2 ** 40])):
+            self.assertEqual(self.get_state_hash([address, '\x34' * 20], [0, 2 ** 256 - 1], trades, tokens,
+                                                 description_hash),
+                             helpers.get_state_hash([address, '\x34' * 20], [0, 2 ** 256 - 1], trades, tokens,
+                                                    description_hash))
+        for fee in (0, 1, 2 ** 256 - 1):
+            self.assertEqual(self.get_fee_hash(description_hash, fee, address),
+                             helpers.get_fee_hash(description_hash, fee, address))
+            self.assertEqual(self.get_result_hash(description_hash, fee),
+                             helpers.get_result_hash(description_hash, fee))
+        for is_ranged, lower_bound, upper_bound, outcome_count, event_data in (
+                (0, 0, 0, 2, []), (1, 2 ** 256 - 1, 0, 255, [1, address]), (1, 1, 2, 0, ['\x00' * 32, sys.maxint])):
+            self.assertEqual(self.get_event_hash(description_hash, is_ranged, lower_bound, upper_bound, outcome_count,
+                                                 address, '\x56' * 20, event_data),
+                             helpers.get_event_hash(description_hash, is_ranged, lower_bound, upper_bound,
+                                                    outcome_count, address, '\x56' * 20, event_data))
+        for initial_shares in ([], [0, 2 ** 256 - 1, 10 ** 18]):
+            self.assertEqual(self.get_campaign_hash(address, description_hash, 1, 2, 3, '\x78' * 20, 2 ** 32,
+                                                    initial_shares),
+                             helpers.get_campaign_hash(address, description_hash, 1, 2, 3, '\x78' * 20, 2 ** 32,
+                                                       initial_shares))
+        # Hashes of many records of one layout
+        layout = [(RAW, None), (UINT, 32), (BYTES, 32)]
+        records = [(description_hash, fee, address) for fee in (0, 1, 2 ** 256 - 1)]
+        self.assertEqual(hash_many(records, layout),
+                         [sha3(record[0] + helpers.i2b(record[1]) + helpers.s2b(record[2])) for record in records])
@@ -0,0 +1,62 @@
+from ..abstract_test import AbstractTestContract
+from contracts.preprocessor import PreProcessor, tokenize
+import tempfile
+import os
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_preprocessor
+    """
+
+    MAIN = '''pragma solidity 0.4.15;
+import "Token.sol";
+// import "Missing.sol";
+
+/* contract Commented { */
+contract Main is Token {
+    macro: $limit = 10;
+    string note = "} $limit {{OWNER}}";
+    address owner = {{OWNER}};
+    address other = {{OTHER}};
+    function limit() returns (uint) {
+        LogBool(true);
+        return $limit;
+    }
+}
+'''
+    TOKEN = '''contract Token {
+    uint public supply;
+}
+'''
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        contract_dir = tempfile.mkdtemp() + '/'
+        for file_name, code in (('Main.sol', self.MAIN), ('Token.sol', self.TOKEN)):
+            with open(os.path.join(contract_dir, file_name), 'w') as source_file:
+                source_file.write(code)
+        # Tokens join to the original code
+        self.assertEqual(''.join(token[1] for token in tokenize(self.MAIN)), self.MAIN)
+        code = self.pp.process('Main.sol', add_dev_code=True, contract_dir=contract_dir, addresses={'OWNER': '0x1'},
+                               replace_unknown_addresses=True)
+        # Imports in comments are ignored
+        self.assertIn('// import "Missing.sol";', code)
+        # Dev code only declares events used by the contract
+        self.assertIn('contract Token {\n    uint public supply;', code)
+        # Comments and strings are not changed
+        self.assertIn('/* contract Commented { */\ncontract Main is Token {\n    event LogBool(bool);\n    \n', code)
+        self.assertEqual(code.count('event Log'), 1)
+        self.assertIn('string note = "} $limit {{OWNER}}";', code)
+        # Macros and placeholders are replaced in code
+        self.assertIn('return 10;', code)
+        self.assertNotIn('macro:', code)
+        self.assertIn('address owner = 0x1;', code)
+        self.assertIn('address other = 0x0;', code)
+        # Files are tokenized once
+        self.assertEqual(len(self.pp.tokenized_files), 2)
+        self.assertEqual(self.pp.process('Main.sol', add_dev_code=True, contract_dir=contract_dir,
+                                         addresses={'OWNER': '0x1'}, replace_unknown_addresses=True), code)
+        self.assertEqual(len(self.pp.tokenized_files), 2)
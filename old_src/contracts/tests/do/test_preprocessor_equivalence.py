@@ -0,0 +1,91 @@
+from ..abstract_test import AbstractTestContract
+from contracts.preprocessor import PreProcessor, tokenize
+import os
+import re
+
+
+class StringPreProcessor:
+    """
+    String based preprocessor replaced by the token based one, production builds without dev code must not change.
+    """
+
+    @staticmethod
+    def find_macro(code):
+        return re.search(r'macro:(.*?);', code)
+
+    @staticmethod
+    def find_scope_end(code, start_pos):
+        brackets_counter = 0
+        index = 0
+        for index, char in enumerate(code[start_pos:]):
+            if char == "{":
+                brackets_counter += 1
+            elif char == "}":
+                brackets_counter -= 1
+            if brackets_counter < 0:
+                break
+        return start_pos + index
+
+    def resolve_macros(self, code):
+        macro = self.find_macro(code)
+        while macro:
+            token, solidity_code = [x.strip() for x in macro.group()[6:-1].split("=")]
+            scope_end = self.find_scope_end(code, macro.end())
+            new_code = code[macro.end():scope_end].replace(token, solidity_code)
+            code = code[:macro.start()] + new_code + code[scope_end:]
+            macro = self.find_macro(code)
+        return code
+
+    @staticmethod
+    def resolve_imports(code, file_dir, contract_dir):
+        def get_file_name(_file_dir):
+            return _file_dir.split("/")[-1]
+        imported_codes = [get_file_name(file_dir)]
+        while len(re.findall(r'import "(\S*)";', code)):
+            for file_dir in re.findall(r'import "(\S*)";', code):
+                file_name = get_file_name(file_dir)
+                if file_name not in imported_codes and (not file_name.startswith("Abstract") or file_name.startswith("Abstract") and file_name[8:] not in imported_codes):
+                    imported_code = open(contract_dir + file_dir).read()
+                    imported_codes.append(file_name)
+                else:
+                    imported_code = ""
+                code = code.replace('import "{}";'.format(file_dir), imported_code, 1)
+        return code
+
+    def process(self, file_name, contract_dir="", addresses=None):
+        code = open(contract_dir + file_name).read()
+        code = self.resolve_imports(code, file_name, contract_dir)
+        code = self.resolve_macros(code)
+        for placeholder, address in (addresses or {}).iteritems():
+            code = code.replace("{{%s}}" % placeholder, address)
+        return re.sub(r'\{\{\S*\}\}', '0x0', code)
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_preprocessor_equivalence
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        # Every contract of the tree preprocesses to the same bytes as before
+        file_names = [os.path.relpath(os.path.join(root, file_name), self.contract_dir)
+                      for root, _, file_names in os.walk(self.contract_dir)
+                      for file_name in file_names if file_name.endswith('.sol')]
+        self.assertGreater(len(file_names), 0)
+        string_pp = StringPreProcessor()
+        for file_name in sorted(file_names):
+            try:
+                expected = string_pp.process(file_name, contract_dir=self.contract_dir, addresses={'OWNER': '0x1'})
+            except IOError:
+                # Unresolvable imports fail in both preprocessors
+                self.assertRaises((IOError, OSError), self.pp.process, file_name, contract_dir=self.contract_dir)
+                continue
+            self.assertEqual(self.pp.process(file_name, contract_dir=self.contract_dir, addresses={'OWNER': '0x1'},
+                                             replace_unknown_addresses=True), expected, file_name)
+        # Macro tokens with whitespace
+        code = 'contract A {\n    macro: $a b = 5;\n    uint x = $a b;\n}\nuint y = $a b;\n'
+        self.assertEqual(''.join(token[1] for token in PreProcessor().resolve_macros(tokenize(code))),
+                         string_pp.resolve_macros(code))
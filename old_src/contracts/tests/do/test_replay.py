@@ -0,0 +1,66 @@
+from ..abstract_test import AbstractTestContract, accounts, keys
+from contracts.simulation import AuctionSimulation
+from contracts.replay import Bid, BidReplay
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_replay
+    """
+
+    BLOCKS_PER_DAY = 5760
+    START_BLOCK = 3900000
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        simulation = AuctionSimulation(contract_dir=self.contract_dir)
+        bids = [
+            Bid(self.START_BLOCK, accounts[3].encode('hex'), None, 50000 * 10 ** 18),
+            Bid(self.START_BLOCK + 10, accounts[4].encode('hex'), None, 20000 * 10 ** 18),
+            Bid(self.START_BLOCK + self.BLOCKS_PER_DAY, accounts[5].encode('hex'), accounts[6].encode('hex'),
+                100000 * 10 ** 18),
+            Bid(self.START_BLOCK + 2 * self.BLOCKS_PER_DAY, accounts[3].encode('hex'), None, 200000 * 10 ** 18),
+        ]
+        replay = BidReplay(simulation, bids, checkpoint_interval=self.BLOCKS_PER_DAY)
+        result = replay.run()
+        # Ceiling was reached by the last bid
+        self.assertEqual(result['stage'], 3)
+        self.assertEqual(result['total_received'], AuctionSimulation.CEILING)
+        self.assertEqual(result['end_block'], self.START_BLOCK + 2 * self.BLOCKS_PER_DAY)
+        self.assertEqual(result['accepted_bids'], 4)
+        self.assertEqual(simulation.dutch_auction.bids(accounts[6]), 100000 * 10 ** 18)
+        self.assertEqual(simulation.dutch_auction.bids(accounts[3]),
+                         AuctionSimulation.CEILING - 120000 * 10 ** 18)
+        # Bids are sent from the recorded senders, not from one bidder account
+        self.assertEqual(simulation.s.block.get_nonce(accounts[3]), 2)
+        self.assertEqual(simulation.s.block.get_nonce(accounts[5]), 1)
+        self.assertEqual(simulation.s.block.get_nonce(accounts[AuctionSimulation.BIDDER]), 0)
+        other_sender = 'ab' * 20
+        self.assertNotIn(replay.sender_key(other_sender), keys)
+        self.assertIs(replay.sender_key(other_sender), replay.sender_key(other_sender))
+        self.assertEqual([checkpoint.block for checkpoint in replay.checkpoints],
+                         [self.START_BLOCK, self.START_BLOCK + self.BLOCKS_PER_DAY,
+                          self.START_BLOCK + 2 * self.BLOCKS_PER_DAY])
+        # What if the last bid was smaller: resume from the last checkpoint
+        what_if_bids = bids[:3] + [bids[3]._replace(value=10000 * 10 ** 18)]
+        what_if = replay.run(bids=what_if_bids, from_block=bids[3].block)
+        self.assertEqual(what_if['resumed_from_block'], self.START_BLOCK + 2 * self.BLOCKS_PER_DAY)
+        self.assertEqual(what_if['stage'], 2)
+        self.assertEqual(what_if['total_received'], 180000 * 10 ** 18)
+        # Same outcome as replaying the whole modified history
+        full = replay.run(bids=what_if_bids)
+        self.assertEqual(full['resumed_from_block'], self.START_BLOCK)
+        self.assertEqual(dict(full, resumed_from_block=None), dict(what_if, resumed_from_block=None))
+        # What if the ceiling was lower: restart the auction with it and replay all bids
+        low_ceiling = replay.run(ceiling=100000 * 10 ** 18)
+        self.assertEqual(low_ceiling['resumed_from_block'], self.START_BLOCK)
+        self.assertEqual(low_ceiling['stage'], 3)
+        self.assertEqual(low_ceiling['total_received'], 100000 * 10 ** 18)
+        self.assertEqual(low_ceiling['end_block'], self.START_BLOCK + self.BLOCKS_PER_DAY)
+        self.assertEqual((low_ceiling['accepted_bids'], low_ceiling['rejected_bids']), (3, 1))
+        self.assertEqual(simulation.dutch_auction.ceiling(), 100000 * 10 ** 18)
+        self.assertRaises(ValueError, replay.run, from_block=bids[3].block, ceiling=100000 * 10 ** 18)
+        # Checkpoints of the history are kept
+        self.assertEqual(replay.run(from_block=bids[3].block), dict(result, resumed_from_block=bids[3].block))
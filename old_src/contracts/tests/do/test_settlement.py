@@ -0,0 +1,66 @@
+from ..abstract_test import AbstractTestContract
+from contracts.simulation import AuctionSimulation
+from contracts.end_predictor import crossing_offset, PRICE_OFFSET
+from contracts.settlement import settle, SettlementFile, bids_from_rpc, read_receivers, unique_receivers
+from contracts.local_node import LocalNode
+from contracts.rpc import JsonRpc
+import random
+import tempfile
+import os
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_settlement
+    """
+
+    START_BLOCK = 3900000
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        simulation = AuctionSimulation(contract_dir=self.contract_dir)
+        simulation.start(block_number=self.START_BLOCK)
+        rnd = random.Random(0)
+        receivers = ['{:040x}'.format(rnd.getrandbits(160)) for _ in range(20)]
+        for receiver in receivers:
+            simulation.bid(rnd.randint(1, 5000 * 10 ** 18), receiver)
+        total_received = simulation.dutch_auction.totalReceived()
+        # Advance to the block the price reaches the stop price and start trading
+        simulation.advance(crossing_offset(AuctionSimulation.PRICE_FACTOR, total_received) - PRICE_OFFSET)
+        self.assertEqual(simulation.update_stage(), 3)
+        simulation.advance(seconds=AuctionSimulation.WAITING_PERIOD + 1)
+        self.assertEqual(simulation.update_stage(), 4)
+        final_price = simulation.dutch_auction.finalPrice()
+        # Bids read over JSON-RPC from receivers of BidSubmission events, repeat bidders are read once
+        receivers_file_name = os.path.join(tempfile.mkdtemp(), 'receivers.txt')
+        with open(receivers_file_name, 'w') as receivers_file:
+            receivers_file.write('\n'.join('0x' + receiver for receiver in sorted(receivers + receivers[:5])))
+        node = LocalNode(state=simulation.s)
+        port = node.start()
+        try:
+            bidders = bids_from_rpc(JsonRpc(port=port), '0x' + simulation.dutch_auction.address.encode('hex'),
+                                    read_receivers(receivers_file_name), chunk_size=6)
+            header = settle(bidders, final_price, total_received, os.path.join(tempfile.mkdtemp(), 'rpc.bin'))
+        finally:
+            node.stop()
+        self.assertEqual(header['count'], 20)
+        self.assertEqual(list(unique_receivers(['01', '01', '02'])), ['01', '02'])
+        self.assertRaises(ValueError, list, unique_receivers(['02', '01']))
+        # Bids are streamed in chunks smaller than the number of bidders
+        bidders = ((receiver, simulation.dutch_auction.bids(receiver)) for receiver in receivers)
+        file_name = os.path.join(tempfile.mkdtemp(), 'settlement.bin')
+        header = settle(bidders, final_price, total_received, file_name, chunk_size=7)
+        self.assertEqual(header['count'], 20)
+        self.assertEqual(simulation.gnosis_token.balanceOf(simulation.multisig_wallet.address),
+                         AuctionSimulation.PREASSIGNED_TOKENS + header['wallet_transfer'])
+        # Allocations match claimed tokens
+        settlement = SettlementFile(file_name)
+        for receiver, bid, tokens in settlement:
+            simulation.claim_tokens(receiver)
+            self.assertEqual(simulation.gnosis_token.balanceOf(receiver), tokens)
+        self.assertEqual(settlement[3][0], receivers[3])
+        settlement.close()
+        # Missing bidders fail verification
+        self.assertRaises(ValueError, settle, iter([(receivers[0], 1)]), final_price, total_received, file_name)
@@ -0,0 +1,53 @@
+from ..abstract_test import AbstractTestContract
+from contracts.simulation import AuctionSimulation
+from contracts.end_predictor import crossing_offset, PRICE_OFFSET
+from contracts.sweep import Sweep, write_table, COLUMNS
+import tempfile
+import csv
+import os
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_sweep
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        sweep = Sweep(contract_dir=self.contract_dir, processes=1, bid_count=10)
+        ceilings = [AuctionSimulation.CEILING, 50000 * 10 ** 18]
+        rows = sweep.run(ceilings, [AuctionSimulation.PRICE_FACTOR], ['early', 'thin'])
+        self.assertEqual([(row['ceiling'], row['profile']) for row in rows],
+                         [(ceilings[0], 'early'), (ceilings[0], 'thin'), (ceilings[1], 'early'), (ceilings[1], 'thin')])
+        early, thin, small_early, small_thin = rows
+        # Demand above the ceiling ends the auction at the ceiling
+        self.assertEqual(early['total_received'], AuctionSimulation.CEILING)
+        self.assertEqual(small_early['total_received'], 50000 * 10 ** 18)
+        self.assertEqual(small_thin['total_received'], 50000 * 10 ** 18)
+        # Demand below the ceiling ends the auction when the price reaches the stop price
+        self.assertLess(thin['total_received'], AuctionSimulation.CEILING)
+        self.assertEqual(thin['accepted_bids'], 10)
+        self.assertEqual(thin['end_block'],
+                         crossing_offset(AuctionSimulation.PRICE_FACTOR, thin['total_received']) - PRICE_OFFSET)
+        self.assertEqual(thin['final_price'], thin['total_received'] * 10 ** 18 / AuctionSimulation.MAX_TOKENS_SOLD + 1)
+        for row in rows:
+            self.assertLessEqual(row['tokens_sold'], AuctionSimulation.MAX_TOKENS_SOLD)
+            self.assertGreater(row['gas'], 0)
+        # Bids arriving after the price reached the stop price are not sent, the auction ended at the crossing
+        stragglers = sweep.run([AuctionSimulation.CEILING], [AuctionSimulation.PRICE_FACTOR], ['stragglers'])[0]
+        self.assertLess(stragglers['accepted_bids'], 10)
+        self.assertEqual(stragglers['end_block'], crossing_offset(AuctionSimulation.PRICE_FACTOR,
+                                                                  stragglers['total_received']) - PRICE_OFFSET)
+        self.assertEqual(stragglers['final_price'],
+                         stragglers['total_received'] * 10 ** 18 / AuctionSimulation.MAX_TOKENS_SOLD + 1)
+        # Workers of a pool reproduce the same rows
+        self.assertEqual(Sweep(contract_dir=self.contract_dir, processes=2, bid_count=10).run(
+            ceilings, [AuctionSimulation.PRICE_FACTOR], ['early', 'thin']), rows)
+        file_name = os.path.join(tempfile.mkdtemp(), 'sweep.csv')
+        write_table(file_name, rows)
+        with open(file_name) as table_file:
+            table = list(csv.DictReader(table_file))
+        self.assertEqual(len(table), 4)
+        self.assertEqual(sorted(table[0].keys()), sorted(COLUMNS))
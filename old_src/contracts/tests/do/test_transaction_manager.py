@@ -0,0 +1,110 @@
+from ..abstract_test import AbstractTestContract
+from contracts.transaction_manager import TransactionManager, GasPricePolicy
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ReceiptJsonRpc:
+    """
+    Returns a receipt for transaction hashes mined at the current time of the clock.
+    """
+
+    def __init__(self, clock, mined):
+        self.clock = clock
+        self.mined = mined
+
+    def eth_getTransactionReceipt(self, transaction_hash):
+        if self.mined(transaction_hash, self.clock.now):
+            return {'result': {'transactionHash': transaction_hash, 'gasUsed': '0x5208'}}
+        return {'result': None}
+
+
+class TestContract(AbstractTestContract):
+    """
+    run test with python -m unittest contracts.tests.do.test_transaction_manager
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(TestContract, self).__init__(*args, **kwargs)
+
+    def test(self):
+        # Replacements are at least 10% higher and never above the maximum gas price
+        self.assertRaises(ValueError, GasPricePolicy, factor=1.05)
+        self.assertEqual(GasPricePolicy(factor=1.125).next_gas_price(100), 113)
+        policy = GasPricePolicy(factor=2, max_gas_price=30)
+        self.assertEqual(policy.next_gas_price(10), 21)
+        self.assertEqual(policy.next_gas_price(21), 30)
+        self.assertIsNone(policy.next_gas_price(30))
+        # Transactions are replaced after the timeout until an attempt is mined
+        clock = Clock()
+        json_rpc = ReceiptJsonRpc(clock, lambda transaction_hash, now: transaction_hash == '0x43')
+        manager = TransactionManager(json_rpc, GasPricePolicy(timeout=10, factor=2), poll_interval=5,
+                                     clock=clock.time, sleep=clock.sleep)
+        transaction = manager.submit(lambda gas_price: {'result': '0x{}'.format(gas_price)}, 'bid', 0, 10)
+        receipt = manager.wait(transaction)
+        self.assertEqual(receipt['transactionHash'], '0x43')
+        self.assertEqual(transaction.attempts, [('0x10', 10, 0), ('0x21', 21, 10), ('0x43', 43, 20)])
+        self.assertEqual(transaction.cost, 21000 * 43)
+        self.assertEqual(manager.total_cost(), 21000 * 43)
+        # Rejected replacements are retried once per timeout, not on every poll
+        clock = Clock()
+        sends = []
+
+        def send(gas_price):
+            sends.append((gas_price, clock.now))
+            if len(sends) == 1:
+                return {'result': '0x1'}
+            return {'error': {'code': -32000, 'message': 'known transaction'}}
+        json_rpc = ReceiptJsonRpc(clock, lambda transaction_hash, now: now >= 50)
+        manager = TransactionManager(json_rpc, GasPricePolicy(timeout=10, factor=2), poll_interval=5,
+                                     clock=clock.time, sleep=clock.sleep)
+        manager.wait(manager.submit(send, 'claim', 1, 10))
+        self.assertEqual([sent_at for _, sent_at in sends], [0, 10, 20, 30, 40])
+        # No replacements once the maximum gas price is reached
+        clock = Clock()
+        sends = []
+
+        def send_accepted(gas_price):
+            sends.append(gas_price)
+            return {'result': '0x{}'.format(len(sends))}
+        json_rpc = ReceiptJsonRpc(clock, lambda transaction_hash, now: transaction_hash == '0x2' and now >= 100)
+        manager = TransactionManager(json_rpc, GasPricePolicy(timeout=10, factor=2, max_gas_price=30),
+                                     poll_interval=5, clock=clock.time, sleep=clock.sleep)
+        transaction = manager.submit(send_accepted, 'claim', 2, 10)
+        manager.wait(transaction)
+        self.assertEqual(sends, [10, 21, 30])
+        # The attempt that was mined is reported, not the first or the last one
+        self.assertEqual(transaction.mined_hash, '0x2')
+        self.assertEqual(transaction.gas_price, 21)
+        self.assertEqual(transaction.cost, 21000 * 21)
+        # Errors resending cannot fix fail immediately, transient errors are retried at most max_attempts times
+        clock = Clock()
+        sends = []
+
+        def send_failing(error):
+            def send_error(gas_price):
+                sends.append(gas_price)
+                return {'error': {'code': -32000, 'message': error}}
+            return send_error
+        manager = TransactionManager(json_rpc, poll_interval=5, clock=clock.time, sleep=clock.sleep, max_attempts=3)
+        self.assertRaises(ValueError, manager.submit, send_failing('insufficient funds for gas * price + value'),
+                          'bid', 3, 10)
+        self.assertEqual(len(sends), 1)
+        self.assertRaises(ValueError, manager.submit, send_failing('Injected error'), 'bid', 3, 10)
+        self.assertEqual(len(sends), 4)
+        self.assertEqual(clock.now, 10)
+        # A replacement failing permanently leaves the earlier attempt pending
+        transaction = manager.submit(send_accepted, 'bid', 3, 10)
+        transaction.send = send_failing('insufficient funds for gas * price + value')
+        self.assertFalse(manager.send_attempt(transaction, 21))
+        self.assertEqual(len(transaction.attempts), 1)
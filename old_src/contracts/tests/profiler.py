@@ -0,0 +1,95 @@
+from ethereum import tester as t
+from ethereum.tester import TransactionFailed
+from ethereum._solidity import solidity_names
+import time
+
+
+class CallProfiler:
+    """
+    Collects gas, wall time and call counts of contract calls made through tester abi_contract proxies.
+    """
+
+    def __init__(self):
+        self.functions = {}
+        self.tests = {}
+        self.current_test = None
+
+    @staticmethod
+    def contract_name(sourcecode, language='serpent', contract_name=None):
+        """
+        Returns the name of the contract abi_contract deploys: the given name or the last contract or library of
+        the source, found like the tester does without compiling the source again.
+        """
+        if contract_name:
+            return contract_name
+        if language == 'solidity':
+            names = solidity_names(sourcecode)
+            if names:
+                return names[-1][1]
+        return 'Unknown'
+
+    def start_test(self, test_id):
+        self.current_test = test_id
+
+    def record(self, key, gas, duration, failed=False):
+        for stats, name in ((self.functions, key), (self.tests, self.current_test)):
+            if name is None:
+                continue
+            entry = stats.setdefault(name, {'calls': 0, 'gas': 0, 'time': 0.0, 'failed': 0})
+            entry['calls'] += 1
+            entry['gas'] += gas
+            entry['time'] += duration
+            entry['failed'] += failed
+
+    def wrap(self, contract, contract_name):
+        for function_name in contract.translator.function_data:
+            setattr(contract, function_name,
+                    self.wrap_function(getattr(contract, function_name), (contract_name, function_name)))
+        return contract
+
+    def wrap_function(self, function, key):
+        def kall(*args, **kwargs):
+            profiling_requested = kwargs.get('profiling')
+            kwargs['profiling'] = True
+            # Failed calls return no profiling result, all calls are timed with the same clock
+            start = time.time()
+            try:
+                result = function(*args, **kwargs)
+            except TransactionFailed:
+                self.record(key, 0, time.time() - start, failed=True)
+                raise
+            self.record(key, result['gas'], time.time() - start)
+            return result if profiling_requested else result['output']
+        return kall
+
+    def report(self):
+        lines = ['{:<50} {:>8} {:>14} {:>12} {:>10} {:>7}'.format('Function', 'Calls', 'Total gas', 'Avg gas',
+                                                                  'Time (s)', 'Failed')]
+        for (contract_name, function_name), entry in sorted(self.functions.iteritems(),
+                                                            key=lambda item: item[1]['gas'], reverse=True):
+            lines.append('{:<50} {:>8} {:>14} {:>12} {:>10.3f} {:>7}'.format(
+                '{}.{}'.format(contract_name, function_name), entry['calls'], entry['gas'],
+                entry['gas'] / entry['calls'], entry['time'], entry['failed']))
+        lines += ['', '{:<70} {:>8} {:>14} {:>10}'.format('Test', 'Calls', 'Total gas', 'Time (s)')]
+        for test_id, entry in sorted(self.tests.iteritems(), key=lambda item: item[1]['time'], reverse=True):
+            lines.append('{:<70} {:>8} {:>14} {:>10.3f}'.format(test_id, entry['calls'], entry['gas'], entry['time']))
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, file_name):
+        with open(file_name, 'w') as report_file:
+            report_file.write(self.report())
+
+
+class ProfiledState(t.state):
+    """
+    Tester state whose abi_contract proxies report their calls to a CallProfiler.
+    """
+
+    def __init__(self, profiler, *args, **kwargs):
+        t.state.__init__(self, *args, **kwargs)
+        self.profiler = profiler
+
+    def abi_contract(self, sourcecode, *args, **kwargs):
+        contract = t.state.abi_contract(self, sourcecode, *args, **kwargs)
+        return self.profiler.wrap(contract, self.profiler.contract_name(sourcecode, kwargs.get('language', 'serpent'),
+                                                                        kwargs.get('contract_name')))
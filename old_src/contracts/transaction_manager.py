@@ -0,0 +1,180 @@
+import time
+import logging
+
+# Errors that don't go away by resending the transaction, messages of geth, parity and pyethereum exceptions
+PERMANENT_ERRORS = ('nonce too low', 'insufficient funds', 'invalid sender', 'exceeds block gas limit',
+                    'intrinsic gas too low', 'insufficientbalance', 'blockgaslimitreached', 'insufficientstartgas')
+
+
+def is_permanent_error(error):
+    return any(permanent_error in str(error).lower() for permanent_error in PERMANENT_ERRORS)
+
+
+class GasPricePolicy:
+    """
+    Decides when and how much to raise the gas price of a transaction which was not mined in time. Nodes only accept
+    replacements for the same nonce with a gas price at least 10% higher.
+    """
+
+    def __init__(self, timeout=120, factor=1.125, max_gas_price=None):
+        if factor < 1.1:
+            raise ValueError('Gas price factor {} is below the minimum replacement bump of 1.1'.format(factor))
+        self.timeout = timeout
+        self.factor = factor
+        self.max_gas_price = max_gas_price
+
+    def next_gas_price(self, gas_price):
+        """
+        Returns the gas price of the replacement or None if the maximum gas price was reached.
+        """
+        next_gas_price = int(gas_price * self.factor) + 1
+        if self.max_gas_price is not None:
+            if gas_price >= self.max_gas_price:
+                return None
+            next_gas_price = min(next_gas_price, self.max_gas_price)
+        return next_gas_price
+
+
+class ManagedTransaction:
+    """
+    A transaction with a fixed nonce and all attempts sent for it with different gas prices.
+    """
+
+    def __init__(self, name, nonce, send):
+        self.name = name
+        self.nonce = nonce
+        self.send = send
+        # (transaction hash, gas price, time sent)
+        self.attempts = []
+        self.receipt = None
+        self.mined_hash = None
+        self.gas_price = None
+        self.cost = None
+        # Time of the last replacement, also if the node rejected it
+        self.escalated_at = 0
+
+    @property
+    def mined(self):
+        return self.receipt is not None
+
+
+class TransactionManager:
+    """
+    Sends transactions and replaces them with the same nonce and a higher gas price if they are not mined before
+    the deadline of the policy. Whichever attempt is mined first completes the transaction.
+    """
+
+    def __init__(self, json_rpc, policy=None, poll_interval=5, clock=time.time, sleep=time.sleep, max_attempts=10):
+        self.json_rpc = json_rpc
+        self.policy = policy or GasPricePolicy()
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.sleep = sleep
+        self.transactions = []
+
+    def submit(self, send, name, nonce, gas_price):
+        """
+        Sends a transaction using send(gas_price), which returns the JSON-RPC response. Returns the managed
+        transaction without waiting for it to be mined.
+        """
+        transaction = ManagedTransaction(name, nonce, send)
+        self.transactions.append(transaction)
+        self.send_attempt(transaction, gas_price)
+        return transaction
+
+    def send_attempt(self, transaction, gas_price):
+        """
+        Sends an attempt, raising the gas price while the node rejects it as underpriced. Errors resending cannot fix
+        fail immediately, others are retried at most max_attempts times. Replacements failing like this return False,
+        the earlier attempts are still pending.
+        """
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.sleep(self.poll_interval)
+            tx_response = transaction.send(gas_price)
+            if 'error' not in tx_response:
+                transaction.attempts.append((tx_response['result'], gas_price, self.clock()))
+                logging.info('{} with nonce {} sent with gas price {}.'.format(transaction.name, transaction.nonce,
+                                                                             gas_price))
+                return True
+            error = str(tx_response['error'])
+            # An earlier attempt was mined or is still known to the node
+            if transaction.attempts and ('nonce too low' in error.lower() or 'known' in error.lower()):
+                return False
+            if is_permanent_error(error):
+                return self.give_up(transaction, error)
+            if 'underpriced' in error:
+                next_gas_price = self.policy.next_gas_price(gas_price)
+                if next_gas_price is None:
+                    return False
+                gas_price = next_gas_price
+            logging.info('{} failed with error {}. Retry!'.format(transaction.name, error))
+        return self.give_up(transaction, 'no attempt sent in {} tries'.format(self.max_attempts))
+
+    @staticmethod
+    def give_up(transaction, error):
+        if not transaction.attempts:
+            raise ValueError('{} with nonce {} failed with error {}'.format(transaction.name, transaction.nonce, error))
+        logging.info('Replacement of {} failed with error {}, earlier attempts are pending.'.format(transaction.name,
+                                                                                                    error))
+        return False
+
+    def poll(self, transaction):
+        """
+        Checks all attempts for a receipt. Returns True if one of them was mined.
+        """
+        if transaction.mined:
+            return True
+        for transaction_hash, gas_price, _ in transaction.attempts:
+            receipt = self.json_rpc.eth_getTransactionReceipt(transaction_hash)['result']
+            if receipt is not None:
+                transaction.receipt = receipt
+                transaction.mined_hash = transaction_hash
+                transaction.gas_price = gas_price
+                transaction.cost = int(receipt['gasUsed'], 16) * gas_price
+                logging.info('{} mined as {} with gas price {} after {} attempts, cost {} Wei.'.format(
+                    transaction.name, transaction_hash, gas_price, len(transaction.attempts), transaction.cost))
+                return True
+        return False
+
+    def escalate(self, transaction):
+        """
+        Replaces the transaction with a higher gas price if the last attempt is older than the policy timeout.
+        """
+        _, gas_price, sent_at = transaction.attempts[-1]
+        if self.clock() - max(sent_at, transaction.escalated_at) < self.policy.timeout:
+            return
+        next_gas_price = self.policy.next_gas_price(gas_price)
+        if next_gas_price is None:
+            return
+        # A rejected replacement is retried after the next timeout, not on every poll
+        transaction.escalated_at = self.clock()
+        logging.info('{} with nonce {} not mined after {} seconds, replace with gas price {}.'.format(
+            transaction.name, transaction.nonce, self.policy.timeout, next_gas_price))
+        self.send_attempt(transaction, next_gas_price)
+
+    def wait(self, transaction):
+        """
+        Waits until the transaction was mined, escalating its gas price on the way. Returns the receipt.
+        """
+        while not self.poll(transaction):
+            self.escalate(transaction)
+            logging.info('Waiting for transaction receipt {}'.format(transaction.attempts[-1][0]))
+            self.sleep(self.poll_interval)
+        return transaction.receipt
+
+    def wait_all(self, transactions):
+        """
+        Waits for several transactions, escalating all of them while waiting.
+        """
+        pending = [transaction for transaction in transactions if not self.poll(transaction)]
+        while pending:
+            for transaction in pending:
+                self.escalate(transaction)
+            logging.info('Waiting for {} transaction receipts'.format(len(pending)))
+            self.sleep(self.poll_interval)
+            pending = [transaction for transaction in pending if not self.poll(transaction)]
+
+    def total_cost(self):
+        return sum(transaction.cost for transaction in self.transactions if transaction.mined)
@@ -0,0 +1,88 @@
+from ethereum.abi import ContractTranslator
+from contract_abi import load_abi
+
+UINT_RANGE = 2 ** 256
+
+
+class DisbursementSchedule:
+    """
+    Python model of Disbursement.calcMaxWithdraw for a single vesting contract.
+    All arithmetic wraps like uint256 so results match the contract to the wei.
+    """
+
+    def __init__(self, disbursement_period, start_date, withdrawn_tokens, balance, address=None):
+        if disbursement_period == 0:
+            raise ValueError('Disbursement period cannot be 0')
+        self.address = address
+        self.disbursement_period = disbursement_period
+        self.start_date = start_date
+        self.withdrawn_tokens = withdrawn_tokens
+        self.balance = balance
+        # Vested base is constant over time, compute it once
+        self.total_tokens = (balance + withdrawn_tokens) % UINT_RANGE
+
+    @classmethod
+    def from_contract(cls, disbursement, token):
+        """
+        Reads parameters from tester contracts (ethereum.tester ABIContract).
+        """
+        return cls(disbursement.disbursementPeriod(),
+                   disbursement.startDate(),
+                   disbursement.withdrawnTokens(),
+                   token.balanceOf(disbursement.address),
+                   address=disbursement.address.encode('hex'))
+
+    @classmethod
+    def from_rpc(cls, json_rpc, address, block='latest'):
+        """
+        Reads parameters from a node with one eth_call per value.
+        """
+        disbursement = ContractTranslator(load_abi('Disbursement'))
+        token = ContractTranslator(load_abi('GnosisToken'))
+
+        def call(translator, to_address, name, params=()):
+            data = "0x" + translator.encode(name, list(params)).encode("hex")
+            result = json_rpc.eth_call(to_address=to_address, data=data, default_block=block)["result"]
+            return translator.decode(name, result[2:].decode("hex"))[0]
+
+        token_address = "0x" + call(disbursement, address, 'token')
+        return cls(call(disbursement, address, 'disbursementPeriod'),
+                   call(disbursement, address, 'startDate'),
+                   call(disbursement, address, 'withdrawnTokens'),
+                   call(token, token_address, 'balanceOf', [address]),
+                   address=address)
+
+    def max_withdraw(self, timestamp):
+        if self.start_date > timestamp:
+            return 0
+        max_tokens = self.total_tokens * ((timestamp - self.start_date) % UINT_RANGE) % UINT_RANGE \
+            / self.disbursement_period
+        if self.withdrawn_tokens >= max_tokens:
+            return 0
+        return max_tokens - self.withdrawn_tokens
+
+
+class VestingCalculator:
+    """
+    Computes withdrawable amounts for many Disbursement contracts over a time grid in one pass. Parameters are read
+    once per contract, every grid point is then evaluated locally.
+    """
+
+    def __init__(self, schedules=None):
+        self.schedules = list(schedules) if schedules else []
+
+    def add(self, schedule):
+        self.schedules.append(schedule)
+
+    def calc_max_withdraw(self, timestamps):
+        """
+        Returns one row per schedule with the withdrawable amount at every timestamp.
+        """
+        timestamps = list(timestamps)
+        return [[schedule.max_withdraw(timestamp) for timestamp in timestamps] for schedule in self.schedules]
+
+    def totals(self, timestamps):
+        """
+        Returns the withdrawable amount summed over all schedules for every timestamp.
+        """
+        return [sum(column) for column in zip(*self.calc_max_withdraw(timestamps))]